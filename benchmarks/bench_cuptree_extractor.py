@@ -0,0 +1,82 @@
+# benchmarks/bench_cuptree_extractor.py
+"""
+Compares CuptreeExtractor with the DataFrame-based path it replaced
+(benchmarks/legacy_extraction.py: process_cuptree_json + get_all_participants +
+extract_games_from_cuptree) on a large synthetic cuptree, checking that both produce
+identical frames.
+
+Usage: python -m benchmarks.bench_cuptree_extractor [--draws 200] [--draw-size 128] [--repeat 5]
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from benchmarks.legacy_extraction import legacy_extract
+from benchmarks.synthetic_data import CuptreeGenerator
+from dataprocessor.dataprocessor import TennisDataProcessor
+
+
+def synthetic_cuptrees(draws: int, draw_size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Builds a cuptree list with `draws` single-elimination draws of `draw_size` players.
+    """
+    generator = CuptreeGenerator(players=2 * draw_size, draw_size=draw_size, qualifying_draw_size=0, seed=seed)
+    return [cuptree for draw in range(draws) for cuptree in generator.season(draw, draw, 2024)]
+
+
+def measure(funcs, payload: str, repeat: int):
+    """
+    Returns (best wall time, peak traced memory, result) per function on freshly decoded payloads.
+    Runs are interleaved so background noise hits every function alike, and memory is
+    traced in a separate run because tracemalloc slows Python code down.
+    """
+    best = [float('inf')] * len(funcs)
+    results = [None] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            data = json.loads(payload)
+            start = time.perf_counter()
+            results[i] = func(data)
+            best[i] = min(best[i], time.perf_counter() - start)
+
+    peaks = []
+    for func in funcs:
+        data = json.loads(payload)
+        tracemalloc.start()
+        func(data)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return list(zip(best, peaks, results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--draws', type=int, default=200)
+    parser.add_argument('--draw-size', type=int, default=128)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    processor = TennisDataProcessor()
+    payload = json.dumps(synthetic_cuptrees(args.draws, args.draw_size))
+
+    def dataframe_path(cuptrees):
+        return legacy_extract(cuptrees, processor.map_round_description, processor.validate_score_format)
+
+    (t_old, mem_old, (participants_old, games_old)), (t_new, mem_new, (participants_new, games_new)) = measure(
+        [dataframe_path, processor.extractor.extract], payload, args.repeat)
+
+    assert participants_old.equals(participants_new), "participants differ"
+    assert games_old.equals(games_new), "games differ"
+
+    print(f"{args.draws} draws x {args.draw_size} players: {len(games_new)} games, {len(participants_new)} participants")
+    print(f"  iterrows + json_normalize: {t_old * 1000:9.1f} ms  peak {mem_old / 1e6:7.1f} MB")
+    print(f"  CuptreeExtractor:          {t_new * 1000:9.1f} ms  peak {mem_new / 1e6:7.1f} MB")
+    print(f"  speedup {t_old / t_new:.1f}x, peak memory {mem_old / mem_new:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
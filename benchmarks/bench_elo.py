@@ -0,0 +1,107 @@
+# benchmarks/bench_elo.py
+"""
+Times EloRatingEngine on synthetic matches, checks its pre-match ratings against a
+straightforward per-match replay on a sample, and checks that applying the last matches
+on top of a snapshot gives the same ratings as replaying everything.
+
+Usage: python -m benchmarks.bench_elo [--matches 1000000] [--players 5000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from features.elo import RATING_COLUMNS, EloRatingEngine
+from features.feature_builder import ordinal_mapping, tournament_surfaces
+
+
+def synthetic_matches(n: int, players: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    home = rng.integers(0, players, n)
+    away = (home + rng.integers(1, players, n)) % players
+    home_sets = rng.integers(0, 4, n)
+    away_sets = np.where(home_sets < 3, 3, rng.integers(0, 3, n))
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'home_id': home,
+        'away_id': away,
+        'result': pd.Series(home_sets).astype(str) + ':' + pd.Series(away_sets).astype(str),
+        'seriesStartDate': pd.Timestamp('2000-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 9000, n)), unit='D'),
+        'round_description': rng.choice(list(ordinal_mapping), n),
+        'uniqueTournament': rng.choice(list(tournament_surfaces) + ['Wimbledon'], n),
+    })
+
+
+def reference_ratings(engine: EloRatingEngine, matches: pd.DataFrame) -> np.ndarray:
+    """
+    Replays matches one by one with dictionaries, without any of the engine's shortcuts.
+    """
+    dates, rounds = engine.order_keys(matches)
+    rating, played, surface_rating, surface_played = {}, {}, {}, {}
+    out = np.full((len(matches), 4), np.nan)
+    for i in np.lexsort((rounds, dates)):
+        row = matches.iloc[i]
+        home, away = row['home_id'], row['away_id']
+        surface = engine.surfaces.get(row['uniqueTournament'])
+        home_sets, away_sets = (int(x) for x in row['result'].split(':'))
+        outcome = 1.0 if home_sets > away_sets else 0.0
+        sides = [(rating, played, home, away, 0)]
+        if surface:
+            sides.append((surface_rating, surface_played, (surface, home), (surface, away), 2))
+        for ratings, counts, h, a, col in sides:
+            r_h, r_a = ratings.get(h, engine.initial), ratings.get(a, engine.initial)
+            out[i, col], out[i, col + 1] = r_h, r_a
+            expected = 1.0 / (1.0 + 10.0 ** ((r_a - r_h) / 400.0))
+            k_h = engine.k_base / (counts.get(h, 0) + engine.k_offset) ** engine.k_shape
+            k_a = engine.k_base / (counts.get(a, 0) + engine.k_offset) ** engine.k_shape
+            ratings[h], ratings[a] = r_h + k_h * (outcome - expected), r_a - k_a * (outcome - expected)
+            counts[h], counts[a] = counts.get(h, 0) + 1, counts.get(a, 0) + 1
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matches', type=int, default=1_000_000)
+    parser.add_argument('--players', type=int, default=5000)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+    params = dict(surfaces=tournament_surfaces, round_order=ordinal_mapping)
+
+    sample = synthetic_matches(5000, 200, seed=1)
+    expected = reference_ratings(EloRatingEngine(**params), sample)
+    actual = EloRatingEngine(**params).rate(sample)[RATING_COLUMNS].to_numpy()
+    assert np.allclose(actual, expected, equal_nan=True), "ratings differ from reference replay"
+
+    matches = synthetic_matches(args.matches, args.players)
+    engine = EloRatingEngine(**params)
+    start = time.perf_counter()
+    full = engine.rate(matches)
+    elapsed = time.perf_counter() - start
+    print(f"{args.matches} matches, {args.players} players: {elapsed:.2f}s ({args.matches / elapsed / 1e6:.2f}M matches/s)")
+
+    # Split in rating order, so the new matches all come after the snapshot
+    dates, rounds = engine.order_keys(matches)
+    order = np.lexsort((rounds, dates))
+    split = int(len(matches) * 0.99)
+    history, latest = matches.iloc[order[:split]], matches.iloc[order[split:]]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'elo.npz')
+        snapshot_engine = EloRatingEngine(**params)
+        snapshot_engine.rate(history)
+        snapshot_engine.save(path)
+        size = os.path.getsize(path)
+        restored = EloRatingEngine.load(path, **params)
+        assert restored.can_extend(latest)
+        start = time.perf_counter()
+        new = restored.rate(latest)
+        elapsed = time.perf_counter() - start
+    assert np.allclose(new.to_numpy(), full.loc[latest.index].to_numpy(), equal_nan=True), "incremental ratings differ"
+    print(f"  snapshot {size / 1e6:.1f} MB; {len(latest)} new matches applied in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
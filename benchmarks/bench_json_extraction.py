@@ -0,0 +1,111 @@
+# benchmarks/bench_json_extraction.py
+"""
+Compares the BeautifulSoup page-source path with the raw-body path used by
+TennisDataFetcher._call_using_selenium on recorded cuptree payloads.
+
+Both paths are timed from the WebDriver response on: page_source and execute_script
+return their string inside a JSON {"value": ...} message that selenium decodes, so each
+path pays that decode before its own parsing. The raw-body path (RAW_BODY_SCRIPT) then
+costs one json.loads; the BS4 path has to parse the HTML that Chrome serialises for a
+JSON response first. Work done inside the browser, e.g. serialising page_source, is not
+measured; run against a live driver to include it.
+
+Usage: python -m benchmarks.bench_json_extraction [--data-dir datafetcher/data] [--repeat 20]
+"""
+import argparse
+import html
+import json
+import os
+import time
+from typing import List
+
+from datafetcher.datafetcher import extract_json_from_page_source, extract_json_from_text
+
+CHROME_JSON_PAGE = (
+    '<html><head><meta name="color-scheme" content="light dark"></head><body>'
+    '<pre style="word-wrap: break-word; white-space: pre-wrap;">{}</pre></body></html>'
+)
+
+
+def synthetic_payload(blocks: int = 2000) -> str:
+    """
+    Cuptree-shaped payload used when there are no recorded files.
+    """
+    team = {"name": "Player", "slug": "player", "shortName": "P.", "gender": "M", "nameCode": "PLA",
+            "ranking": 10, "disabled": False, "national": False, "id": 1}
+    round_blocks = [
+        {"blockId": i, "finished": True, "result": "3:1", "homeTeamScore": "3", "awayTeamScore": "1",
+         "events": [i], "seriesStartDate": "2024-01-14T00:00:00+00:00",
+         "participants": [{"team": dict(team, id=2 * i), "winner": True, "order": 1},
+                          {"team": dict(team, id=2 * i + 1), "winner": False, "order": 2}]}
+        for i in range(blocks)
+    ]
+    return json.dumps({"cupTrees": [{"id": 1, "name": "Main draw", "tournament": {},
+                                     "rounds": [{"description": "Round of 128", "blocks": round_blocks}]}]})
+
+
+def webdriver_response(value: str) -> str:
+    """
+    The wire format in which WebDriver returns a string to selenium.
+    """
+    return json.dumps({"value": value})
+
+
+def from_page_source(response: str):
+    return extract_json_from_page_source(json.loads(response)["value"])
+
+
+def from_raw_body(response: str):
+    return extract_json_from_text(json.loads(response)["value"])
+
+
+def load_payloads(data_dir: str, limit: int) -> List[str]:
+    if not os.path.isdir(data_dir):
+        return []
+    files = sorted(f for f in os.listdir(data_dir) if f.startswith('cuptrees') and f.endswith('.json'))[:limit]
+    payloads = []
+    for name in files:
+        with open(os.path.join(data_dir, name), 'r', encoding='utf-8') as f:
+            payloads.append(json.dumps({"cupTrees": json.load(f)}))
+    return payloads
+
+
+def bench(func, inputs: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=os.path.join('datafetcher', 'data'))
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of recorded files to use')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.data_dir, args.limit)
+    source = f"{len(payloads)} recorded payloads from {args.data_dir}"
+    if not payloads:
+        payloads = [synthetic_payload()]
+        source = "1 synthetic payload (no recorded cuptrees found)"
+    pages = [CHROME_JSON_PAGE.format(html.escape(p, quote=False)) for p in payloads]
+
+    # Both paths must agree before timing them
+    for raw, page in zip(payloads, pages):
+        assert extract_json_from_text(raw) == extract_json_from_page_source(page)
+
+    total_mb = sum(len(p) for p in payloads) / 1e6
+    t_bs4 = bench(from_page_source, [webdriver_response(page) for page in pages], args.repeat)
+    t_raw = bench(from_raw_body, [webdriver_response(raw) for raw in payloads], args.repeat)
+    print(f"Benchmark on {source} ({total_mb:.1f} MB)")
+    print(f"  bs4 page source: {t_bs4 * 1000:9.1f} ms")
+    print(f"  raw body:        {t_raw * 1000:9.1f} ms")
+    print(f"  speedup:         {t_bs4 / t_raw:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/bench_pipeline.py
+"""
+Times the pipeline stages (process_all_data, combine_data, build_features, train_model)
+on synthetic cuptrees at multiples of the current data volume, records each stage's
+peak memory, and compares the results with a stored baseline.
+
+1x is one default crawl: BASE_SEASONS tournament seasons with a 128-player main draw and
+a 128-player qualification draw, about 2,800 matches. 1000x writes several GB of
+cuptree files and takes hours, so the default is 10x and 100x.
+
+With --chunk-size, process, combine and features run in their chunked streaming mode
+(process_in_chunks, combine_in_chunks, build_features_in_chunks), whose peak memory should
+stay flat as the scale grows; results are then stored under "<scale>/chunk<size>" keys.
+
+Each scale runs in its own temporary working directory. The run fails (exit code 1) when
+a stage is more than --tolerance slower or uses more than --tolerance more memory than
+in the baseline, or when the baseline has no entry for a measured scale or stage; small
+absolute differences are ignored as noise. benchmarks/baseline_pipeline.json holds the
+default scales; after an intended change, or on other hardware, refresh it with
+--update-baseline.
+
+Usage: python -m benchmarks.bench_pipeline [--scales 10 100] [--baseline benchmarks/baseline_pipeline.json]
+       [--update-baseline] [--tolerance 0.25] [--output results.json] [--chunk-size 20000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic_data import TOURNAMENTS, CuptreeGenerator
+from datacombiner.datacombiner import TennisDataCombiner
+from dataprocessor.dataprocessor import TennisDataProcessor
+from features.feature_builder import FeatureBuilder
+from modeling.model_trainer import ModelTrainer
+from orchestration.instrumentation import PeakMemory
+
+BASE_SEASONS = 10
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline_pipeline.json')
+# Differences below these are noise rather than regressions
+MIN_SECONDS = 0.5
+MIN_MB = 20.0
+
+
+def generate(scale: int, out_dir: str, seed: int = 0) -> int:
+    seasons = BASE_SEASONS * scale
+    tournaments = min(len(TOURNAMENTS), seasons)
+    generator = CuptreeGenerator(players=min(50_000, 500 * scale), seed=seed)
+    return len(generator.write(out_dir, tournaments, math.ceil(seasons / tournaments)))
+
+
+def train() -> int:
+    trainer = ModelTrainer()
+    trainer.train_model(save=True)
+    return len(trainer.features)
+
+
+def run_scale(scale: int, chunk_size: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Generates data for one scale in a temporary directory and runs every stage on it,
+    each reading its inputs from the store like the cached pipeline does.
+    """
+    work_dir = tempfile.mkdtemp(prefix=f'bench_pipeline_{scale}x_')
+    cwd = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        start = time.perf_counter()
+        files = generate(scale, os.path.join('datafetcher', 'data'))
+        print(f"{scale}x: generated {files} cuptree files in {time.perf_counter() - start:.1f}s", flush=True)
+
+        if chunk_size:
+            stages = [
+                ('process', lambda: TennisDataProcessor().process_in_chunks(chunk_size)),
+                ('combine', lambda: TennisDataCombiner().combine_in_chunks(chunk_size)),
+                ('features', lambda: FeatureBuilder().build_features_in_chunks(chunk_size)),
+                ('train', train),
+            ]
+        else:
+            stages = [
+                ('process', lambda: len(TennisDataProcessor().process_all_data(save=True)['games'])),
+                ('combine', lambda: len(TennisDataCombiner().combine_data(save=True))),
+                ('features', lambda: len(FeatureBuilder().build_features(save=True))),
+                ('train', train),
+            ]
+        results = {}
+        for name, stage in stages:
+            with PeakMemory() as memory, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                rows = stage()
+                seconds = time.perf_counter() - start
+            results[name] = {'seconds': round(seconds, 3), 'peak_mb': round(memory.peak_mb, 1), 'rows': rows}
+            print(f"  {name:>8}: {seconds:8.2f}s  peak +{memory.peak_mb:8.1f} MB  {rows:>10,} rows", flush=True)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    found = []
+    for scale, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(scale, {}).get(stage)
+            if expected is None:
+                found.append(f"{scale}x {stage}: not in the baseline, run with --update-baseline to add it")
+                continue
+            for metric, noise in (('seconds', MIN_SECONDS), ('peak_mb', MIN_MB)):
+                limit = expected[metric] * (1 + tolerance)
+                if measured[metric] > limit and measured[metric] - expected[metric] > noise:
+                    found.append(f"{scale}x {stage}: {metric} {measured[metric]} > {expected[metric]} "
+                                 f"+{tolerance:.0%}")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--output', help="Also write the results as JSON to this file.")
+    parser.add_argument('--chunk-size', type=int, help="Run process, combine and features in chunks of this many rows.")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    suffix = f"/chunk{args.chunk_size}" if args.chunk_size else ''
+    results = {f"{scale}{suffix}": run_scale(scale, args.chunk_size) for scale in args.scales}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+    if not baseline:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to store one")
+        sys.exit(1)
+
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print("Regressions against the baseline:")
+        for regression in found:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_predictor.py
+"""
+Measures ModelPredictor latency in process and over its HTTP endpoint: single-match p50/p99,
+batch throughput, and single-match latency with concurrent clients, where micro-batching
+groups requests. A compiled random forest is checked against the model itself. Needs a trained model and player profiles, e.g. from
+`python pipeline.py --no-fetch`, in the working directory.
+
+Usage: python -m benchmarks.bench_predictor [--requests 2000] [--clients 8]
+"""
+import argparse
+import http.client
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features.feature_builder import ordinal_mapping, tournament_surfaces
+from prediction.model_predictor import ModelPredictor
+
+
+def random_matches(predictor: ModelPredictor, n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    players = np.array(list(predictor._rows))
+    tournaments, rounds = list(tournament_surfaces), list(ordinal_mapping)
+    return [{'home_id': int(home), 'away_id': int(away), 'date': '2025-06-01',
+             'tournament': tournaments[rng.integers(len(tournaments))], 'round': rounds[rng.integers(len(rounds))]}
+            for home, away in rng.choice(players, size=(n, 2))]
+
+
+def percentiles(latencies) -> str:
+    ms = np.asarray(latencies) * 1000
+    return f"p50 {np.percentile(ms, 50):.2f} ms, p99 {np.percentile(ms, 99):.2f} ms"
+
+
+def http_latencies(port: int, matches, results: list) -> None:
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    for match in matches:
+        body = json.dumps(match)
+        start = time.perf_counter()
+        connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        json.loads(response.read())
+        results.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    start = time.perf_counter()
+    predictor = ModelPredictor()
+    print(f"startup {time.perf_counter() - start:.2f}s, model {type(predictor.model).__name__}")
+    matches = random_matches(predictor, args.requests)
+    if predictor.compiled is not None:
+        X = predictor.features(matches)
+        expected = predictor.model.predict_proba(pd.DataFrame(X, columns=predictor.columns))
+        assert np.allclose(predictor.compiled.predict_proba(X), expected), "compiled forest differs from the model"
+        print("compiled forest matches the model's predict_proba")
+
+    latencies = []
+    for match in matches:
+        start = time.perf_counter()
+        predictor.predict_batch([match])
+        latencies.append(time.perf_counter() - start)
+    print(f"in process, single match: {percentiles(latencies)}")
+
+    start = time.perf_counter()
+    predictor.predict_batch(matches)
+    elapsed = time.perf_counter() - start
+    print(f"in process, batch of {len(matches)}: {elapsed * 1000:.1f} ms ({len(matches) / elapsed:,.0f} matches/s)")
+
+    server = predictor.serve(port=0)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    http_latencies(port, matches, results)
+    print(f"http, single match, 1 client: {percentiles(results)}")
+
+    results = []
+    per_client = np.array_split(np.arange(len(matches)), args.clients)
+    clients = [threading.Thread(target=http_latencies, args=(port, [matches[i] for i in part], results))
+               for part in per_client]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    print(f"http, single match, {args.clients} clients: {percentiles(results)} "
+          f"({len(results) / elapsed:,.0f} requests/s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_ranking_parser.py
+"""
+Times the ranking page parsers on a synthetic 5000-row ATP rankings page and on saved
+pages, and checks that every parser returns the same rows as BeautifulSoup.
+
+Save a page with e.g. `open('page.html', 'w').write(driver.page_source)` and pass it with
+--pages to check the parsers against real markup.
+
+Usage: python -m benchmarks.bench_ranking_parser [--rows 5000] [--repeat 3] [--pages 'pages/*.html']
+"""
+import argparse
+import glob
+import html
+import time
+
+import numpy as np
+
+from datafetcher.ranking_parser import PARSERS, lxml_html, parse_ranking_page
+
+
+def synthetic_page(rows: int, seed: int = 0) -> str:
+    """
+    Builds a page shaped like the ATP rankings table: a header row, player rows with the
+    rank and name nested in other markup, accented names, entities, ties and rows that
+    are not players.
+    """
+    rng = np.random.default_rng(seed)
+    surnames = ['Alcaraz', 'Sinner', 'Djokovic', 'Zverev', 'Müller', "O'Connell", 'de Minaur', 'Auger-Aliassime']
+    parts = ['<html><head><title>Rankings</title></head><body><div class="nav"><span class="lastName">Menu</span></div>',
+             '<table class="mega-table desktop-table"><thead><tr><th class="rank">Rank</th><th>Player</th></tr></thead><tbody>']
+    rank = 0
+    for i in range(rows):
+        tied = rng.random() < 0.1 and rank > 0
+        rank = rank if tied else i + 1
+        surname = html.escape(f"{surnames[i % len(surnames)]}{i}")
+        parts.append(
+            f'<tr class="lower-row"><td class="rank bold heavy tiny-cell">\n  {"T" if tied else ""}{rank}\n</td>'
+            f'<td class="player bold heavy large-cell"><ul class="player-stats"><li class="avatar"><img src="/p/{i}.png"/></li>'
+            f'<li class="name center"><a href="/en/players/{i}/overview"><span class="firstName">A.</span> '
+            f'<span class="lastName">{surname}</span></a></li></ul></td>'
+            f'<td class="age small-cell">{20 + i % 15}</td><td class="points center small-cell">'
+            f'<a href="/points">{max(10000 - i * 2, 1):,}</a></td></tr>')
+        if i % 1000 == 999:
+            parts.append('<tr class="ad-row"><td colspan="6"><div class="ad">Advertisement</div></td></tr>')
+    parts.append('</tbody></table><footer><span class="lastName">Footer</span></footer></body></html>')
+    return ''.join(parts)
+
+
+def time_parsers(name: str, page: str, repeat: int) -> None:
+    expected = parse_ranking_page(page, parser='bs4')
+    timings = {}
+    for parser in PARSERS:
+        if parser == 'lxml' and lxml_html is None:
+            continue
+        parsed = parse_ranking_page(page, parser=parser)
+        assert parsed.equals(expected), f"{parser} parser differs from bs4 on {name}"
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse_ranking_page(page, parser=parser)
+        timings[parser] = (time.perf_counter() - start) / repeat
+    print(f"{name}: {len(expected)} rows, {int(expected['tied'].sum())} tied")
+    for parser, elapsed in timings.items():
+        print(f"  {parser:>6}: {elapsed * 1000:7.1f} ms/page ({timings['bs4'] / elapsed:.1f}x bs4)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--pages', help="Glob of saved ranking pages")
+    args = parser.parse_args()
+    if lxml_html is None:
+        print("lxml is not installed, skipping its parser")
+
+    time_parsers('synthetic page', synthetic_page(args.rows), args.repeat)
+    for path in sorted(glob.glob(args.pages)) if args.pages else []:
+        with open(path, 'r', encoding='utf-8') as f:
+            time_parsers(path, f.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
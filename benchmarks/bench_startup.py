@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+"""
+Measures the startup time of each cli.py subcommand, from a fresh interpreter until the
+command would start its work, against an eager startup that imports and creates every
+pipeline component up front, as Pipeline did before its components became lazy.
+
+Commands that read data (predict needs a trained model and profiles) are measured in
+--workdir; the others do not touch the data.
+
+Usage: python -m benchmarks.bench_startup [--commands process features train] [--repeat 5] [--workdir .]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMAND = """
+import time
+start = time.perf_counter()
+import cli
+def stop(command):
+    print(time.perf_counter() - start)
+    raise SystemExit(0)
+cli._startup_done = stop
+cli.main(['--log-level', 'ERROR'] + {argv!r})
+"""
+
+EAGER = """
+import time
+start = time.perf_counter()
+import logging
+logging.disable(logging.ERROR)
+from pipeline import Pipeline
+pipeline = Pipeline()
+for component in ('data_fetcher', 'data_preprocessor', 'data_combiner', 'feature_builder', 'model_trainer',
+                  'profile_builder'):
+    getattr(pipeline, component)
+import prediction.model_predictor
+print(time.perf_counter() - start)
+"""
+
+ARGUMENTS = {'predict': ['--home', '1', '--away', '2']}
+
+
+def measure(code: str, repeat: int, workdir: str) -> List[float]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else 'failed')
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commands', nargs='+',
+                        default=['rankings', 'process', 'combine', 'features', 'train', 'profiles', 'predict'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workdir', default='.')
+    args = parser.parse_args()
+
+    eager = statistics.median(measure(EAGER, args.repeat, args.workdir))
+    print(f"{'eager (all components)':>24}: {eager:.2f}s")
+    for command in args.commands:
+        try:
+            seconds = statistics.median(measure(COMMAND.format(argv=[command] + ARGUMENTS.get(command, [])),
+                                                args.repeat, args.workdir))
+        except RuntimeError as e:
+            print(f"{command:>24}: failed ({e})")
+            continue
+        print(f"{command:>24}: {seconds:.2f}s  ({eager / seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
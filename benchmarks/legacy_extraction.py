@@ -0,0 +1,112 @@
+# benchmarks/legacy_extraction.py
+"""
+The DataFrame-based cuptree extraction that CuptreeExtractor replaced, kept unchanged as
+the reference the extractor is benchmarked and tested against. Like the original, it
+mutates the cuptree JSON it is given, so pass it a copy.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+
+
+def process_cuptree_json(cuptree: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Extracts relevant columns from a cuptree JSON into a DataFrame with error handling."""
+    try:
+        columns = [
+            'id',
+            'name',
+            'tournament',
+            'rounds',
+        ]
+
+        df = pd.DataFrame(cuptree)
+        # Only keep the specified columns if they exist
+        df = df[[col for col in columns if col in df.columns]]
+
+        return df
+    except Exception as e:
+        logging.error(f"Error processing cuptree JSON: {e}")
+        return pd.DataFrame()
+
+
+def get_all_participants(cuptrees: pd.DataFrame) -> Any:
+    """
+    Extracts all participants from the 'rounds' column of the cuptree DataFrame.
+    Returns a DataFrame with all participants flattened.
+    """
+    participants_list = []
+
+    for rounds in cuptrees['rounds']:
+        for round_item in rounds:
+            blocks = round_item.get('blocks', [])
+            for block in blocks:
+                participants = block.get('participants', {})
+                for participant in participants:
+                    team = participant.get('team', {})
+                    team['winner'] = participant.get('winner', None)
+                    team['order'] = participant.get('order', None)
+                    team['teamSeed'] = participant.get('teamSeed', None)
+                    participants_list.append(team)
+
+    return pd.DataFrame(participants_list)[['name', 'slug', 'shortName', 'gender', 'nameCode', 'ranking', 'disabled', 'national', 'id']].drop_duplicates()
+
+
+def extract_games_from_cuptree(cuptrees: pd.DataFrame, map_round_description: Callable[[str], str],
+                               validate_score_format: Callable[[str], bool]) -> pd.DataFrame:
+    """
+    Extracts and flattens all games from the 'rounds' column of the cuptree DataFrame.
+    Returns a DataFrame with one row per game, including home and away participant IDs.
+    """
+    games_list = []
+
+    for _, cuptree in cuptrees.iterrows():
+        tournamentName = cuptree['tournament']['name']
+        uniqueTournament = cuptree['tournament']['uniqueTournament']['name']
+        rounds = cuptree['rounds']
+        if not isinstance(rounds, list):
+            continue
+        for round_item in rounds:
+            round_description = round_item.get('description', {})
+            blocks = round_item.get('blocks', [])
+            for block in blocks:
+                if block.get('result').lower() in ['retired', 'walkover', '0:0']:
+                    continue
+                elif block.get('result') in ['home won', 'away won', 'on-going']:
+                    block['result'] = block['homeTeamScore'] + ':' + block['awayTeamScore']
+                if not validate_score_format(block.get('result')):
+                    logging.error(f"Invalid score format: {block.get('result')}")
+                participants = block.get('participants', [])
+                block_copy = block.copy()
+                block_copy['home_id'] = participants[0]['team'].get('id')
+                if len(participants) == 1:
+                    block_copy['away_id'] = None
+                else:
+                    block_copy['away_id'] = participants[1]['team'].get('id')
+                block_copy['round_description'] = map_round_description(round_description)
+                block_copy['tournamentName'] = tournamentName
+                block_copy['uniqueTournament'] = uniqueTournament
+
+                games_list.append(block_copy)
+
+    if not games_list:
+        return pd.DataFrame()
+
+    games_df = pd.json_normalize(games_list)
+
+    games_df['seriesStartDate'] = pd.to_datetime(games_df.get('seriesStartDate', None), errors='coerce')
+
+    return games_df[['finished', 'result', 'homeTeamScore',
+                     'awayTeamScore',
+                     'id', 'events', 'seriesStartDate',
+                     'home_id', 'away_id', 'round_description', 'tournamentName', 'uniqueTournament']]
+
+
+def legacy_extract(cuptrees: List[Dict[str, Any]], map_round_description: Callable[[str], str],
+                   validate_score_format: Callable[[str], bool]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns (participants, games) the way TennisDataProcessor produced them before CuptreeExtractor.
+    """
+    processed = process_cuptree_json(cuptrees)
+    return get_all_participants(processed), extract_games_from_cuptree(processed, map_round_description,
+                                                                      validate_score_format)
@@ -0,0 +1,204 @@
+# benchmarks/synthetic_data.py
+"""
+Generates synthetic SofaScore cuptree files, cuptrees_{tournament id}_{season id}.json,
+in the format the fetcher saves and TennisDataProcessor reads: a list of cup trees with
+rounds, blocks and participants. Every season has a main draw and optionally a
+qualification draw whose winners enter the main draw. Players come from a fixed pool
+with a hidden skill, so stronger players win more often, and some matches end in a
+retirement or a walkover.
+
+Usage: python -m benchmarks.synthetic_data --out DIR [--tournaments 4] [--seasons 10]
+       [--draw-size 128] [--qualifying-draw-size 128] [--players 1000] [--seed 0]
+"""
+import argparse
+import json
+import math
+import os
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+TOURNAMENTS = ['Australian Open', 'Roland Garros', 'Wimbledon', 'US Open']
+FIRST_NAMES = ['Carlos', 'Jannik', 'Novak', 'Alexander', 'Daniil', 'Andrey', 'Casper', 'Holger', 'Stefanos', 'Taylor',
+               'Hubert', 'Alex', 'Grigor', 'Tommy', 'Ben', 'Frances', 'Félix', 'Lorenzo', 'Sebastián', 'Jiří',
+               'Jan-Lennard', 'Juan Martín', 'Stan', 'Rafael', 'Roger', 'Andy', 'Kei', 'Nick', 'Dominic', 'Marin']
+LAST_NAMES = ['Alcaraz', 'Sinner', 'Djokovic', 'Zverev', 'Medvedev', 'Rublev', 'Ruud', 'Rune', 'Tsitsipas', 'Fritz',
+              'Hurkacz', 'de Minaur', 'Dimitrov', 'Paul', 'Shelton', 'Tiafoe', 'Auger-Aliassime', 'Musetti', 'Báez',
+              'Lehečka', 'Struff', 'del Potro', 'Wawrinka', 'Nadal', 'Federer', 'Murray', 'Nishikori', 'Kyrgios',
+              'Thiem', 'Čilić', 'Müller', 'Martínez', 'García', 'Smith', 'Johnson', 'Nagal', 'Popyrin', 'Cerúndolo']
+COUNTRIES = [('ES', 'Spain'), ('IT', 'Italy'), ('RS', 'Serbia'), ('DE', 'Germany'), ('US', 'USA'), ('FR', 'France'),
+             ('AU', 'Australia'), ('AR', 'Argentina'), ('GB', 'United Kingdom'), ('CZ', 'Czechia')]
+MAIN_ROUNDS = {128: 'Round of 128', 64: 'Round of 64', 32: 'Round of 32', 16: 'Round of 16',
+               8: 'Quarterfinals', 4: 'Semifinals', 2: 'Final'}
+
+
+def _slugify(text: str) -> str:
+    return ''.join(c if c.isalnum() else '-' for c in text.lower()).strip('-')
+
+
+class CuptreeGenerator:
+    """
+    Builds seasons of single-elimination draws from a pool of players.
+
+    Args:
+        players: Size of the player pool. Names repeat across players, as in the real data.
+        draw_size: Main draw size, a power of two.
+        qualifying_draw_size: Qualification draw size, a power of two, or 0 for none. The
+            qualifying rounds are played until draw_size // 8 qualifiers are left.
+        retirement_rate: Share of matches that end in a retirement.
+        walkover_rate: Share of matches that are walkovers.
+        seed: Random seed; the same arguments always give the same files.
+    """
+    def __init__(self, players: int = 1000, draw_size: int = 128, qualifying_draw_size: int = 128,
+                 retirement_rate: float = 0.02, walkover_rate: float = 0.01, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.draw_size = draw_size
+        self.qualifying_draw_size = qualifying_draw_size
+        self.retirement_rate = retirement_rate
+        self.walkover_rate = walkover_rate
+        self.players = [self._player(i) for i in range(max(players, draw_size + qualifying_draw_size))]
+        self._block_id = 0
+        self._participant_id = 0
+
+    def _player(self, i: int) -> Dict[str, Any]:
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        alpha2, country = self.rng.choice(COUNTRIES)
+        name = f"{first} {last}"
+        return {
+            'name': name, 'slug': _slugify(f"{last} {first}"), 'shortName': f"{first[0]}. {last}", 'gender': 'M',
+            'nameCode': ''.join(c for c in last.upper() if c.isalpha())[:3], 'ranking': i + 1, 'disabled': False,
+            'national': False, 'id': 10000 + i, 'country': {'alpha2': alpha2, 'name': country},
+            # Hidden strength, removed from the written team; stronger players have lower ids
+            'skill': -math.log1p(i) + self.rng.gauss(0, 0.5),
+        }
+
+    def _team(self, player: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in player.items() if key != 'skill'}
+
+    def _block(self, home: Dict, away: Dict, order: int, matches_in_round: int, start: str) -> Tuple[Dict, Dict]:
+        """
+        Plays a best-of-five match and returns the block and the winner.
+        """
+        self._block_id += 1
+        home_wins = self.rng.random() < 1 / (1 + math.exp(away['skill'] - home['skill']))
+        loser_sets = self.rng.choice([0, 1, 1, 2, 2])
+        home_sets, away_sets = (3, loser_sets) if home_wins else (loser_sets, 3)
+        draw = self.rng.random()
+        if draw < self.walkover_rate:
+            result, home_sets, away_sets = 'walkover', 0, 0
+        elif draw < self.walkover_rate + self.retirement_rate:
+            result = 'retired'
+            home_sets, away_sets = (min(home_sets, 2), away_sets) if home_wins else (home_sets, min(away_sets, 2))
+        elif draw < 0.2:
+            result = 'home won' if home_wins else 'away won'
+        else:
+            result = f"{home_sets}:{away_sets}"
+        participants = []
+        for team, won, side in ((home, home_wins, 1), (away, not home_wins, 2)):
+            self._participant_id += 1
+            participants.append({'team': self._team(team), 'winner': won, 'order': side, 'id': self._participant_id})
+        block = {
+            'blockId': self._block_id, 'finished': True, 'matchesInRound': matches_in_round, 'order': order,
+            'result': result, 'homeTeamScore': str(home_sets), 'awayTeamScore': str(away_sets),
+            'participants': participants, 'hasNextRoundLink': True, 'events': [self._block_id],
+            'seriesStartDate': start, 'id': self._block_id,
+        }
+        return block, home if home_wins else away
+
+    def _draw(self, entrants: List[Dict], descriptions: List[str], start_day: int, year: int,
+              stop_at: int = 1) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Plays rounds until stop_at players are left. Returns the rounds and the survivors.
+        """
+        rounds = []
+        players = entrants
+        day = start_day
+        while len(players) > stop_at:
+            description = descriptions[len(rounds)]
+            start = (date(year, 1, 1) + timedelta(days=day)).isoformat() + 'T00:00:00+00:00'
+            blocks, winners = [], []
+            for i in range(0, len(players), 2):
+                block, winner = self._block(players[i], players[i + 1], i // 2 + 1, len(players) // 2, start)
+                blocks.append(block)
+                winners.append(winner)
+            rounds.append({'order': len(rounds) + 1, 'type': 1, 'description': description, 'blocks': blocks})
+            players = winners
+            day += 2
+        return rounds, players
+
+    def season(self, tournament: int, season: int, year: int) -> List[Dict[str, Any]]:
+        """
+        Returns the cup trees of one tournament season: qualification and main draw.
+        """
+        name = TOURNAMENTS[tournament % len(TOURNAMENTS)]
+        meta = {'name': f"{name} {year}, Men, Singles", 'slug': _slugify(name),
+                'uniqueTournament': {'name': name, 'slug': _slugify(name), 'id': tournament + 1}}
+        start_day = 14 + 91 * (tournament % 4)
+        # Stronger players are more likely to get a direct entry
+        pool = sorted(self.rng.sample(self.players, self.draw_size + self.qualifying_draw_size),
+                      key=lambda p: p['skill'] + self.rng.gauss(0, 0.7), reverse=True)
+        cuptrees = []
+        qualifiers = []
+        if self.qualifying_draw_size:
+            entrants = pool[self.draw_size - self.draw_size // 8:][:self.qualifying_draw_size]
+            self.rng.shuffle(entrants)
+            descriptions = [f"Qualification round {i + 1}" for i in range(10)]
+            rounds, qualifiers = self._draw(entrants, descriptions, start_day - 7, year, stop_at=self.draw_size // 8)
+            rounds[-1]['description'] = 'Qualification final'
+            cuptrees.append({'id': season * 10 + 1, 'name': 'Qualification', 'tournament': meta,
+                             'currentRound': len(rounds), 'rounds': rounds})
+        direct = pool[:self.draw_size - len(qualifiers)]
+        entrants = direct + qualifiers
+        self.rng.shuffle(entrants)
+        descriptions = [MAIN_ROUNDS.get(size, f"1/{size // 2}") for size in _sizes(self.draw_size)]
+        rounds, _ = self._draw(entrants, descriptions, start_day, year)
+        cuptrees.append({'id': season * 10 + 2, 'name': 'Main draw', 'tournament': meta,
+                         'currentRound': len(rounds), 'rounds': rounds})
+        return cuptrees
+
+    def write(self, out_dir: str, tournaments: int, seasons: int, first_year: int = 2000) -> List[str]:
+        """
+        Writes tournaments x seasons cuptree files to out_dir and returns their paths.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for tournament in range(tournaments):
+            for season in range(seasons):
+                season_id = 1000 * (tournament + 1) + season
+                cuptrees = self.season(tournament, season_id, first_year + season)
+                path = os.path.join(out_dir, f"cuptrees_{tournament + 1}_{season_id}.json")
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(cuptrees, f)
+                paths.append(path)
+        return paths
+
+
+def _sizes(draw_size: int) -> List[int]:
+    sizes = []
+    while draw_size >= 2:
+        sizes.append(draw_size)
+        draw_size //= 2
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help="Directory for the cuptree files, e.g. datafetcher/data")
+    parser.add_argument('--tournaments', type=int, default=4)
+    parser.add_argument('--seasons', type=int, default=10)
+    parser.add_argument('--draw-size', type=int, default=128)
+    parser.add_argument('--qualifying-draw-size', type=int, default=128)
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--retirement-rate', type=float, default=0.02)
+    parser.add_argument('--walkover-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    generator = CuptreeGenerator(players=args.players, draw_size=args.draw_size,
+                                 qualifying_draw_size=args.qualifying_draw_size, retirement_rate=args.retirement_rate,
+                                 walkover_rate=args.walkover_rate, seed=args.seed)
+    paths = generator.write(args.out, args.tournaments, args.seasons)
+    print(f"Wrote {len(paths)} cuptree files to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# cli.py
+"""
+Command-line entry point for the tennis pipeline, one subcommand per stage:
+
+    python cli.py fetch | rankings | process | combine | features | train | profiles | predict | run
+
+Every subcommand imports only the modules it needs, inside its handler, so e.g. `features`
+never loads sklearn and `train` never loads Selenium or starts a browser. The time from
+loading this module until the command begins its work is logged as its startup time.
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import List, Optional
+
+_LOADED = time.perf_counter()
+
+CHUNK_SIZE_HELP = "Stream the data in chunks of this many rows, with memory bounded by the chunk size."
+
+
+def _startup_done(command: str) -> None:
+    """
+    Logs the imports and setup time before the command starts its work.
+    """
+    logging.info(f"{command}: startup took {time.perf_counter() - _LOADED:.2f}s")
+
+
+def _read_dates(path: str) -> List[str]:
+    """
+    Reads ranking weeks from a file holding a Python or JSON list, or one date per line.
+    """
+    import ast
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        return [str(date) for date in ast.literal_eval(text)]
+    except (ValueError, SyntaxError):
+        return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def fetch(args: argparse.Namespace) -> None:
+    from datafetcher.datafetcher import TennisDataFetcher
+
+    fetcher = TennisDataFetcher(transport=args.transport, max_workers=args.workers)
+    _startup_done('fetch')
+    try:
+        if args.retry_failed:
+            fetcher.reset_failed()
+        if args.resume:
+            fetcher.resume()
+        else:
+            fetcher.get_all_data(max_tournaments=args.max_tournaments)
+    finally:
+        fetcher.close()
+
+
+def rankings(args: argparse.Namespace) -> None:
+    from datafetcher.ranking_store import RankingStore
+
+    if args.dates_file:
+        from datafetcher.rankingfetcher import RankingScraper
+
+        scraper = RankingScraper(_read_dates(args.dates_file), parser=args.parser)
+        _startup_done('rankings')
+        try:
+            scraper.create_dataframe(save=True, workers=args.workers)
+        finally:
+            scraper.quit()
+    else:
+        _startup_done('rankings')
+    RankingStore().consolidate()
+
+
+def process(args: argparse.Namespace) -> None:
+    from dataprocessor.dataprocessor import TennisDataProcessor
+
+    if args.chunk_size and args.incremental:
+        raise SystemExit("process --incremental cannot be combined with --chunk-size")
+    processor = TennisDataProcessor()
+    _startup_done('process')
+    if args.chunk_size:
+        processor.process_in_chunks(args.chunk_size, max_cuptrees=args.max_cuptrees, workers=args.workers)
+    else:
+        processor.process_all_data(max_cuptrees=args.max_cuptrees, workers=args.workers, incremental=args.incremental)
+
+
+def combine(args: argparse.Namespace) -> None:
+    from datacombiner.datacombiner import TennisDataCombiner
+
+    combiner = TennisDataCombiner()
+    _startup_done('combine')
+    if args.chunk_size:
+        combiner.combine_in_chunks(args.chunk_size)
+    else:
+        combiner.combine_data(save=True)
+
+
+def features(args: argparse.Namespace) -> None:
+    from features.feature_builder import FeatureBuilder
+
+    builder = FeatureBuilder()
+    _startup_done('features')
+    if args.chunk_size:
+        builder.build_features_in_chunks(args.chunk_size)
+    else:
+        builder.build_features(save=True)
+
+
+def train(args: argparse.Namespace) -> None:
+    from modeling.model_trainer import ModelTrainer
+
+    trainer = ModelTrainer(search=args.search, n_candidates=args.n_candidates, n_splits=args.n_splits)
+    _startup_done('train')
+    trainer.train_model(save=True)
+
+
+def profiles(args: argparse.Namespace) -> None:
+    from prediction.profiles import ProfileBuilder
+
+    builder = ProfileBuilder()
+    _startup_done('profiles')
+    builder.build()
+
+
+def predict(args: argparse.Namespace) -> None:
+    from prediction.model_predictor import ModelPredictor
+
+    predictor = ModelPredictor(max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    _startup_done('predict')
+    if args.serve:
+        predictor.serve(args.host, args.port).serve_forever()
+        return
+    if args.home is None or args.away is None:
+        raise SystemExit("predict needs --home and --away, or --serve")
+    probability = predictor.predict_match(args.home, args.away, date=args.date, tournament=args.tournament,
+                                          round=args.round)
+    print(f"{probability:.4f}")
+
+
+def run(args: argparse.Namespace) -> None:
+    from pipeline import Pipeline
+
+    pipeline = Pipeline(max_tournaments=args.max_tournaments, search=args.search, profile=args.profile,
+                        report_path=args.report, chunk_size=args.chunk_size)
+    _startup_done('run')
+    actions = pipeline.run_cached(force=args.force, dry_run=args.dry_run, fetch=not args.no_fetch)
+    for stage, action in actions.items():
+        print(f"{stage}: {action}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Tennis match prediction pipeline.")
+    parser.add_argument('--log-level', default='INFO', help="Logging level, e.g. DEBUG or WARNING.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('fetch', help="Fetch tournaments, seasons and cup trees from SofaScore.")
+    command.add_argument('--max-tournaments', type=int, default=10)
+    command.add_argument('--transport', choices=['selenium', 'http'], default='selenium')
+    command.add_argument('--workers', type=int, default=8, help="Concurrent requests with the http transport.")
+    command.add_argument('--resume', action='store_true', help="Only fetch what an interrupted crawl left.")
+    command.add_argument('--retry-failed', action='store_true',
+                         help="Retry requests that ran out of attempts in earlier crawls.")
+    command.set_defaults(handler=fetch)
+
+    command = commands.add_parser('rankings', help="Scrape weekly ATP rankings and consolidate them.")
+    command.add_argument('--dates-file', help="Weeks to scrape; without it, only consolidates the files on disk.")
+    command.add_argument('--workers', type=int, default=1)
+    command.add_argument('--parser', choices=['bs4', 'lxml', 'stream'],
+                         help="Ranking page parser (default: lxml when installed, else stream).")
+    command.set_defaults(handler=rankings)
+
+    command = commands.add_parser('process', help="Extract games and participants from the cup trees.")
+    command.add_argument('--max-cuptrees', type=int)
+    command.add_argument('--workers', type=int, default=1)
+    command.add_argument('--incremental', action='store_true', help="Only process new or changed files.")
+    command.add_argument('--chunk-size', type=int, help=CHUNK_SIZE_HELP)
+    command.set_defaults(handler=process)
+
+    command = commands.add_parser('combine', help="Join games and participants into matches.")
+    command.add_argument('--chunk-size', type=int, help=CHUNK_SIZE_HELP)
+    command.set_defaults(handler=combine)
+
+    command = commands.add_parser('features', help="Build the model features.")
+    command.add_argument('--chunk-size', type=int, help=CHUNK_SIZE_HELP)
+    command.set_defaults(handler=features)
+
+    command = commands.add_parser('train', help="Train and save the model.")
+    command.add_argument('--search', action='store_true',
+                         help="Successive-halving search over model families.")
+    command.add_argument('--n-candidates', type=int, default=60)
+    command.add_argument('--n-splits', type=int, default=5)
+    command.set_defaults(handler=train)
+
+    command = commands.add_parser('profiles', help="Precompute the player profiles used for prediction.")
+    command.set_defaults(handler=profiles)
+
+    command = commands.add_parser('predict', help="Predict a match, or serve predictions over HTTP.")
+    command.add_argument('--home', type=int, help="Home player id.")
+    command.add_argument('--away', type=int, help="Away player id.")
+    command.add_argument('--date', help="Match date, YYYY-MM-DD (default today).")
+    command.add_argument('--tournament', help="Tournament name, for the surface.")
+    command.add_argument('--round', help="Round, e.g. QF.")
+    command.add_argument('--serve', action='store_true', help="Serve POST /predict over HTTP.")
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8000)
+    command.add_argument('--max-batch', type=int, default=256)
+    command.add_argument('--max-wait-ms', type=float, default=0.0)
+    command.set_defaults(handler=predict)
+
+    command = commands.add_parser('run', help="Run the stages that are out of date.")
+    command.add_argument('--max-tournaments', type=int, default=10)
+    command.add_argument('--force', action='append', default=[], metavar='STAGE',
+                         help="Rerun a stage even if it is up to date (repeatable, or 'all').")
+    command.add_argument('--dry-run', action='store_true', help="List what would run without running it.")
+    command.add_argument('--no-fetch', action='store_true', help="Use the cuptrees already on disk.")
+    command.add_argument('--search', action='store_true')
+    command.add_argument('--profile', action='append', default=[], metavar='STAGE',
+                         help="Run a stage under cProfile (repeatable, or 'all').")
+    command.add_argument('--report', help="Path of the JSON run report.")
+    command.add_argument('--chunk-size', type=int, help=CHUNK_SIZE_HELP)
+    command.set_defaults(handler=run)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
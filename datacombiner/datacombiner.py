@@ -1,106 +1,168 @@
+import contextlib
 import pandas as pd
 import numpy as np
 import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from storage.dataset_store import DatasetStore
+from storage.schemas import COMBINED_SCHEMA, GAMES_SCHEMA, PARTICIPANTS_SCHEMA, apply_schema
+from datacombiner.player_table import PlayerTable
+from datacombiner.symmetric import SymmetricGames
 
 class TennisDataCombiner:
     """
     A class to create and manage a dataset for training a machine learning model.
     """
 
-    def __init__(self, ):
+    def __init__(self, store: Optional[DatasetStore] = None):
         """
-        Initialize the TennisDataCombiner with data and labels.
+        Initialize the TennisDataCombiner.
+        Inputs are passed to combine_data, or loaded from the processor's
+        checkpoint when combine_data is called without them.
 
         Args:
-            data (list or np.ndarray): The input features for training.
-            labels (list or np.ndarray): The corresponding labels for the data.
+            store (DatasetStore): Storage used for checkpoints.
         """
 
-        # Load participants from a CSV file if available
+        self.store = store or DatasetStore()
+        self.participants = None
+        self.games = None
+        self.players: Optional[PlayerTable] = None
+        self.missing_players = []
+
+    def load_inputs(self):
+        """
+        Loads participants and games from the processor's checkpoint.
+        """
         try:
-            self.participants = pd.read_csv("dataprocessor/data/participants.csv")
-            self.games = pd.read_csv("dataprocessor/data/games.csv")
+            self.participants = self.store.read("dataprocessor/data/participants", schema=PARTICIPANTS_SCHEMA)
+            self.games = self.store.read("dataprocessor/data/games", schema=GAMES_SCHEMA)
         except FileNotFoundError as e:
-            logging.error("Participants or games data file not found. Please ensure the files exist in the specified path.", e)
+            logging.error(f"Participants or games data file not found. Please ensure the files exist in the specified path. {e}")
+            raise
 
     def participant_features(self):
-        part_df = self.participants.copy()
-        np.random.seed(42)
-        num_participants = part_df.shape[0]
-        random_birthdates = pd.to_datetime(
-            np.random.randint(
-                pd.Timestamp("1970-01-01").value // 10**9,
-                pd.Timestamp("2005-12-31").value // 10**9,
-                num_participants
-            ),
-            unit='s'
-        ).normalize()  # Set time to 00:00:00
-        part_df['birthdate'] = random_birthdates
-        return part_df
+        """
+        Returns the player table for the current participants, with birthdates.
+        Players and their birthdates are kept from the table saved by previous runs.
+        """
+        existing = self.players or PlayerTable.load(self.store)
+        self.players = PlayerTable.from_participants(self.participants, existing=existing)
+        return self.players
 
     def symmetrize_games(self, df):
         # Symmetrize matches: add a row for each match with home/away swapped and result reversed
-        def reverse_result(result):
-            # Handles results like '3:1', '2:3', etc.
-            if isinstance(result, str) and ':' in result:
-                parts = result.split(':')
-                return f"{parts[1]}:{parts[0]}"
-            return result
-
-        df_train_sym = df.copy()
-        swapped = df.copy()
-        # Swap all columns containing 'home' with their corresponding 'away' columns and vice versa
-        for col in df.columns:
-            if 'home' in col:
-                away_col = col.replace('home', 'away')
-                if away_col in df.columns:
-                    swapped[col], swapped[away_col] = df[away_col], df[col]
-            elif 'away' in col:
-                home_col = col.replace('away', 'home')
-                if home_col in df.columns:
-                    swapped[col], swapped[home_col] = df[home_col], df[col]
-
-        swapped['result'] = df['result'].apply(reverse_result)
-
-        # Concatenate original and swapped
-        df_train_sym = pd.concat([df, swapped], ignore_index=True)
-        df_train_sym.reset_index(drop=True, inplace=True)
-
-        logging.info(f"Original matches: {len(df)}, Symmetrized matches: {len(df_train_sym)}")
-        return df_train_sym
-
-    def combine_data(self):
-        """
-        Combine data from participants and games into a single DataFrame.
-        """
-        game_df = self.games.copy()
-        part_df = self.participant_features()[['id', 'name', 'birthdate']]
-
-        # Merge the two DataFrames on 'id'
-        combined_df = pd.merge(
-            game_df, 
-            part_df.add_suffix('_home'),  # Add suffix to all columns in right table
-            left_on='home_id', 
-            right_on='id_home', 
-            suffixes=('', ''), 
-            how='inner'
-        )
-        combined_df = pd.merge(
-            combined_df, 
-            part_df.add_suffix('_away'),  # Add suffix to all columns in right table
-            left_on='away_id', 
-            right_on='id_away', 
-            suffixes=('', ''), 
-            how='inner'
-        )
-
-        sym_df = self.symmetrize_games(combined_df)
-
-        sym_df.to_csv("datacombiner/data/combined.csv", index=False)
-        
-        logging.info("Features saved to datacombiner/data/combined.csv")
-
-        return sym_df
+        return SymmetricGames(df).materialize()
+
+    def combine_data(self, participants: Optional[pd.DataFrame] = None, games: Optional[pd.DataFrame] = None,
+                     save: bool = True) -> SymmetricGames:
+        """
+        Combine data from participants and games into a single dataset.
+        Each match is stored once; the returned SymmetricGames adds the mirrored rows on demand.
+
+        Args:
+            participants, games: Output of TennisDataProcessor.process_all_data. Loaded from
+                disk when not given.
+            save: Whether to write the matches to datacombiner/data/matches and the player
+                table to datacombiner/data/players.
+        """
+        if participants is not None and games is not None:
+            self.participants = participants
+            self.games = games
+        elif self.participants is None or self.games is None:
+            self.load_inputs()
+
+        players = self.participant_features()
+        combined_df, self.missing_players = self.attach_players(players, self.games)
+
+        if save:
+            players.save(self.store)
+            combined_df = self.store.write(combined_df, "datacombiner/data/matches", schema=COMBINED_SCHEMA)
+        else:
+            combined_df = apply_schema(combined_df, COMBINED_SCHEMA)
+
+        return SymmetricGames(combined_df)
+
+    def attach_players(self, players: PlayerTable, games: pd.DataFrame) -> Tuple[pd.DataFrame, List[int]]:
+        """
+        Adds both players' id, name and birthdate to games. Byes (a side without an id) and
+        games with a player missing from the table are dropped; returns the matches and the
+        ids of the missing players.
+        """
+        game_df = games.reset_index(drop=True)
+
+        byes = (game_df['home_id'].isna() | game_df['away_id'].isna()).to_numpy()
+        if byes.any():
+            logging.info(f"Dropping {int(byes.sum())} of {len(game_df)} games without two players (byes)")
+
+        # Games whose players are not in the participants cannot be combined; report them
+        home_missing = (players.positions(game_df['home_id']) < 0) & ~byes
+        away_missing = (players.positions(game_df['away_id']) < 0) & ~byes
+        missing_players = sorted({int(i) for i in game_df.loc[home_missing, 'home_id']}
+                                 | {int(i) for i in game_df.loc[away_missing, 'away_id']})
+        if missing_players:
+            logging.warning(f"Dropping {int((home_missing | away_missing).sum())} of {len(game_df)} games with "
+                            f"unknown players ({int(home_missing.sum())} home, {int(away_missing.sum())} away, "
+                            f"{len(missing_players)} distinct ids, e.g. {missing_players[:10]})")
+
+        dropped = byes | home_missing | away_missing
+        if dropped.any():
+            game_df = game_df[~dropped].reset_index(drop=True)
+
+        combined_df = players.attach(game_df, 'home_id', ['id', 'name', 'birthdate'], '_home')
+        combined_df = players.attach(combined_df, 'away_id', ['id', 'name', 'birthdate'], '_away')
+        return combined_df, missing_players
+
+    def stored_chunks(self, chunk_size: int) -> Iterator[Dict[str, Optional[pd.DataFrame]]]:
+        """
+        Yields the processor's checkpoint in chunks like TennisDataProcessor.iter_processed:
+        all participants with the first chunk, then chunk_size games at a time.
+        """
+        participants = self.store.read("dataprocessor/data/participants", schema=PARTICIPANTS_SCHEMA)
+        for games in self.store.iter_batches("dataprocessor/data/games", chunk_size):
+            yield {"participants": participants, "games": games}
+            participants = None
+
+    def iter_combined(self, chunks: Iterable[Dict[str, Optional[pd.DataFrame]]],
+                      save: bool = True) -> Iterator[pd.DataFrame]:
+        """
+        Streaming counterpart of combine_data: combines each chunk of participants and games
+        as it arrives and yields its matches, so only one chunk is held at a time besides the
+        player table. The player table grows with the participants of every chunk, and a
+        game gets its players' attributes as known when its chunk arrives.
+
+        Args:
+            chunks: Dictionaries with "participants" (or None when there are no new ones) and
+                "games", e.g. from TennisDataProcessor.iter_processed or stored_chunks.
+            save: Whether to append the matches to datacombiner/data/matches as they are
+                yielded and write the player table at the end. The stored outputs are only
+                replaced once every chunk has been consumed.
+        """
+        players = self.players or PlayerTable.load(self.store)
+        missing = set()
+        with contextlib.ExitStack() as stack:
+            writer = stack.enter_context(self.store.writer("datacombiner/data/matches", schema=COMBINED_SCHEMA)) if save else None
+            for chunk in chunks:
+                if chunk["participants"] is not None and len(chunk["participants"]):
+                    players = PlayerTable.from_participants(chunk["participants"], existing=players)
+                    self.players = players
+                if players is None:
+                    raise ValueError("The first chunk has no participants and there is no stored player table")
+                combined_df, missing_players = self.attach_players(players, chunk["games"])
+                missing.update(missing_players)
+                combined_df = writer.write(combined_df) if writer is not None else apply_schema(combined_df, COMBINED_SCHEMA)
+                yield combined_df
+
+        self.missing_players = sorted(missing)
+        if save and players is not None:
+            players.save(self.store)
+
+    def combine_in_chunks(self, chunk_size: int) -> int:
+        """
+        Combines the processor's checkpoint chunk by chunk into datacombiner/data/matches,
+        with memory bounded by chunk_size instead of the number of games. Returns the number
+        of matches.
+        """
+        return sum(len(matches) for matches in self.iter_combined(self.stored_chunks(chunk_size)))
 
 if __name__ == "__main__":
     tts = TennisDataCombiner()
@@ -0,0 +1,244 @@
+# datacombiner/name_resolver.py
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage.dataset_store import DatasetStore
+from storage.schemas import NAME_MAPPING_SCHEMA, apply_schema
+
+MATCHED = 'matched'
+AMBIGUOUS = 'ambiguous'
+UNMATCHED = 'unmatched'
+
+# Candidate scores by how the ranking name matched the participant
+SHORT_NAME_SCORE = 1.0   # identical to the participant's shortName, e.g. "C. Alcaraz"
+LAST_NAME_SCORE = 0.9    # initial and the last word of the full name
+COMPOUND_NAME_SCORE = 0.85  # initial and a multi-word surname, e.g. "J. Del Potro"
+SURNAME_ONLY_SCORE = 0.5  # surname matches but the initial differs
+
+
+def name_tokens(name) -> List[str]:
+    """
+    Lowercases name, strips accents and punctuation and splits it into words.
+    """
+    if not isinstance(name, str):
+        return []
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", ' ', name).split()
+
+
+def ranking_key(name) -> Optional[Tuple[str, str]]:
+    """
+    Returns the (initial, surname) block key of a ranking name like "J. M. Del Potro".
+    """
+    tokens = name_tokens(name)
+    if len(tokens) < 2:
+        return None
+    surname = tokens[1:]
+    # Further initials belong to the given names
+    while len(surname) > 1 and len(surname[0]) == 1:
+        surname = surname[1:]
+    return tokens[0][0], ''.join(surname)
+
+
+class NameResolver:
+    """
+    Maps the abbreviated player names of the ATP rankings to SofaScore participant ids.
+
+    Participants are indexed by (initial, surname) block keys: one for their shortName and
+    one for every way of splitting their full name into given names and surname. A ranking
+    name is only compared with the participants in its own block (or, failing that, with
+    those sharing its surname), instead of with every participant.
+
+    Candidates are scored by how they matched. The confidence of the best candidate is its
+    score minus that of the runner-up, so two equally good candidates give an ambiguous
+    result; the players' rankings break such ties where available.
+
+    The mapping is persisted with its confidence and status, and names that were resolved
+    before are not resolved again unless new participants arrived for unresolved ones.
+    """
+    MAPPING_PATH = 'datacombiner/data/name_mapping'
+    REPORT_PATH = 'datacombiner/data/name_resolution_report.json'
+
+    def __init__(self, store: Optional[DatasetStore] = None, min_confidence: float = 0.5):
+        self.store = store or DatasetStore()
+        self.min_confidence = min_confidence
+        self.blocks: Dict[Tuple[str, str], Dict[int, float]] = defaultdict(dict)
+        self.surnames: Dict[str, set] = defaultdict(set)
+        self.participants: Optional[pd.DataFrame] = None
+
+    def build_index(self, participants: pd.DataFrame) -> None:
+        """
+        Indexes participants (id, name, shortName, ranking) by block key.
+        """
+        self.participants = participants.drop_duplicates('id', keep='last').set_index('id')
+        self.blocks.clear()
+        self.surnames.clear()
+        for pid, name, short_name in zip(participants['id'], participants['name'], participants['shortName']):
+            if pd.isna(pid):
+                continue
+            pid = int(pid)
+            tokens = name_tokens(name)
+            for split in range(1, len(tokens)):
+                key = (tokens[0][0], ''.join(tokens[split:]))
+                score = LAST_NAME_SCORE if split == len(tokens) - 1 else COMPOUND_NAME_SCORE
+                self._add(key, pid, score)
+            key = ranking_key(short_name)
+            if key is not None:
+                self._add(key, pid, LAST_NAME_SCORE)
+
+    def _add(self, key: Tuple[str, str], pid: int, score: float) -> None:
+        block = self.blocks[key]
+        block[pid] = max(block.get(pid, 0.0), score)
+        self.surnames[key[1]].add(pid)
+
+    def candidates(self, name: str) -> Dict[int, float]:
+        """
+        Scores the participants in the block of a ranking name.
+        """
+        key = ranking_key(name)
+        if key is None:
+            return {}
+        scored = dict(self.blocks.get(key, {}))
+        tokens = name_tokens(name)
+        for pid in list(scored):
+            if name_tokens(self.participants.at[pid, 'shortName']) == tokens:
+                scored[pid] = SHORT_NAME_SCORE
+        if not scored:
+            scored = {pid: SURNAME_ONLY_SCORE for pid in self.surnames.get(key[1], ())}
+        return scored
+
+    def _break_tie(self, tied: List[int], rank: Optional[float]) -> Optional[int]:
+        """
+        Picks the tied candidate whose SofaScore ranking is clearly closest to the ATP rank.
+        """
+        if rank is None or pd.isna(rank) or 'ranking' not in self.participants.columns:
+            return None
+        rankings = self.participants.loc[tied, 'ranking'].astype('Float64')
+        distance = (np.log(rankings.clip(lower=1)) - np.log(max(rank, 1))).abs().dropna().sort_values()
+        if len(distance) == 0 or (len(distance) > 1 and distance.iloc[0] * 2 >= distance.iloc[1]):
+            return None
+        return int(distance.index[0])
+
+    def resolve_name(self, name: str, rank: Optional[float] = None) -> Dict:
+        """
+        Returns the mapping entry of one ranking name.
+        """
+        scored = sorted(self.candidates(name).items(), key=lambda item: -item[1])
+        entry = {'ranking_name': name, 'id': None, 'confidence': 0.0, 'candidates': len(scored),
+                 'status': UNMATCHED, 'options': scored[:5]}
+        if not scored:
+            return entry
+        best_id, best = scored[0]
+        second = scored[1][1] if len(scored) > 1 else 0.0
+        confidence = best - second
+        if confidence < self.min_confidence and len(scored) > 1:
+            tied = [pid for pid, score in scored if score == best]
+            chosen = self._break_tie(tied, rank)
+            if chosen is not None:
+                best_id, confidence = chosen, self.min_confidence
+        if confidence >= self.min_confidence:
+            entry.update(id=best_id, confidence=round(confidence, 3), status=MATCHED)
+        else:
+            entry.update(confidence=round(confidence, 3), status=AMBIGUOUS)
+        return entry
+
+    @staticmethod
+    def _participants_hash(participants: pd.DataFrame) -> str:
+        ids = np.sort(participants['id'].dropna().to_numpy(dtype=np.int64))
+        return hashlib.sha256(ids.tobytes()).hexdigest()
+
+    def load_mapping(self) -> Optional[pd.DataFrame]:
+        if not self.store.exists(self.MAPPING_PATH):
+            return None
+        return self.store.read(self.MAPPING_PATH, schema=NAME_MAPPING_SCHEMA)
+
+    def update(self, rankings: pd.DataFrame, participants: pd.DataFrame, save: bool = True) -> pd.DataFrame:
+        """
+        Resolves the ranking names that are not in the persisted mapping yet and returns
+        the full mapping. Unresolved names are retried when the participants changed.
+
+        Args:
+            rankings: The ranking dataset, sorted by (lastName, rankingDate).
+            participants: Players with id, name, shortName and optionally ranking.
+            save: Whether to write the mapping and the ambiguity report.
+        """
+        mapping = self.load_mapping()
+        report = {}
+        if mapping is not None and os.path.exists(self.REPORT_PATH):
+            with open(self.REPORT_PATH, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        participants_hash = self._participants_hash(participants)
+        if mapping is not None and report.get('participants') != participants_hash:
+            # New participants may resolve names that had no clear candidate before
+            mapping = mapping[mapping['status'] == MATCHED].reset_index(drop=True)
+
+        names = pd.Index(rankings['lastName'].astype(object).unique()).dropna()
+        pending = names if mapping is None else names.difference(pd.Index(mapping['ranking_name']))
+        if len(pending) == 0:
+            logging.info("All ranking names are resolved already")
+            return mapping
+
+        self.build_index(participants)
+        latest = rankings.drop_duplicates('lastName', keep='last').set_index('lastName')['rank'].astype('Float64')
+        entries = [self.resolve_name(name, latest.get(name)) for name in pending]
+        resolved = pd.DataFrame([{k: v for k, v in e.items() if k != 'options'} for e in entries])
+        mapping = resolved if mapping is None else pd.concat([mapping, resolved], ignore_index=True)
+        logging.info(f"Resolved {len(pending)} new ranking names: {resolved['status'].value_counts().to_dict()}")
+
+        if not save:
+            return apply_schema(mapping, NAME_MAPPING_SCHEMA)
+        mapping = self.store.write(mapping, self.MAPPING_PATH, schema=NAME_MAPPING_SCHEMA)
+        self.write_report(mapping, entries, report.get('ambiguous', {}), participants_hash)
+        return mapping
+
+    def write_report(self, mapping: pd.DataFrame, entries: List[Dict], previous: Dict, participants_hash: str) -> None:
+        """
+        Writes the status counts, the candidates of every ambiguous name and the unmatched names.
+        """
+        ambiguous = set(mapping.loc[mapping['status'] == AMBIGUOUS, 'ranking_name'])
+        candidates = {name: options for name, options in previous.items() if name in ambiguous}
+        for entry in entries:
+            if entry['status'] == AMBIGUOUS:
+                candidates[entry['ranking_name']] = [
+                    {'id': pid, 'name': self.participants.at[pid, 'name'], 'score': score}
+                    for pid, score in entry['options']]
+        report = {
+            'participants': participants_hash,
+            'counts': {status: int(count) for status, count in mapping['status'].value_counts().items()},
+            'ambiguous': dict(sorted(candidates.items())),
+            'unmatched': sorted(mapping.loc[mapping['status'] == UNMATCHED, 'ranking_name']),
+        }
+        tmp_path = self.REPORT_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(tmp_path, self.REPORT_PATH)
+
+
+def rankings_by_id(rankings: pd.DataFrame, mapping: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces the ranking names by the matched participant ids. Returns id, rank and
+    rankingDate sorted by (id, rankingDate), without rows of unmatched names.
+    """
+    matched = mapping[mapping['status'] == MATCHED]
+    categories = rankings['lastName'].cat.categories
+    category_ids = pd.Series(matched['id'].to_numpy(), index=matched['ranking_name'].to_numpy())
+    category_ids = category_ids.reindex(categories).to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = rankings['lastName'].cat.codes.to_numpy()
+    ids = np.where(codes >= 0, category_ids[codes], np.nan)
+    keep = ~np.isnan(ids)
+    by_id = pd.DataFrame({
+        'id': ids[keep].astype(np.int64),
+        'rank': rankings['rank'].array[keep],
+        'rankingDate': rankings['rankingDate'].to_numpy()[keep],
+    })
+    return by_id.sort_values(['id', 'rankingDate'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,110 @@
+# datacombiner/player_table.py
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage.dataset_store import DatasetStore
+from storage.schemas import PLAYERS_SCHEMA, apply_schema
+
+# Ids below this get a dense id -> row array (4 bytes per id); larger ids fall back to binary search
+DENSE_INDEX_LIMIT = 1 << 23
+
+
+def placeholder_birthdates(ids: np.ndarray) -> pd.DatetimeIndex:
+    """
+    Stand-in birthdates between 1970 and 2005 until real ones are fetched.
+    They are derived from the player id, so a player keeps the same birthdate across runs
+    regardless of which other players are in the data.
+    """
+    start = pd.Timestamp("1970-01-01")
+    span_days = (pd.Timestamp("2005-12-31") - start).days
+    days = (ids.astype(np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32) % np.uint64(span_days)
+    return start + pd.to_timedelta(days.astype(np.int64), unit='D')
+
+
+class PlayerTable:
+    """
+    The player dimension: one row per player id, sorted by id.
+    Player attributes are attached to games by looking up the row of every home_id and
+    away_id in an id -> row index and taking the attribute arrays at those rows, which is
+    linear in the number of games. The table is persisted, so attributes assigned once,
+    such as birthdates, stay fixed across runs and can be reused by other stages.
+    """
+    PATH = 'datacombiner/data/players'
+
+    def __init__(self, players: pd.DataFrame):
+        players = players.dropna(subset=['id']).drop_duplicates(subset='id', keep='last')
+        self.players = apply_schema(players.sort_values('id', kind='stable').reset_index(drop=True), PLAYERS_SCHEMA)
+        self.ids = self.players['id'].to_numpy(dtype=np.int64)
+        self._dense = None
+        if len(self.ids) and 0 <= self.ids[0] and self.ids[-1] < DENSE_INDEX_LIMIT:
+            self._dense = np.full(self.ids[-1] + 1, -1, dtype=np.int32)
+            self._dense[self.ids] = np.arange(len(self.ids), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    @classmethod
+    def from_participants(cls, participants: pd.DataFrame, existing: Optional['PlayerTable'] = None) -> 'PlayerTable':
+        """
+        Builds the table from the processor's participants, keeping the last row seen per id.
+        Players only known to the existing table are kept, and their birthdates are reused.
+        """
+        players = participants.copy()
+        if 'birthdate' not in players.columns:
+            players['birthdate'] = pd.NaT
+        if existing is not None:
+            players = pd.concat([existing.players, apply_schema(players, PLAYERS_SCHEMA)], ignore_index=True)
+        table = cls(players)
+
+        birthdates = table.players['birthdate']
+        if existing is not None and birthdates.isna().any():
+            known = existing.take('birthdate', existing.positions(table.players['id']))
+            birthdates = birthdates.fillna(known)
+        missing = birthdates.isna().to_numpy()
+        if missing.any():
+            birthdates = birthdates.copy()
+            birthdates[missing] = placeholder_birthdates(table.ids[missing])
+        table.players['birthdate'] = birthdates
+        return table
+
+    @classmethod
+    def load(cls, store: DatasetStore) -> Optional['PlayerTable']:
+        if not store.exists(cls.PATH):
+            return None
+        return cls(store.read(cls.PATH, schema=PLAYERS_SCHEMA))
+
+    def save(self, store: DatasetStore) -> None:
+        self.players = store.write(self.players, self.PATH, schema=PLAYERS_SCHEMA)
+
+    def positions(self, ids: pd.Series) -> np.ndarray:
+        """
+        Returns the table row of every id, or -1 for ids that are missing or not in the table.
+        """
+        values = pd.array(ids, dtype='Int64')
+        keys = values.to_numpy(dtype=np.int64, na_value=-1)
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        if self._dense is not None:
+            inside = (keys >= 0) & (keys < len(self._dense))
+            positions[inside] = self._dense[keys[inside]]
+        elif len(self.ids):
+            rows = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+            found = (self.ids[rows] == keys) & ~values.isna()
+            positions[found] = rows[found]
+        return positions
+
+    def take(self, column: str, positions: np.ndarray) -> pd.Series:
+        """
+        Returns column at the given rows, missing values where the row is -1.
+        """
+        values = self.players[column].array.take(positions, allow_fill=True)
+        return pd.Series(values, name=column)
+
+    def attach(self, games: pd.DataFrame, id_column: str, columns: List[str], suffix: str) -> pd.DataFrame:
+        """
+        Adds columns of the player in id_column to games, named with suffix (e.g. name_home).
+        """
+        positions = self.positions(games[id_column])
+        attached = {f"{col}{suffix}": self.take(col, positions).set_axis(games.index) for col in columns}
+        return games.assign(**attached)
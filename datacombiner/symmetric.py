@@ -0,0 +1,130 @@
+# datacombiner/symmetric.py
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def swap_columns(columns: List[str]) -> Dict[str, str]:
+    """
+    Maps every home column to its away counterpart and vice versa, e.g. home_id <-> away_id
+    and name_home <-> name_away. Columns without a counterpart are left out.
+    """
+    mapping = {}
+    for col in columns:
+        if 'home' in col:
+            other = col.replace('home', 'away')
+        elif 'away' in col:
+            other = col.replace('away', 'home')
+        else:
+            continue
+        if other in columns:
+            mapping[col] = other
+    return mapping
+
+
+def _reverse_result(result):
+    # Handles results like '3:1', '2:3', etc.
+    if isinstance(result, str) and ':' in result:
+        parts = result.split(':')
+        return f"{parts[1]}:{parts[0]}"
+    return result
+
+
+def reverse_results(results: pd.Series) -> pd.Series:
+    """
+    Swaps the two sides of scores like '3:1'. Values without a colon are returned unchanged.
+    A results column only holds a handful of distinct scores, so each is reversed once and
+    mapped back onto the rows through its code; categorical results stay categorical.
+    """
+    if isinstance(results.dtype, pd.CategoricalDtype):
+        reversed_categories = pd.Index([_reverse_result(c) for c in results.cat.categories])
+        categories = reversed_categories.unique()
+        lookup = np.append(categories.get_indexer(reversed_categories), -1)
+        reversed_results = pd.Categorical.from_codes(lookup[results.cat.codes.to_numpy()], categories)
+        return pd.Series(reversed_results, index=results.index, name=results.name)
+    codes, uniques = pd.factorize(results, use_na_sentinel=False)
+    reversed_uniques = np.array([_reverse_result(u) for u in uniques], dtype=object)
+    return pd.Series(reversed_uniques[codes], index=results.index, name=results.name)
+
+
+class SymmetricGames:
+    """
+    The combined dataset with every match stored once.
+    The model sees each match from both sides: the stored rows, followed by a mirrored copy
+    with home and away swapped and the result and home_win label reversed. The mirrored rows
+    are derived on demand, in full or in batches, so the doubled dataset is never held or
+    written at once.
+    Rows are numbered as in the doubled dataset: match i is row i and its mirror row n + i.
+    """
+    def __init__(self, matches: pd.DataFrame):
+        self.matches = matches.reset_index(drop=True)
+        self.mapping = swap_columns(list(self.matches.columns))
+
+    def __len__(self) -> int:
+        return 2 * len(self.matches)
+
+    def _mirror(self, matches: pd.DataFrame) -> pd.DataFrame:
+        # Renaming without copying lets the mirror share the column data of the stored matches
+        mirrored = matches.rename(columns=self.mapping, copy=False)[list(matches.columns)]
+        if 'result' in mirrored.columns:
+            mirrored = mirrored.assign(result=reverse_results(matches['result']))
+        if 'home_win' in mirrored.columns:
+            mirrored = mirrored.assign(home_win=~matches['home_win'])
+        return mirrored
+
+    def mirrored(self) -> pd.DataFrame:
+        """
+        Returns the mirrored matches, indexed n..2n-1.
+        """
+        mirrored = self._mirror(self.matches)
+        mirrored.index = pd.RangeIndex(len(self.matches), len(self))
+        return mirrored
+
+    def iter_batches(self, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yields the doubled dataset in order, at most batch_size rows at a time.
+        Without batch_size, yields the stored matches and then their mirror.
+        """
+        n = len(self.matches)
+        batch_size = batch_size or max(n, 1)
+        for offset, mirror in ((0, False), (n, True)):
+            for start in range(0, n, batch_size):
+                batch = self.matches.iloc[start:start + batch_size]
+                if mirror:
+                    batch = self._mirror(batch)
+                batch.index = pd.RangeIndex(offset + start, offset + start + len(batch))
+                yield batch
+
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the given rows of the doubled dataset, in the given order and indexed by row number.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self.matches)
+        mirror = rows >= n
+        batch = self.matches.iloc[rows % n] if n else self.matches.iloc[:0]
+        batch.index = pd.Index(rows)
+        if not mirror.any():
+            return batch
+        return pd.concat([batch[~mirror], self._mirror(batch[mirror])]).loc[rows]
+
+    def order_by(self, column: str) -> np.ndarray:
+        """
+        Returns the row numbers of the doubled dataset stably sorted by column, missing values last.
+        Only columns without a home/away side can be used, as a match and its mirror share their values.
+        """
+        if column in self.mapping:
+            raise ValueError(f"Cannot order by side-specific column {column}")
+        values = self.matches[column]
+        doubled = pd.concat([values, values], ignore_index=True)
+        return doubled.sort_values(kind='stable', na_position='last').index.to_numpy()
+
+    def materialize(self) -> pd.DataFrame:
+        """
+        Returns the doubled dataset as one frame.
+        """
+        symmetric = pd.concat(list(self.iter_batches()), ignore_index=True)
+        logging.info(f"Original matches: {len(self.matches)}, Symmetrized matches: {len(symmetric)}")
+        return symmetric
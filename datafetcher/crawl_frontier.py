@@ -0,0 +1,188 @@
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+SEASONS = "seasons"
+CUPTREES = "cuptrees"
+
+# Season lists are needed to discover cuptrees, so they always go first
+SEASONS_PRIORITY = 100000
+
+
+def seasons_endpoint(tournament_id: int) -> str:
+    return f"/unique-tournament/{tournament_id}/seasons"
+
+
+def cuptrees_endpoint(tournament_id: int, season_id: int) -> str:
+    return f"/unique-tournament/{tournament_id}/season/{season_id}/cuptrees"
+
+
+def season_priority(season: Dict[str, Any]) -> int:
+    """
+    Orders cuptrees most recent season first, using the four-digit year in the
+    season's 'year' or 'name' field.
+    """
+    for field in ('year', 'name'):
+        match = re.search(r'(\d{4})', str(season.get(field, '')))
+        if match:
+            return int(match.group(1))
+    return 0
+
+
+class CrawlFrontier:
+    """
+    Persistent crawl state backed by SQLite.
+    Tracks one row per endpoint with its state (pending/done/failed), priority and
+    retry bookkeeping, so an interrupted crawl can resume with only the outstanding requests.
+    """
+    def __init__(self, db_path: str, max_attempts: int = 5, backoff_base: float = 30.0, backoff_max: float = 3600.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS frontier (
+                    endpoint TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    tournament_id INTEGER NOT NULL,
+                    season_id INTEGER,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated_at REAL
+                )
+                """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS frontier_queue ON frontier (state, priority)")
+
+    def add_seasons(self, tournament_ids: List[int]) -> None:
+        """
+        Enqueues the season list of every tournament that is not tracked yet.
+        """
+        rows = [(seasons_endpoint(tid), SEASONS, tid, None, SEASONS_PRIORITY, time.time()) for tid in tournament_ids]
+        self._insert(rows)
+
+    def add_cuptrees(self, tournament_id: int, seasons: List[Dict[str, Any]]) -> None:
+        """
+        Enqueues the cuptrees of every season that is not tracked yet.
+        """
+        rows = [
+            (cuptrees_endpoint(tournament_id, s["id"]), CUPTREES, tournament_id, s["id"], season_priority(s), time.time())
+            for s in seasons
+        ]
+        self._insert(rows)
+
+    def _insert(self, rows) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (endpoint, kind, tournament_id, season_id, priority, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def mark_done(self, endpoint: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, last_error = NULL, updated_at = ? WHERE endpoint = ?",
+                (DONE, time.time(), endpoint),
+            )
+
+    def mark_failed(self, endpoint: str, error: Any) -> None:
+        """
+        Records a failure and schedules the next attempt with exponential backoff.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT attempts FROM frontier WHERE endpoint = ?", (endpoint,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE endpoint = ?",
+                (FAILED, attempts, now + delay, str(error), now, endpoint),
+            )
+
+    def requeue(self, endpoints: List[str]) -> None:
+        """
+        Puts items back in the queue, e.g. done items whose season is still in progress.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE frontier SET state = ?, attempts = 0, next_attempt_at = 0, last_error = NULL, updated_at = ? "
+                "WHERE endpoint = ?",
+                [(PENDING, now, endpoint) for endpoint in endpoints],
+            )
+
+    def reset_failed(self) -> int:
+        """
+        Requeues items that ran out of attempts, so the next crawl tries them again.
+        Returns the number of items reset.
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE frontier SET state = ?, attempts = 0, next_attempt_at = 0, updated_at = ? "
+                "WHERE state = ? AND attempts >= ?",
+                (PENDING, time.time(), FAILED, self.max_attempts),
+            )
+        return cursor.rowcount
+
+    def done_items(self, kind: Optional[str] = None) -> List[sqlite3.Row]:
+        query = "SELECT * FROM frontier WHERE state = ?"
+        params: List[Any] = [DONE]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def outstanding(self, limit: Optional[int] = None, kind: Optional[str] = None) -> List[sqlite3.Row]:
+        """
+        Returns items that are due now, highest priority first, optionally only of one kind.
+        Failed items are retried until they reach max_attempts.
+        """
+        query = "SELECT * FROM frontier WHERE (state = ? OR (state = ? AND attempts < ?)) AND next_attempt_at <= ?"
+        params: List[Any] = [PENDING, FAILED, self.max_attempts, time.time()]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        query += " ORDER BY priority DESC, tournament_id, season_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def next_retry_at(self) -> Optional[float]:
+        """
+        Returns when the earliest backed-off item becomes due, or None if nothing is waiting.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_attempt_at) AS t FROM frontier WHERE state = ? AND attempts < ?",
+                (FAILED, self.max_attempts),
+            ).fetchone()
+        return row["t"] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM frontier GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
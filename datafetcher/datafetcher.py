@@ -2,24 +2,123 @@ import logging
 from typing import Optional, Dict, Any, List
 import json
 import os
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datafetcher.http_transport import HttpTransport, BlockedError
+from datafetcher.response_cache import ResponseCache, content_hash, cuptree_status, seasons_status
+from datafetcher.crawl_frontier import CrawlFrontier, CUPTREES, SEASONS, seasons_endpoint, cuptrees_endpoint
+from orchestration.instrumentation import LatencyHistogram
 
 logging.basicConfig(level=logging.INFO)
 
+# Reads the raw response text straight from the DOM. Chrome renders JSON responses
+# inside a single <pre>, so this avoids serialising the page and re-parsing it in Python.
+RAW_BODY_SCRIPT = """
+const pre = document.querySelector('body > pre');
+if (pre) { return pre.textContent; }
+return document.body ? document.body.textContent : null;
+"""
+
+
+def seasons_file(tournament_id: int) -> str:
+    return f"seasons_{tournament_id}.json"
+
+
+def cuptrees_file(tournament_id: int, season_id: int) -> str:
+    return f"cuptrees_{tournament_id}_{season_id}.json"
+
+
+def extract_json_from_text(text: Optional[str]) -> Dict[str, Any]:
+    """
+    Parses a raw response body. Raises ValueError if it is not JSON.
+    """
+    if not text:
+        raise ValueError("Empty response body")
+    return json.loads(text)
+
+
+def extract_json_from_page_source(page_source: str) -> Dict[str, Any]:
+    """
+    Parses JSON out of a serialised page with BeautifulSoup.
+    Slower fallback for pages the raw body script cannot read.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, 'html.parser')
+    body = soup.body
+    if body:
+        # Extract text from <pre> if present, else fallback to body text
+        pre = body.find('pre')
+        if pre:
+            body_content = pre.get_text()
+        else:
+            body_content = body.get_text()
+    else:
+        body_content = ''
+    try:
+        return json.loads(body_content)
+    except json.JSONDecodeError as e:
+        logging.error(f"Failed to parse JSON: {e}")
+        return {}
+
+
+def endpoint_kind(endpoint: str) -> str:
+    """
+    Names the kind of an API endpoint for latency statistics: tournaments, seasons or cuptrees.
+    """
+    if endpoint.startswith("/config/default-unique-tournaments"):
+        return "tournaments"
+    return endpoint.rstrip("/").rsplit("/", 1)[-1]
+
+
 class TennisDataFetcher:
     """
     Collects tennis data from the SofaScore API.
     """
-    def __init__(self):
+    def __init__(self, transport: str = "selenium", max_workers: int = 8, rate_limit: Optional[float] = 10.0,
+                 base_url: str = "https://www.sofascore.com/api/v1", ttl: float = 6 * 3600,
+                 seasons_ttl: float = 24 * 3600):
         """
         Initializes the TennisDataFetcher object.
+
+        Args:
+            transport: "selenium" fetches every endpoint through headless Chrome.
+                "http" uses a pooled keep-alive HTTP client with up to max_workers
+                concurrent requests and only falls back to Selenium for blocked requests.
+            max_workers: Concurrency limit for the "http" transport.
+            rate_limit: Maximum requests per second for the "http" transport (None disables limiting).
+            base_url: API root, overridable to point at a local stub server.
+            ttl: Seconds before the cuptrees of an in-progress season are refetched.
+                Completed seasons are never refetched.
+            seasons_ttl: Seconds before the season list of a tournament that is still played is refetched.
+        """
+        if transport not in ("selenium", "http"):
+            raise ValueError(f"Unknown transport: {transport}")
+        self.base_url = base_url
+        self.transport = transport
+        self.max_workers = max_workers if transport == "http" else 1
+        self.driver = None
+        self._driver_lock = threading.Lock()
+        self.http = None
+        self.ttl = ttl
+        self.seasons_ttl = seasons_ttl
+        self._caches: Dict[str, ResponseCache] = {}
+        self._frontiers: Dict[str, CrawlFrontier] = {}
+        # Duration of every API request (cache hits excluded) per transport and endpoint kind
+        self.latency = LatencyHistogram()
+
+        if transport == "http":
+            self.http = HttpTransport(base_url, max_workers=max_workers, rate_limit=rate_limit)
+
+    def _start_driver(self) -> None:
+        """
+        Starts the headless Chrome WebDriver. Selenium is imported and the browser launched
+        only on the first request that needs them, so a fetcher that is never used, or only
+        answers from the cache, costs nothing.
         """
-        self.base_url = "https://www.sofascore.com/api/v1"
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
 
         try:
             options = Options()
@@ -31,36 +130,116 @@ class TennisDataFetcher:
         except Exception as e:
             logging.error(f"Failed to initialize Selenium WebDriver: {e}")
 
-    
     def _call_using_selenium(self, endpoint: str) -> Dict[str, Any]:
         """
         Uses Selenium to fetch the page source from a given URL.
         This is useful for pages that require JavaScript to render content.
         Optimized for resource management and robustness.
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
         url = self.base_url + endpoint
-        
+
+        if self.driver is None:
+            self._start_driver()
         self.driver.get(url)
         WebDriverWait(self.driver, 10).until(
             EC.presence_of_element_located((By.TAG_NAME, "body"))
         )
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        body = soup.body
-        if body:
-            # Extract text from <pre> if present, else fallback to body text
-            pre = body.find('pre')
-            if pre:
-                body_content = pre.get_text()
-            else:
-                body_content = body.get_text()
-        else:
-            body_content = ''
         try:
-            return json.loads(body_content)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to parse JSON: {e}")
-            return {}
+            return extract_json_from_text(self.driver.execute_script(RAW_BODY_SCRIPT))
+        except Exception as e:
+            logging.debug(f"Fast JSON extraction failed for {url}, falling back to page source: {e}")
+        return extract_json_from_page_source(self.driver.page_source)
 
+    def _call_using_http(self, endpoint: str) -> Dict[str, Any]:
+        """
+        Fetches an endpoint through the pooled HTTP client.
+        Falls back to Selenium when the request is blocked; the browser is shared,
+        so fallbacks from concurrent workers are serialised.
+        """
+        try:
+            return self.http.get_json(endpoint)
+        except BlockedError as e:
+            logging.warning(f"HTTP request blocked, falling back to Selenium: {e}")
+            with self._driver_lock:
+                return self._call_using_selenium(endpoint)
+
+    def _call(self, endpoint: str) -> Dict[str, Any]:
+        """
+        Fetches an endpoint using the configured transport and records its latency.
+        """
+        with self.latency.time(f"{self.transport}:{endpoint_kind(endpoint)}"):
+            if self.transport == "http":
+                return self._call_using_http(endpoint)
+            return self._call_using_selenium(endpoint)
+
+    def _map(self, func, items: List[Any]) -> List[Any]:
+        """
+        Applies func to every item, concurrently for the "http" transport.
+        Returns (item, result, error) tuples in input order so callers see the same
+        ordering as a sequential crawl.
+        """
+        def safe_call(item):
+            try:
+                return item, func(item), None
+            except Exception as e:
+                return item, None, e
+
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [safe_call(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(safe_call, items))
+
+    def _get_cache(self, save_dir: str) -> ResponseCache:
+        """
+        Returns the response cache for a data directory.
+        """
+        if save_dir not in self._caches:
+            os.makedirs(save_dir, exist_ok=True)
+            self._caches[save_dir] = ResponseCache(save_dir, ttl=self.ttl, seasons_ttl=self.seasons_ttl)
+        return self._caches[save_dir]
+
+    def _get_frontier(self, save_dir: str) -> CrawlFrontier:
+        """
+        Returns the persistent crawl frontier for a data directory.
+        """
+        if save_dir not in self._frontiers:
+            os.makedirs(save_dir, exist_ok=True)
+            self._frontiers[save_dir] = CrawlFrontier(os.path.join(save_dir, "frontier.sqlite"))
+        return self._frontiers[save_dir]
+
+    def _requeue_stale(self, frontier: CrawlFrontier, save_dir: str) -> int:
+        """
+        Puts done frontier items back in the queue when their cached file is no longer fresh:
+        season lists past their TTL and cup trees of seasons still in progress.
+        Completed seasons stay done. Returns the number of items requeued.
+        """
+        cache = self._get_cache(save_dir)
+        stale = []
+        for item in frontier.done_items():
+            if item["kind"] == SEASONS:
+                fresh = cache.is_fresh(seasons_file(item["tournament_id"]), status_fn=seasons_status,
+                                       ttl=self.seasons_ttl)
+            else:
+                fresh = cache.is_fresh(cuptrees_file(item["tournament_id"], item["season_id"]), status_fn=cuptree_status)
+            if not fresh:
+                stale.append(item["endpoint"])
+        if stale:
+            frontier.requeue(stale)
+            logging.info(f"Requeued {len(stale)} crawl items with in-progress or expired data")
+        return len(stale)
+
+    def reset_failed(self, save_dir: str = os.path.join("datafetcher", "data")) -> int:
+        """
+        Gives requests that ran out of attempts a new set of retries.
+        Returns the number of requests reset.
+        """
+        reset = self._get_frontier(save_dir).reset_failed()
+        logging.info(f"Reset {reset} failed crawl items")
+        return reset
 
     def _validate_response(self, data: Any, required_keys: List[str], context: str = "") -> None:
         """
@@ -78,7 +257,7 @@ class TennisDataFetcher:
         Returns a list of ATP tournaments with selected fields.
         Optionally saves the data if save_dir is provided.
         """
-        data = self._call_using_selenium(
+        data = self._call(
             endpoint="/config/default-unique-tournaments/NL/tennis"
         )
         self._validate_response(data, ["uniqueTournaments"], context="get_tournaments")
@@ -98,18 +277,16 @@ class TennisDataFetcher:
         Returns a list of seasons for a given tournament ID.
         Optionally saves the data if save_dir is provided.
         """
-        season_file = os.path.join(save_dir, f"seasons_{tournament_id}.json")
-        if os.path.exists(season_file):
-            with open(season_file, "r", encoding="utf-8") as f:
-                seasons = json.load(f)
-            return seasons
-        
-        endpoint = f"/unique-tournament/{tournament_id}/seasons"
-        data = self._call_using_selenium(endpoint=endpoint)
+        cache = self._get_cache(save_dir)
+        season_file = seasons_file(tournament_id)
+        if cache.is_fresh(season_file, status_fn=seasons_status, ttl=self.seasons_ttl):
+            return cache.load(season_file)
+
+        endpoint = seasons_endpoint(tournament_id)
+        data = self._call(endpoint=endpoint)
         self._validate_response(data, ["seasons"], context="get_seasons")
         seasons = data.get("seasons", [])
-        if save_dir:
-            self.save_data(seasons, os.path.join(save_dir, f"seasons_{tournament_id}.json"))
+        self._save_fetched(cache, season_file, seasons, status=seasons_status(seasons))
         return seasons
 
     def get_cuptrees(self, tournament_id: int, season_id: int, save_dir: str) -> Dict[str, Any]:
@@ -117,18 +294,16 @@ class TennisDataFetcher:
         Returns the cup trees for a specific tournament season.
         Optionally saves the data if save_dir is provided.
         """
-        cuptrees_file = os.path.join(save_dir, f"cuptrees_{tournament_id}_{season_id}.json")
-        if os.path.exists(cuptrees_file):
-            with open(cuptrees_file, "r", encoding="utf-8") as f:
-                cuptrees = json.load(f)
-            return cuptrees
-        
-        endpoint = f"/unique-tournament/{tournament_id}/season/{season_id}/cuptrees"
-        data = self._call_using_selenium(endpoint=endpoint)
+        cache = self._get_cache(save_dir)
+        cuptree_file = cuptrees_file(tournament_id, season_id)
+        if cache.is_fresh(cuptree_file, status_fn=cuptree_status):
+            return cache.load(cuptree_file)
+
+        endpoint = cuptrees_endpoint(tournament_id, season_id)
+        data = self._call(endpoint=endpoint)
         self._validate_response(data, ["cupTrees"], context="get_cuptrees")
         cuptrees = data.get("cupTrees", {})
-        if save_dir:
-            self.save_data(cuptrees, os.path.join(save_dir, f"cuptrees_{tournament_id}_{season_id}.json"))
+        self._save_fetched(cache, cuptree_file, cuptrees, status=cuptree_status(cuptrees))
         return cuptrees
 
     def get_players(self) -> List[Dict[str, Any]]:
@@ -138,25 +313,47 @@ class TennisDataFetcher:
         # Placeholder for future implementation
         return []
 
-    def save_data(self, data: Any, filename: str) -> None:
+    def _save_fetched(self, cache: ResponseCache, filename: str, data: Any, status: str) -> None:
+        """
+        Writes a fetched response if its content changed, and records it in the cache index
+        only once it is on disk. After a failed write the index keeps its previous entry,
+        so the next crawl fetches the response again.
+        """
+        digest = content_hash(data)
+        if cache.needs_write(filename, digest) and not self.save_data(data, os.path.join(cache.save_dir, filename)):
+            return
+        cache.mark_written(filename, digest, status)
+
+    def save_data(self, data: Any, filename: str) -> bool:
         """
-        Saves the given data to a file in JSON format.
+        Saves the given data to a file in JSON format. The file is replaced atomically, so a
+        failed write leaves the previous file intact. Returns whether the data was saved.
         """
+        tmp_path = filename + '.tmp'
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, filename)
             logging.info("Data successfully saved to %s", filename)
+            return True
         except Exception as e:
             logging.error("Failed to save data to %s: %s", filename, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
 
     def get_all_data(self, max_tournaments: Optional[int] = None, save_dir: str = os.path.join("datafetcher", "data")) -> Dict[str, Any]:
         """
         Collects and saves data for up to max_tournaments ATP tournaments.
         Data is saved in separate files for tournaments, seasons, and cuptrees.
-        Returns a dictionary with all collected data.
+        Returns a dictionary with all collected data; cup trees that are up to date are
+        loaded from disk instead of being fetched again.
+        Progress is recorded in the crawl frontier, so an interrupted run can be
+        finished with resume().
         """
         if save_dir:
             os.makedirs(save_dir, exist_ok=True)
+        frontier = self._get_frontier(save_dir)
 
         all_data: Dict[str, Any] = {
             "tournaments": [],
@@ -168,32 +365,102 @@ class TennisDataFetcher:
         if max_tournaments is not None:
             tournaments = tournaments[:max_tournaments]
         all_data["tournaments"] = tournaments
+        frontier.add_seasons([t["id"] for t in tournaments])
 
-        for t in tournaments:
-            tid = t["id"]
-            try:
-                seasons = self.get_seasons(tid, save_dir=save_dir)
-                all_data["seasons"][tid] = seasons
-                # time.sleep(1)  # Add delay between tournament requests
-                for season in seasons:
-                    sid = season["id"]
-                    try:
-                        cuptrees = self.get_cuptrees(tid, sid, save_dir=save_dir)
-                        all_data["cuptrees"][(tid, sid)] = cuptrees
-                    except Exception as e:
-                        logging.warning(f"Failed to get cuptrees for tournament {tid} season {sid}: {e}")
-                    # time.sleep(1)  # Add delay between season requests
-            except Exception as e:
+        for tid, seasons, e in self._map(lambda tid: self.get_seasons(tid, save_dir=save_dir), [t["id"] for t in tournaments]):
+            if e is not None:
                 logging.warning(f"Failed to get seasons for tournament {tid}: {e}")
+                frontier.mark_failed(seasons_endpoint(tid), e)
+                continue
+            all_data["seasons"][tid] = seasons
+            frontier.mark_done(seasons_endpoint(tid))
+            frontier.add_cuptrees(tid, seasons)
+
+        # Cup trees come from the frontier queue: most recent seasons first, completed seasons
+        # that are already done are skipped and failed ones wait for their backoff
+        self._requeue_stale(frontier, save_dir)
+        items = [item for item in frontier.outstanding(kind=CUPTREES) if item["tournament_id"] in all_data["seasons"]]
+        attempted = {(item["tournament_id"], item["season_id"]) for item in items}
+        fetched: Dict[Any, Any] = {}
+        for item, cuptrees, e in self._map(lambda item: self.get_cuptrees(item["tournament_id"], item["season_id"], save_dir=save_dir), items):
+            tid, sid = item["tournament_id"], item["season_id"]
+            if e is not None:
+                logging.warning(f"Failed to get cuptrees for tournament {tid} season {sid}: {e}")
+                frontier.mark_failed(item["endpoint"], e)
+                continue
+            fetched[(tid, sid)] = cuptrees
+            frontier.mark_done(item["endpoint"])
 
+        # Cup trees that were already done come from disk, in discovery order like a full crawl;
+        # those that failed in this run are left out
+        cache = self._get_cache(save_dir)
+        for tid, seasons in all_data["seasons"].items():
+            for season in seasons:
+                key = (tid, season["id"])
+                if key in fetched:
+                    all_data["cuptrees"][key] = fetched[key]
+                elif key not in attempted and os.path.exists(os.path.join(save_dir, cuptrees_file(*key))):
+                    all_data["cuptrees"][key] = cache.load(cuptrees_file(*key))
+
+        cache.flush()
         return all_data
+
+    def resume(self, save_dir: str = os.path.join("datafetcher", "data"), wait_for_retries: bool = True) -> Dict[str, int]:
+        """
+        Finishes an interrupted crawl by fetching only the outstanding frontier items,
+        most recent seasons first. Failed items are retried with exponential backoff
+        until they run out of attempts; reset_failed() gives them new ones. Season lists
+        and in-progress seasons whose data went stale are refetched as well.
+        Returns the number of items per state once nothing is left to do.
+        """
+        frontier = self._get_frontier(save_dir)
+        self._requeue_stale(frontier, save_dir)
+
+        def fetch_item(item) -> None:
+            if item["kind"] == SEASONS:
+                seasons = self.get_seasons(item["tournament_id"], save_dir=save_dir)
+                frontier.add_cuptrees(item["tournament_id"], seasons)
+            else:
+                self.get_cuptrees(item["tournament_id"], item["season_id"], save_dir=save_dir)
+
+        while True:
+            items = frontier.outstanding()
+            if not items:
+                retry_at = frontier.next_retry_at()
+                if retry_at is None or not wait_for_retries:
+                    break
+                wait = max(0.0, retry_at - time.time())
+                logging.info(f"Waiting {wait:.0f}s before retrying failed requests")
+                time.sleep(wait)
+                continue
+
+            logging.info(f"Resuming crawl with {len(items)} outstanding requests")
+            for item, _, e in self._map(fetch_item, items):
+                if e is not None:
+                    logging.warning(f"Failed to fetch {item['endpoint']}: {e}")
+                    frontier.mark_failed(item["endpoint"], e)
+                else:
+                    frontier.mark_done(item["endpoint"])
+
+        self._get_cache(save_dir).flush()
+        counts = frontier.counts()
+        logging.info(f"Crawl frontier state: {counts}")
+        return counts
     
     def close(self):
         """
-        Closes the Selenium WebDriver.
+        Closes the Selenium WebDriver and the HTTP connection pool.
         """
+        for cache in self._caches.values():
+            cache.flush()
+        for frontier in self._frontiers.values():
+            frontier.close()
+        self._frontiers = {}
         if self.driver:
             self.driver.quit()
+            self.driver = None
+        if self.http:
+            self.http.close()
 
     def __exit__(self):
         """
@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class BlockedError(Exception):
+    """
+    Raised when the API refuses a plain HTTP request (bot protection, rate limiting)
+    and the caller should retry through a real browser.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Allows bursts of up to `capacity` requests and refills at `rate` tokens per second.
+    """
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available and consumes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpTransport:
+    """
+    Pooled keep-alive HTTP client for the SofaScore API.
+    A single session is shared between worker threads; the connection pool is sized
+    to the concurrency limit so every worker reuses an open connection.
+    """
+    BLOCKED_STATUS_CODES = (401, 403, 429, 503)
+
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+        'Accept': 'application/json',
+        'Accept-Language': 'en-US,en',
+    }
+
+    def __init__(self, base_url: str, max_workers: int = 8, rate_limit: Optional[float] = 10.0, timeout: float = 10.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate_limit, capacity=max_workers) if rate_limit else None
+        self.session = requests.Session()
+        self.session.headers.update(self.DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_json(self, endpoint: str) -> Dict[str, Any]:
+        """
+        Fetches an endpoint and returns the decoded JSON body.
+        Raises BlockedError if the response looks like a bot-protection page.
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        url = self.base_url + endpoint
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code in self.BLOCKED_STATUS_CODES:
+            raise BlockedError(f"HTTP {response.status_code} for {url}")
+        response.raise_for_status()
+        try:
+            data = response.json()
+        except (ValueError, json.JSONDecodeError) as e:
+            # An HTML challenge page instead of JSON means we were blocked
+            raise BlockedError(f"Non-JSON response for {url}: {e}")
+        # The error field is usually {"code": ..., "message": ...}, but not always an object
+        error = data.get('error') if isinstance(data, dict) else None
+        if isinstance(error, dict) and error.get('code') in self.BLOCKED_STATUS_CODES:
+            raise BlockedError(f"API error {error} for {url}")
+        return data
+
+    def close(self) -> None:
+        """
+        Closes the underlying connection pool.
+        """
+        try:
+            self.session.close()
+        except Exception as e:
+            logging.error(f"Failed to close HTTP session: {e}")
@@ -0,0 +1,165 @@
+# datafetcher/ranking_parser.py
+import logging
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from datafetcher.ranking_store import parse_ranks
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional, the streaming parser needs only the standard library
+    lxml_html = None
+
+# (lastName, rank) as the text of the page, e.g. ("C. Alcaraz", "T12")
+RankingRows = List[Tuple[str, str]]
+
+
+def ranking_frame(rows: RankingRows, date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Types parsed rows: rank becomes Int32 and tied tells which ranks were listed as "T12".
+    """
+    names = [name for name, _ in rows]
+    raw_ranks = pd.Series([rank for _, rank in rows], dtype=object)
+    df = pd.DataFrame({
+        'lastName': pd.Series(names, dtype=object),
+        'rank': parse_ranks(raw_ranks),
+        'tied': raw_ranks.str.startswith('T').fillna(False).astype(bool),
+    })
+    if date is not None:
+        df['rankingDate'] = date
+    return df
+
+
+class _RowCollector(HTMLParser):
+    """
+    Walks the page as a stream of tags and keeps, per table row, the text of the first
+    td.rank and span.lastName. No tree is built, so the page is read in a single pass.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: RankingRows = []
+        self._in_row = False
+        self._rank: Optional[str] = None
+        self._name: Optional[str] = None
+        # The cell being read: its tag, its nesting depth and the text so far
+        self._target: Optional[str] = None
+        self._tag = ''
+        self._depth = 0
+        self._text: List[str] = []
+
+    def _flush(self) -> None:
+        if self._in_row and self._rank is not None and self._name is not None:
+            self.rows.append((self._name, self._rank))
+        self._in_row, self._rank, self._name, self._target = False, None, None, None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            # A row without its end tag ends where the next one starts
+            self._flush()
+            self._in_row = True
+            return
+        if self._target is not None:
+            if tag == self._tag:
+                self._depth += 1
+            return
+        if not self._in_row or tag not in ('td', 'span'):
+            return
+        classes = next((value.split() for key, value in attrs if key == 'class' and value), ())
+        if tag == 'td' and self._rank is None and 'rank' in classes:
+            self._target = 'rank'
+        elif tag == 'span' and self._name is None and 'lastName' in classes:
+            self._target = 'name'
+        else:
+            return
+        self._tag, self._depth, self._text = tag, 1, []
+
+    def handle_endtag(self, tag):
+        if self._target is not None and tag == self._tag:
+            self._depth -= 1
+            if self._depth == 0:
+                text = ''.join(self._text).strip()
+                if self._target == 'rank':
+                    self._rank = text
+                else:
+                    self._name = text
+                self._target = None
+        elif tag == 'tr':
+            self._flush()
+
+    def handle_data(self, data):
+        if self._target is not None:
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def parse_streaming(page: str) -> RankingRows:
+    collector = _RowCollector()
+    collector.feed(page)
+    collector.close()
+    return collector.rows
+
+
+def _class_xpath(tag: str, name: str):
+    return etree.XPath(f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]")
+
+
+def parse_lxml(page: str) -> RankingRows:
+    if lxml_html is None:
+        raise ImportError("the lxml ranking parser needs lxml installed")
+    rank_cells, name_spans = _class_xpath('td', 'rank'), _class_xpath('span', 'lastName')
+    rows = []
+    for tr in lxml_html.fromstring(page).iter('tr'):
+        rank, name = rank_cells(tr), name_spans(tr)
+        if rank and name:
+            rows.append((name[0].text_content().strip(), rank[0].text_content().strip()))
+    return rows
+
+
+def parse_soup(page: str) -> RankingRows:
+    import bs4
+
+    rows = []
+    for tr in bs4.BeautifulSoup(page, 'html.parser').find_all('tr'):
+        span_last_name = tr.find('span', class_='lastName')
+        td_rank = tr.find('td', class_='rank')
+        if span_last_name is not None and td_rank is not None:
+            rows.append((span_last_name.text.strip(), td_rank.text.strip()))
+    return rows
+
+
+PARSERS: Dict[str, Callable[[str], RankingRows]] = {
+    'stream': parse_streaming,
+    'lxml': parse_lxml,
+    'bs4': parse_soup,
+}
+
+
+def default_parser() -> str:
+    return 'lxml' if lxml_html is not None else 'stream'
+
+
+def parse_ranking_page(page: str, date: Optional[str] = None, parser: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parses the table rows of an ATP rankings page into lastName, rank, tied (and rankingDate
+    when given).
+
+    Args:
+        page: The page source.
+        date: The ranking week of the page.
+        parser: One of PARSERS. Defaults to lxml when it is installed and the streaming
+            parser otherwise. BeautifulSoup ("bs4") is the slowest and kept as a fallback:
+            if another parser finds no rows, the page is parsed again with it.
+    """
+    parser = parser or default_parser()
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown ranking parser {parser}, expected one of {sorted(PARSERS)}")
+    rows = PARSERS[parser](page)
+    if not rows and parser != 'bs4':
+        logging.warning(f"The {parser} ranking parser found no rows, falling back to bs4")
+        rows = parse_soup(page)
+    return ranking_frame(rows, date)
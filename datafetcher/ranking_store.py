@@ -0,0 +1,145 @@
+# datafetcher/ranking_store.py
+import logging
+import os
+import re
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage.dataset_store import DatasetStore
+from storage.schemas import RANKINGS_SCHEMA, apply_schema
+
+RANKINGS_DIR = 'datafetcher/data/rankings'
+RANKING_FILE = re.compile(r'^data_atp_rankings_(.+)\.csv$')
+
+
+def parse_ranks(ranks: pd.Series) -> pd.Series:
+    """
+    Converts scraped ranks to integers. Tied players are listed as e.g. "T12".
+    """
+    return pd.to_numeric(ranks.astype(str).str.lstrip('T'), errors='coerce').astype('Int32')
+
+
+def abbreviate_names(names: pd.Series) -> pd.Series:
+    """
+    Converts full names to the ranking pages' format: "Carlos Alcaraz" -> "C. Alcaraz".
+    """
+    parts = names.astype('string').str.strip().str.split(' ', n=1, expand=True)
+    if parts.shape[1] < 2:
+        return parts[0]
+    return (parts[0].str[0] + '. ' + parts[1]).fillna(parts[0])
+
+
+class RankingStore:
+    """
+    The weekly ATP rankings in one typed dataset, sorted by (lastName, rankingDate).
+    Names are categorical and ranks Int32, so hundreds of weekly snapshots of 5000 players
+    fit in a few tens of MB. Consolidation only reads weekly files whose date is not in the
+    dataset yet.
+    """
+    PATH = os.path.join(RANKINGS_DIR, 'rankings')
+
+    def __init__(self, store: Optional[DatasetStore] = None, rankings_dir: str = RANKINGS_DIR):
+        self.store = store or DatasetStore()
+        self.rankings_dir = rankings_dir
+
+    def weekly_files(self) -> Dict[pd.Timestamp, str]:
+        """
+        Returns the scraped weekly ranking files by ranking date.
+        """
+        if not os.path.isdir(self.rankings_dir):
+            return {}
+        files = {}
+        for name in os.listdir(self.rankings_dir):
+            match = RANKING_FILE.match(name)
+            if match:
+                files[pd.Timestamp(match.group(1))] = os.path.join(self.rankings_dir, name)
+        return files
+
+    @staticmethod
+    def read_week(path: str) -> pd.DataFrame:
+        week = pd.read_csv(path, usecols=['lastName', 'rank'], dtype=str, engine='pyarrow')
+        week['rank'] = parse_ranks(week['rank'])
+        return week.dropna(subset=['lastName', 'rank'])
+
+    def load(self) -> Optional[pd.DataFrame]:
+        if not self.store.exists(self.PATH):
+            return None
+        return self.store.read(self.PATH, schema=RANKINGS_SCHEMA)
+
+    def consolidate(self) -> pd.DataFrame:
+        """
+        Adds weekly files that are not in the ranking dataset yet, saves and returns it.
+        """
+        existing = self.load()
+        known = set(pd.DatetimeIndex(existing['rankingDate'].unique())) if existing is not None else set()
+        new_files = [(date, path) for date, path in sorted(self.weekly_files().items()) if date not in known]
+        if not new_files and existing is not None:
+            logging.info("Ranking dataset is up to date")
+            return existing
+
+        # Names are coded against one growing category list, so each distinct name is held once
+        names = {}
+        codes, ranks, dates = [], [], []
+        if existing is not None:
+            names = {name: i for i, name in enumerate(existing['lastName'].cat.categories)}
+            codes.append(existing['lastName'].cat.codes.to_numpy(dtype=np.int32))
+            ranks.append(existing['rank'].array)
+            dates.append(existing['rankingDate'].to_numpy())
+        for date, path in new_files:
+            logging.debug(f"Loading file: {path}")
+            week = self.read_week(path)
+            week_codes, uniques = pd.factorize(week['lastName'])
+            lookup = np.array([names.setdefault(name, len(names)) for name in uniques], dtype=np.int32)
+            codes.append(lookup[week_codes])
+            ranks.append(week['rank'].array)
+            dates.append(np.full(len(week), date.to_datetime64(), dtype='datetime64[ns]'))
+
+        categories = np.array(list(names), dtype=object)
+        if not codes:
+            codes, ranks, dates = [np.empty(0, dtype=np.int32)], [pd.array([], dtype='Int32')], [np.empty(0, dtype='datetime64[ns]')]
+        sorted_categories = np.argsort(categories)
+        recode = np.empty(len(categories), dtype=np.int32)
+        recode[sorted_categories] = np.arange(len(categories), dtype=np.int32)
+        rankings = pd.DataFrame({
+            'lastName': pd.Categorical.from_codes(recode[np.concatenate(codes)], categories=categories[sorted_categories]),
+            'rank': pd.concat([pd.Series(r) for r in ranks], ignore_index=True),
+            'rankingDate': np.concatenate(dates),
+        })
+        rankings = rankings.sort_values(['lastName', 'rankingDate'], kind='stable').reset_index(drop=True)
+        logging.info(f"Added {len(new_files)} weekly ranking files, {len(rankings)} rows in total")
+        return self.store.write(rankings, self.PATH, schema=RANKINGS_SCHEMA)
+
+
+def asof_ranks(rankings: pd.DataFrame, players: pd.Series, dates: pd.Series, key: str = 'lastName') -> np.ndarray:
+    """
+    Returns each player's latest rank on or before the given date, NaN if there is none.
+
+    rankings must be sorted by (key, rankingDate), as kept by RankingStore for lastName.
+    Each lookup is a binary search over keys combining the player's category code with
+    the ranking day.
+    """
+    if rankings.empty:
+        return np.full(len(players), np.nan)
+    ranked = rankings[key]
+    if not isinstance(ranked.dtype, pd.CategoricalDtype):
+        # Categories are sorted, so the codes keep the (key, rankingDate) order
+        ranked = ranked.astype('category')
+    categories = ranked.cat.categories
+    ranking_days = rankings['rankingDate'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    keys = (ranked.cat.codes.to_numpy(dtype=np.int64) << 32) | (ranking_days + (1 << 31))
+
+    codes = pd.Categorical(players, categories=categories).codes.astype(np.int64)
+    query_dates = pd.to_datetime(dates)
+    found = (codes >= 0) & query_dates.notna().to_numpy()
+    query_days = np.where(found, query_dates.to_numpy(dtype='datetime64[D]').astype(np.int64), 0)
+    query = (codes << 32) | (query_days + (1 << 31))
+
+    # The last ranking at or before the date; it has to belong to the same player
+    rows = np.searchsorted(keys, query, side='right') - 1
+    found &= rows >= 0
+    rows = np.where(found, rows, 0)
+    found &= (keys[rows] >> 32) == codes
+    ranks = rankings['rank'].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
+    return np.where(found, ranks, np.nan)
@@ -1,84 +1,223 @@
 import os
-import bs4
-import undetected_chromedriver as uc
 import pandas as pd
-import re
 import logging
+import multiprocessing as mp
+import queue
+import tempfile
+from typing import List, Optional
+
+from datafetcher.ranking_parser import parse_ranking_page
+from datafetcher.ranking_store import RANKINGS_DIR, RankingStore
+from storage.dataset_store import DatasetStore
+
+
+def chrome_options():
+    """
+    Builds the Chrome options used for every ranking driver.
+    Options objects are not picklable, so pool workers build their own.
+    undetected_chromedriver is imported here, so consolidating rankings does not need it.
+    """
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36')
+    options.add_argument('--lang=en-US,en')
+    options.add_argument('--window-size=1920,1080')
+    return options
+
+
+def ranking_file_path(date: str) -> str:
+    return os.path.join(RANKINGS_DIR, f'data_atp_rankings_{date}.csv')
+
+
+def write_csv_atomic(df: pd.DataFrame, file_path: str) -> None:
+    """
+    Writes a DataFrame to CSV via a temporary file in the same directory and an
+    atomic rename, so readers never see a half-written file. The file gets the
+    permissions of a plain write under the current umask, not mkstemp's 0600.
+    """
+    directory = os.path.dirname(file_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _pool_worker(date_queue, result_queue, base_url: str, save: bool, recycle_after: Optional[int],
+                 parser: Optional[str] = None) -> None:
+    """
+    Pool worker process: pulls dates from the shared queue until it gets the None
+    sentinel, restarting its driver every recycle_after pages to cap Chrome memory growth.
+    """
+    scraper = RankingScraper([], base_url=base_url, parser=parser)
+    pages = 0
+    try:
+        while True:
+            # Blocking: a multiprocessing queue can look empty before the parent's puts arrive
+            date = date_queue.get()
+            if date is None:
+                break
+            if recycle_after and pages >= recycle_after:
+                scraper.quit()
+                pages = 0
+            try:
+                scraper.scrape_date(date, save=save)
+                result_queue.put((date, None))
+            except Exception as e:
+                logging.error(f"Failed to scrape rankings for {date}: {e}")
+                result_queue.put((date, str(e)))
+                # A failing page usually means a broken driver, start a fresh one
+                scraper.quit()
+                pages = 0
+                continue
+            pages += 1
+    finally:
+        scraper.quit()
+
 
 class RankingScraper:
-    def __init__(self, dates):
-        self.base_url = 'https://www.atptour.com/en/rankings/singles?rankRange=0-5000&dateWeek='
-        self.soup = None
-        self.options = uc.ChromeOptions()
-        self.options.add_argument('--headless')
-        self.options.add_argument('--disable-gpu')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36')
-        self.options.add_argument('--lang=en-US,en')
-        self.options.add_argument('--window-size=1920,1080')
-        self.driver = uc.Chrome(options=self.options)
+    def __init__(self, dates, base_url: str = 'https://www.atptour.com/en/rankings/singles?rankRange=0-5000&dateWeek=',
+                 parser: Optional[str] = None):
+        """
+        Args:
+            dates: Ranking weeks to scrape.
+            base_url: Rankings page URL without the week.
+            parser: Ranking page parser from ranking_parser.PARSERS; by default lxml when it
+                is installed, else the streaming parser.
+        """
+        self.base_url = base_url
+        self.parser = parser
+        self.driver = None
         self.dates = dates
 
-    def fetch_page(self, date) -> bs4.BeautifulSoup:
-        self.driver.get(self.base_url + date)
-        soup = bs4.BeautifulSoup(self.driver.page_source, 'html.parser')
-        return soup
+    def _get_driver(self):
+        if self.driver is None:
+            import undetected_chromedriver as uc
+
+            self.driver = uc.Chrome(options=chrome_options())
+        return self.driver
 
-    def create_dataframe(self, save: bool) -> str:
+    def quit(self) -> None:
+        """
+        Closes the browser, a new one is started on the next fetch.
+        """
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logging.error(f"Failed to quit driver: {e}")
+            self.driver = None
+
+    def fetch_page(self, date) -> str:
+        driver = self._get_driver()
+        driver.get(self.base_url + date)
+        return driver.page_source
+
+    def create_dataframe(self, save: bool, workers: int = 1, recycle_after: Optional[int] = 50) -> str:
+        """
+        Scrapes and saves the rankings for every date that is not on disk yet.
+
+        Args:
+            save: Whether to write each week to data_atp_rankings_{date}.csv.
+            workers: Number of browser worker processes. Dates are handed out through
+                a shared queue, so a slow page never stalls the other workers. Workers
+                only hand back their weeks by writing them, so workers > 1 needs save.
+            recycle_after: Restart a worker's driver after this many pages (None never restarts).
+        """
+        if workers > 1 and not save:
+            raise ValueError("Scraping with workers > 1 needs save=True, the workers' weeks are only kept on disk")
+        pending = []
         for date in self.dates:
-            file_path = f'datafetcher/data/rankings/data_atp_rankings_{date}.csv'
+            file_path = ranking_file_path(date)
             if os.path.exists(file_path):
                 print(f"File {file_path} already exists. Skipping save.")
                 continue
-            soup = self.fetch_page(date)
-
-            data = []
-            # option_selected = soup.find_all('option', attrs={'value': 'Current Week'})
-            # Extract the ranking date from the option with a value that matches a date pattern
-
-            ranking_date = None
-            # for opt in option_selected:
-            #     if re.match(r'\d{4}\.\d{2}\.\d{2}', opt.text.strip()):
-            #         ranking_date = opt.text.strip()
-            #         break
-            
-            trs = soup.find_all('tr')
-
-            for tr in trs:
-                span_last_name = tr.find('span', class_='lastName')
-                td_rank = tr.find('td', class_='rank')
-
-                if span_last_name is not None and td_rank is not None:
-                    last_name = span_last_name.text.strip()
-                    rank = td_rank.text.strip()
-                    data.append({'lastName': last_name, 'rank': rank, 'rankingDate': date})
-
-            df = pd.DataFrame(data)
-
-            if save:
-                df.to_csv(file_path, index=False)
-                logging.info(f"Data saved to {file_path}")
-                print(f"Data saved to atp_rankings_{date}.csv")
+            pending.append(date)
+
+        if workers <= 1:
+            for date in pending:
+                self.scrape_date(date, save=save)
+            return "Saved all dataframes to disk."
+
+        failed = self._run_pool(pending, save, workers, recycle_after)
+        if failed:
+            logging.warning(f"Failed to scrape {len(failed)} dates: {failed}")
         return "Saved all dataframes to disk."
+
+    def _run_pool(self, dates: List[str], save: bool, workers: int, recycle_after: Optional[int]) -> List[str]:
+        """
+        Shards dates over worker processes and returns the dates that failed.
+        """
+        ctx = mp.get_context('spawn')
+        date_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+        processes = [
+            ctx.Process(target=_pool_worker, args=(date_queue, result_queue, self.base_url, save, recycle_after, self.parser))
+            for _ in range(min(workers, len(dates)))
+        ]
+        for date in dates:
+            date_queue.put(date)
+        # One sentinel per worker, after every date
+        for _ in processes:
+            date_queue.put(None)
+        for p in processes:
+            p.start()
+
+        failed = []
+        done = 0
+        while done < len(dates):
+            try:
+                date, error = result_queue.get(timeout=5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    # Workers died without reporting (e.g. Chrome crashed the process)
+                    break
+                continue
+            done += 1
+            if error is not None:
+                failed.append(date)
+
+        for p in processes:
+            p.join()
+        if done < len(dates):
+            failed.extend(d for d in dates if not os.path.exists(ranking_file_path(d)) and d not in failed)
+        return failed
+
+    def scrape_date(self, date: str, save: bool) -> pd.DataFrame:
+        """
+        Fetches and parses the rankings page for a single week.
+        """
+        file_path = ranking_file_path(date)
+        df = parse_ranking_page(self.fetch_page(date), date=date, parser=self.parser)
+
+        if save:
+            write_csv_atomic(df, file_path)
+            logging.info(f"Data saved to {file_path}")
+            print(f"Data saved to atp_rankings_{date}.csv")
+        return df
     
 class RankingCombiner:
-    def __init__(self):
-        self.dataframes = []
-
-    def combine_dataframes(self):
-        rankings_dir = 'datafetcher/data/rankings'
-        all_files = [f for f in os.listdir(rankings_dir) if f.startswith('data_atp_rankings_') and f.endswith('.csv')]
-        for file in all_files:
-            file_path = os.path.join(rankings_dir, file)
-            if os.path.exists(file_path):
-                print(f"Loading file: {file_path}")
-                df = pd.read_csv(file_path)
-                self.dataframes.append(df)
-            else:
-                logging.warning(f"File {file_path} does not exist. Skipping.")
-        combined_df = pd.concat(self.dataframes, ignore_index=True)
-        return combined_df
+    def __init__(self, store: Optional[DatasetStore] = None):
+        self.rankings = RankingStore(store)
+
+    def combine_dataframes(self) -> pd.DataFrame:
+        """
+        Consolidates the weekly ranking files into the typed ranking dataset and returns it.
+        Only weeks that were not consolidated before are read.
+        """
+        return self.rankings.consolidate()
 
 
 if __name__ == "__main__":
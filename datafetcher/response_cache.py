@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+
+# Seasons whose last series started this long ago are final even if some blocks
+# never finished (cancelled or abandoned matches).
+SEASON_OVER_AFTER_DAYS = 60
+
+
+def content_hash(data: Any) -> str:
+    """
+    Returns a stable SHA-256 hash of JSON-serialisable data.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _to_timestamp(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def cuptree_status(cuptrees: Any) -> str:
+    """
+    A season is completed once every block of every cup tree is finished,
+    or once its latest series started more than SEASON_OVER_AFTER_DAYS ago.
+    """
+    blocks = [
+        block
+        for cuptree in (cuptrees if isinstance(cuptrees, list) else [])
+        for round_item in cuptree.get('rounds', []) or []
+        for block in round_item.get('blocks', []) or []
+    ]
+    if not blocks:
+        return IN_PROGRESS
+    if all(block.get('finished') for block in blocks):
+        return COMPLETED
+    starts = [ts for ts in (_to_timestamp(block.get('seriesStartDate')) for block in blocks) if ts is not None]
+    if starts and time.time() - max(starts) > SEASON_OVER_AFTER_DAYS * 86400:
+        return COMPLETED
+    return IN_PROGRESS
+
+
+def seasons_status(seasons: Any) -> str:
+    """
+    A tournament's season list is in progress while it contains the current season, i.e.
+    its latest season is from this year or last year; last year counts because next
+    season's entry is often only published shortly before the event. Lists of
+    tournaments that stopped earlier are completed.
+    """
+    years = []
+    for season in (seasons if isinstance(seasons, list) else []):
+        # The last year in e.g. "2023/2024"
+        match = re.search(r'(\d{4})(?!.*\d{4})', str(season.get('year') or season.get('name') or ''))
+        if match:
+            years.append(int(match.group(1)))
+    if not years:
+        return IN_PROGRESS
+    return IN_PROGRESS if max(years) >= datetime.now(timezone.utc).year - 1 else COMPLETED
+
+
+class ResponseCache:
+    """
+    Freshness metadata for the JSON files written by TennisDataFetcher.
+    For every file the index records when it was fetched, a hash of its content and
+    the season status. Completed seasons are never refetched; in-progress data is
+    refetched once it is older than its TTL, and only rewritten when the hash changed,
+    so unchanged files keep their mtime and are not reprocessed downstream. A fetch is
+    only recorded once its file is on disk, so a failed write is fetched again.
+    """
+    INDEX_FILE = "cache_index.json"
+
+    def __init__(self, save_dir: str, ttl: float = 6 * 3600, seasons_ttl: float = 24 * 3600, flush_every: int = 50):
+        self.save_dir = save_dir
+        self.ttl = ttl
+        self.seasons_ttl = seasons_ttl
+        self.flush_every = flush_every
+        self.index_path = os.path.join(save_dir, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Ignoring unreadable cache index {self.index_path}: {e}")
+
+    def _entry(self, filename: str, status_fn) -> Optional[Dict[str, Any]]:
+        """
+        Returns the index entry for a file, adopting files written before the index existed.
+        """
+        path = os.path.join(self.save_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with self._lock:
+            entry = self.index.get(filename)
+        if entry is None:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            adopted = {
+                "fetched_at": os.path.getmtime(path),
+                "hash": content_hash(data),
+                "status": status_fn(data),
+            }
+            with self._lock:
+                # Another thread may have fetched the file meanwhile; its entry wins
+                entry = self.index.setdefault(filename, adopted)
+                if entry is adopted:
+                    self._mark_dirty()
+        return entry
+
+    def is_fresh(self, filename: str, status_fn=lambda data: IN_PROGRESS, ttl: Optional[float] = None) -> bool:
+        """
+        Whether the cached file can be used without a new request.
+        """
+        entry = self._entry(filename, status_fn)
+        if entry is None:
+            return False
+        if entry["status"] == COMPLETED:
+            return True
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - entry["fetched_at"] < ttl
+
+    def load(self, filename: str) -> Any:
+        with open(os.path.join(self.save_dir, filename), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def needs_write(self, filename: str, digest: str) -> bool:
+        """
+        Returns whether a freshly fetched response with content hash digest has to be
+        (re)written. Nothing is recorded until mark_written.
+        """
+        with self._lock:
+            previous = self.index.get(filename)
+        changed = (
+            previous is None
+            or previous["hash"] != digest
+            or not os.path.exists(os.path.join(self.save_dir, filename))
+        )
+        if not changed:
+            logging.info("Content unchanged for %s, keeping existing file", filename)
+        return changed
+
+    def mark_written(self, filename: str, digest: str, status: str) -> None:
+        """
+        Records a fetch whose content is on disk, either just written or unchanged.
+        """
+        with self._lock:
+            self.index[filename] = {"fetched_at": time.time(), "hash": digest, "status": status}
+            self._mark_dirty()
+
+    def _mark_dirty(self) -> None:
+        # Caller holds the lock
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self._write_index()
+
+    def flush(self) -> None:
+        """
+        Writes pending index updates to disk.
+        """
+        with self._lock:
+            if self._dirty:
+                self._write_index()
+
+    def _write_index(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.save_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = 0
+        except Exception as e:
+            logging.error(f"Failed to write cache index {self.index_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,123 @@
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+GAME_COLUMNS = [
+    'finished', 'result', 'homeTeamScore', 'awayTeamScore', 'id', 'events', 'seriesStartDate',
+    'home_id', 'away_id', 'round_description', 'tournamentName', 'uniqueTournament'
+]
+
+PARTICIPANT_COLUMNS = ['name', 'slug', 'shortName', 'gender', 'nameCode', 'ranking', 'disabled', 'national', 'id']
+
+# Block fields copied as-is into the games output
+_BLOCK_COLUMNS = ['finished', 'homeTeamScore', 'awayTeamScore', 'id', 'events', 'seriesStartDate']
+# Order of the values in each collected game row
+_GAME_ROW_COLUMNS = _BLOCK_COLUMNS + ['result', 'home_id', 'away_id', 'round_description', 'tournamentName', 'uniqueTournament']
+
+_SKIPPED_RESULTS = ('retired', 'walkover', '0:0')
+_RECOMPUTED_RESULTS = ('home won', 'away won', 'on-going')
+
+
+class CuptreeExtractor:
+    """
+    Single-pass extractor for raw cuptree JSON.
+    Walks the rounds/blocks tree once, collecting one tuple per output row that is
+    transposed into typed columns at the end. Produces the same frames as the
+    DataFrame-based extraction it replaced (kept in benchmarks/legacy_extraction.py)
+    without building intermediate DataFrames, copying blocks or mutating the source JSON.
+    """
+    def __init__(self, map_round_description: Callable[[str], str], validate_score_format: Callable[[str], bool]):
+        self.map_round_description = map_round_description
+        self.validate_score_format = validate_score_format
+        self._round_cache: Dict[str, str] = {}
+        self._score_cache: Dict[str, bool] = {}
+
+    def _round(self, description: Any) -> str:
+        if not description:
+            return ""
+        mapped = self._round_cache.get(description)
+        if mapped is None:
+            mapped = self.map_round_description(description)
+            self._round_cache[description] = mapped
+        return mapped
+
+    def _is_valid_score(self, result: str) -> bool:
+        valid = self._score_cache.get(result)
+        if valid is None:
+            valid = self._score_cache[result] = self.validate_score_format(result)
+        return valid
+
+    def extract(self, cuptrees: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Returns (participants, games) DataFrames for a cuptree JSON list.
+        Missing keys become NaN, matching pd.json_normalize.
+        """
+        if not isinstance(cuptrees, list):
+            raise ValueError(f"Expected a list of cuptrees, got {type(cuptrees).__name__}")
+
+        # Participants repeat in every round they play, so duplicates are dropped while
+        # walking; the index keeps each row's first position like drop_duplicates does.
+        participant_rows: Dict[tuple, int] = {}
+        participant_position = 0
+        game_rows: List[tuple] = []
+        participant_defaults = [np.nan] * len(PARTICIPANT_COLUMNS)
+        block_defaults = [np.nan] * len(_BLOCK_COLUMNS)
+        add_participant = participant_rows.setdefault
+        add_game = game_rows.append
+        is_valid_score = self._is_valid_score
+
+        for cuptree in cuptrees:
+            tournament = cuptree['tournament']
+            tournament_name = tournament['name']
+            unique_tournament = tournament['uniqueTournament']['name']
+            rounds = cuptree.get('rounds')
+            if not isinstance(rounds, list):
+                continue
+            for round_item in rounds:
+                round_description = None
+                for block in round_item.get('blocks', []):
+                    block_participants = block.get('participants', [])
+                    for participant in block_participants:
+                        add_participant(tuple(map(participant.get('team', {}).get, PARTICIPANT_COLUMNS, participant_defaults)),
+                                        participant_position)
+                        participant_position += 1
+
+                    result = block.get('result')
+                    if result.lower() in _SKIPPED_RESULTS:
+                        continue
+                    elif result in _RECOMPUTED_RESULTS:
+                        result = block['homeTeamScore'] + ':' + block['awayTeamScore']
+                    if not is_valid_score(result):
+                        logging.error(f"Invalid score format: {result}")
+
+                    if round_description is None:
+                        round_description = self._round(round_item.get('description', {}))
+                    add_game((
+                        *map(block.get, _BLOCK_COLUMNS, block_defaults),
+                        result,
+                        block_participants[0]['team'].get('id'),
+                        block_participants[1]['team'].get('id') if len(block_participants) != 1 else None,
+                        round_description,
+                        tournament_name,
+                        unique_tournament,
+                    ))
+
+        participants_df = _frame_from_rows(list(participant_rows), PARTICIPANT_COLUMNS, index=list(participant_rows.values()))
+        if not game_rows:
+            return participants_df, pd.DataFrame()
+        games_df = _frame_from_rows(game_rows, _GAME_ROW_COLUMNS)[GAME_COLUMNS]
+
+        games_df['seriesStartDate'] = pd.to_datetime(games_df['seriesStartDate'], errors='coerce')
+        return participants_df, games_df
+
+
+def _frame_from_rows(rows: List[tuple], columns: List[str], index=None) -> pd.DataFrame:
+    """
+    Transposes row tuples into one list per column and lets pandas infer each column's dtype.
+    """
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    data = dict(zip(columns, map(list, zip(*rows))))
+    return pd.DataFrame(data, columns=columns, index=index)
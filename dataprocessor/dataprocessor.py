@@ -1,55 +1,40 @@
+import contextlib
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import json
 import os   
 import re
+from dataprocessor.cuptree_extractor import CuptreeExtractor
+from dataprocessor.manifest import ProcessingManifest
+from storage.dataset_store import DatasetStore
+from storage.schemas import GAMES_SCHEMA, PARTICIPANTS_SCHEMA, apply_schema, home_wins
 
-class TennisDataProcessor:
-    def __init__(self):
-        pass
 
-    def process_cuptree_json(self, cuptree: Dict[str, Any]) -> pd.DataFrame:
-        """Extracts relevant columns from a cuptree JSON into a DataFrame with error handling."""
-        
-        try:
-            columns = [
-                'id',
-                'name',
-                'tournament',
-                'rounds',
-            ]
-
-            df = pd.DataFrame(cuptree)
-            # Only keep the specified columns if they exist
-            df = df[[col for col in columns if col in df.columns]]
-
-            return df
-        except Exception as e:
-            logging.error(f"Error processing cuptree JSON: {e}")
-            return pd.DataFrame()
-    
-    def get_all_participants(self, cuptrees: pd.DataFrame) -> Any:
-        """
-        Extracts all participants from the 'rounds' column of the cuptree DataFrame.
-        Returns a DataFrame with all participants flattened.
-        """
-        participants_list = []
+def process_cuptree_file(path: str) -> Tuple[str, Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[str]]:
+    """
+    Processes a single cuptree JSON file into participant and game DataFrames.
+    Defined at module level so it can run in a process pool; errors are returned
+    instead of raised so one bad file does not abort the whole run.
+    """
+    try:
+        processor = TennisDataProcessor()
+        with open(path, 'r', encoding='utf-8') as f:
+            cuptree = json.load(f)
+        participants_df, games_df = processor.extractor.extract(cuptree)
+        return path, participants_df, games_df, None
+    except Exception as e:
+        return path, None, None, f"{type(e).__name__}: {e}"
+
+
+class TennisDataProcessor:
+    def __init__(self, store: Optional[DatasetStore] = None):
+        self.store = store or DatasetStore()
+        self.errors: Dict[str, str] = {}
+        self.extractor = CuptreeExtractor(self.map_round_description, self.validate_score_format)
 
-        for rounds in cuptrees['rounds']:
-            for round_item in rounds:
-                blocks = round_item.get('blocks', [])
-                for block in blocks:
-                    participants = block.get('participants', {})
-                    for participant in participants:
-                        team = participant.get('team', {})
-                        team['winner'] = participant.get('winner', None)
-                        team['order'] = participant.get('order', None)
-                        team['teamSeed'] = participant.get('teamSeed', None)
-                        participants_list.append(team)
-        
-        return pd.DataFrame(participants_list)[['name', 'slug', 'shortName', 'gender', 'nameCode', 'ranking', 'disabled', 'national', 'id']].drop_duplicates()
-                  
     def map_round_description(self, round_description: str) -> str:
         """
         Maps a round description dictionary to a human-readable string.
@@ -98,99 +83,221 @@ class TennisDataProcessor:
         else:
             return False
 
-    def extract_games_from_cuptree(self, cuptrees: pd.DataFrame) -> pd.DataFrame:
+    def process_files(self, paths: List[str], workers: int = 1) -> List[Tuple[str, Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[str]]]:
         """
-        Extracts and flattens all games from the 'rounds' column of the cuptree DataFrame.
-        Returns a DataFrame with one row per game, including home and away participant IDs.
+        Processes cuptree files, fanning them out to a process pool when workers > 1.
+        Results are returned in the order of paths regardless of completion order.
         """
-        games_list = []
+        if workers <= 1 or len(paths) <= 1:
+            results = []
+            for path in paths:
+                logging.info(f"Processing cuptree file: {path}")
+                results.append(process_cuptree_file(path))
+            return results
 
-        for _, cuptree in cuptrees.iterrows():
-            tournamentName = cuptree['tournament']['name']
-            uniqueTournament = cuptree['tournament']['uniqueTournament']['name']
-            rounds = cuptree['rounds']
-            if not isinstance(rounds, list):
-                continue
-            for round_item in rounds:
-                round_description = round_item.get('description', {})
-                blocks = round_item.get('blocks', [])
-                for block in blocks:
-                    if block.get('result').lower() in ['retired', 'walkover', '0:0']:
-                        continue
-                    elif block.get('result') in ['home won', 'away won', 'on-going']:
-                        block['result'] = block['homeTeamScore'] + ':' + block['awayTeamScore']
-                    if not self.validate_score_format(block.get('result')):
-                        logging.error(f"Invalid score format: {block.get('result')}")
-                    participants = block.get('participants', [])
-                    block_copy = block.copy()
-                    block_copy['home_id'] = participants[0]['team'].get('id')
-                    if len(participants) == 1:
-                        block_copy['away_id'] = None
-                    else:
-                        block_copy['away_id'] = participants[1]['team'].get('id')
-                    block_copy['round_description'] = self.map_round_description(round_description)
-                    block_copy['tournamentName'] = tournamentName
-                    block_copy['uniqueTournament'] = uniqueTournament
-                    
-                    games_list.append(block_copy)
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(process_cuptree_file, paths, chunksize=chunksize))
 
-        if not games_list:
-            return pd.DataFrame()
+    def iter_files(self, paths: List[str], workers: int = 1) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[str]]]:
+        """
+        Processes cuptree files like process_files, yielding each result in the order of paths
+        as soon as it is ready. At most workers * 4 files are in flight, so results never pile
+        up faster than they are consumed.
+        """
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                logging.info(f"Processing cuptree file: {path}")
+                yield process_cuptree_file(path)
+            return
 
-        games_df = pd.json_normalize(games_list)
+        window = workers * 4
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(paths), window):
+                yield from executor.map(process_cuptree_file, paths[start:start + window])
 
-        
-        games_df['seriesStartDate'] = pd.to_datetime(games_df.get('seriesStartDate', None), errors='coerce')
+    def cuptree_paths(self, max_cuptrees: Optional[int] = None) -> List[str]:
+        """
+        Returns the cuptree files in datafetcher/data in name order, at most max_cuptrees.
+        """
+        data_dir = os.path.join('datafetcher', 'data')
+        cuptree_files = sorted(f for f in os.listdir(data_dir) if f.startswith('cuptrees') and f.endswith('.json'))
+        if not cuptree_files:
+            raise FileNotFoundError("No files starting with 'cuptrees' found in datafetcher/data")
 
-        return games_df[['finished', 'result', 'homeTeamScore',
-       'awayTeamScore', 
-       'id', 'events', 'seriesStartDate',
-       'home_id', 'away_id', 'round_description', 'tournamentName', 'uniqueTournament']]
-    
-    def process_all_data(self, max_cuptrees: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        if max_cuptrees is not None:
+            cuptree_files = cuptree_files[:max_cuptrees]
+        return [os.path.join(data_dir, f) for f in cuptree_files]
+
+    @staticmethod
+    def concat_parts(participants_list: List[pd.DataFrame], games_list: List[pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Concatenates per-file participants and games, with one participant row per id (the
+        first one seen) and the home_win label next to each result.
+        """
+        # Cast every part first so rows kept from a previous run concatenate without dtype drift
+        participants_df = pd.concat([apply_schema(df, PARTICIPANTS_SCHEMA) for df in participants_list], ignore_index=True) if participants_list else pd.DataFrame()
+        games_df = pd.concat([apply_schema(df, GAMES_SCHEMA) for df in games_list], ignore_index=True) if games_list else pd.DataFrame()
+
+        if not participants_df.empty:
+            participants_df = participants_df.drop_duplicates(subset='id').reset_index(drop=True)
+        if not games_df.empty:
+            # The label is derived from the result, also for rows kept from a previous run
+            games_df = games_df.drop(columns='home_win', errors='ignore')
+            games_df.insert(games_df.columns.get_loc('result') + 1, 'home_win', home_wins(games_df['result']))
+        return participants_df, games_df
+
+    def process_all_data(self, max_cuptrees: Optional[int] = None, workers: int = 1, incremental: bool = False,
+                         save: bool = True) -> Dict[str, Any]:
         """
         Processes all cuptree JSON files and returns a dictionary with DataFrames for:
-        - tournaments
         - participants
         - games
+        and the per-file errors of files that could not be processed.
 
         Args:
             max_cuptrees: Maximum number of cuptree files to process. If None, process all.
+            workers: Number of processes used to parse cuptree files in parallel.
+            incremental: Only process cuptree files that are new or changed since the last run
+                according to dataprocessor/data/manifest.json, replacing their rows in the
+                existing outputs. Falls back to a full run when there is no previous output.
+            save: Whether to write participants, games and the manifest to dataprocessor/data.
+                Incremental runs always save, since the next run builds on their output.
         """
-        data_dir = os.path.join('datafetcher', 'data')
-        cuptree_files = [f for f in os.listdir(data_dir) if f.startswith('cuptrees') and f.endswith('.json')]
-        if not cuptree_files:
-            raise FileNotFoundError("No files starting with 'cuptrees' found in datafetcher/data")
-
-        if max_cuptrees is not None:
-            cuptree_files = cuptree_files[:max_cuptrees]
+        output_dir = os.path.join('dataprocessor', 'data')
+        participants_path = os.path.join(output_dir, 'participants')
+        games_path = os.path.join(output_dir, 'games')
+        paths = self.cuptree_paths(max_cuptrees)
 
+        manifest = ProcessingManifest(os.path.join(output_dir, 'manifest.json'))
         participants_list = []
         games_list = []
+        errors = {}
 
-        for cuptree_file in cuptree_files:
-            logging.info(f"Processing cuptree file: {cuptree_file}")
-            with open(os.path.join(data_dir, cuptree_file), 'r', encoding='utf-8') as f:
-                cuptree = json.load(f)
-            processed_cuptree = self.process_cuptree_json(cuptree)
-            participants_df = self.get_all_participants(processed_cuptree)
-            games_df = self.extract_games_from_cuptree(processed_cuptree)
+        if incremental and manifest.entries and self.store.exists(games_path) and self.store.exists(participants_path):
+            to_process, stale = manifest.diff(paths)
+            existing_games = self.store.read(games_path, schema=GAMES_SCHEMA)
+            keep = np.ones(len(existing_games), dtype=bool)
+            for start, stop in manifest.row_ranges(stale):
+                keep[start:stop] = False
+            manifest.remove(stale)
+            kept_games = existing_games[keep].reset_index(drop=True)
+            # Only keep participants of the files that are kept, so players seen only in stale
+            # or deleted files drop out; the reprocessed files add theirs back
+            kept_ids = manifest.participant_ids()
+            if kept_ids is None:
+                # Manifests from before participants were recorded: use the kept games
+                kept_ids = pd.concat([kept_games['home_id'], kept_games['away_id']]).dropna().unique()
+            existing_participants = self.store.read(participants_path, schema=PARTICIPANTS_SCHEMA)
+            participants_list.append(existing_participants[existing_participants['id'].isin(list(kept_ids))])
+            games_list.append(kept_games)
+            logging.info(f"Incremental run: {len(to_process)} new or changed files, {len(stale)} stale entries, "
+                         f"{int((~keep).sum())} game rows removed")
+        else:
+            to_process = paths
+            manifest.entries = {}
+
+        offset = sum(len(df) for df in games_list)
+        for path, participants_df, games_df, error in self.process_files(to_process, workers=workers):
+            if error is not None:
+                logging.error(f"Failed to process cuptree file {path}: {error}")
+                errors[os.path.basename(path)] = error
+                continue
             participants_list.append(participants_df)
             games_list.append(games_df)
+            manifest.add(path, offset, offset + len(games_df), participants_df.get('id', ()))
+            offset += len(games_df)
 
-        participants_df = pd.concat(participants_list, ignore_index=True) if participants_list else pd.DataFrame()
-        games_df = pd.concat(games_list, ignore_index=True) if games_list else pd.DataFrame()
+        if errors:
+            logging.warning(f"{len(errors)} of {len(to_process)} cuptree files failed to process")
 
-        participants_df = participants_df.drop_duplicates().reset_index(drop=True)
+        participants_df, games_df = self.concat_parts(participants_list, games_list)
 
-        # Save participants and games DataFrames separately as CSV files
-        participants_df.drop_duplicates().to_csv(os.path.join('dataprocessor', 'data', 'participants.csv'), index=False)
-        games_df.to_csv(os.path.join('dataprocessor', 'data', 'games.csv'), index=False)
+        # Save participants and games DataFrames separately
+        if save or incremental:
+            participants_df = self.store.write(participants_df, participants_path, schema=PARTICIPANTS_SCHEMA)
+            games_df = self.store.write(games_df, games_path, schema=GAMES_SCHEMA)
+            manifest.save()
+        else:
+            participants_df = apply_schema(participants_df, PARTICIPANTS_SCHEMA)
+            games_df = apply_schema(games_df, GAMES_SCHEMA)
 
         return {
             "participants": participants_df,
-            "games": games_df
+            "games": games_df,
+            "errors": errors,
+            "processed_files": [os.path.basename(p) for p in to_process]
         }
+
+    def iter_processed(self, chunk_size: int, max_cuptrees: Optional[int] = None, workers: int = 1,
+                       save: bool = True) -> Iterator[Dict[str, pd.DataFrame]]:
+        """
+        Streaming counterpart of process_all_data: yields dictionaries with the games of
+        consecutive cuptree files, about chunk_size rows at a time (whole files, so a file
+        with more games is one chunk), and the participants of those files. Only one chunk is
+        held at a time besides the distinct participants seen so far.
+
+        Args:
+            chunk_size: Number of game rows after which a chunk is yielded.
+            max_cuptrees, workers: As for process_all_data.
+            save: Whether to append the games to dataprocessor/data/games as they are yielded
+                and write participants and the manifest at the end. The stored outputs are
+                only replaced once every chunk has been consumed, and kept when no file could
+                be processed; the per-file errors are in self.errors.
+        """
+        output_dir = os.path.join('dataprocessor', 'data')
+        paths = self.cuptree_paths(max_cuptrees)
+        manifest = ProcessingManifest(os.path.join(output_dir, 'manifest.json'))
+        manifest.entries = {}
+        self.errors = {}
+        participants_df = None
+        participants_list, games_list = [], []
+        offset = 0
+
+        with contextlib.ExitStack() as stack:
+            games_writer = stack.enter_context(self.store.writer(os.path.join(output_dir, 'games'), schema=GAMES_SCHEMA)) if save else None
+            for i, (path, participants, games, error) in enumerate(self.iter_files(paths, workers=workers)):
+                if error is not None:
+                    logging.error(f"Failed to process cuptree file {path}: {error}")
+                    self.errors[os.path.basename(path)] = error
+                else:
+                    participants_list.append(participants)
+                    games_list.append(games)
+                    manifest.add(path, offset, offset + len(games), participants.get('id', ()))
+                    offset += len(games)
+                if games_list and (sum(len(df) for df in games_list) >= chunk_size or i == len(paths) - 1):
+                    chunk_participants, chunk_games = self.concat_parts(participants_list, games_list)
+                    participants_list, games_list = [], []
+                    if games_writer is not None:
+                        chunk_games = games_writer.write(chunk_games)
+                    if participants_df is None:
+                        participants_df = chunk_participants
+                    else:
+                        # Participant rows already seen in earlier chunks are left out of this one
+                        seen = len(participants_df)
+                        participants_df = pd.concat([participants_df, chunk_participants], ignore_index=True).drop_duplicates(subset='id')
+                        chunk_participants = participants_df.iloc[seen:]
+                    logging.info(f"Processed {offset} games from {i + 1} of {len(paths)} cuptree files")
+                    yield {"participants": chunk_participants, "games": chunk_games}
+
+        if participants_df is None:
+            # The games writer kept the previous games, so participants and the manifest are kept too
+            logging.error(f"None of the {len(paths)} cuptree files could be processed, keeping the previous "
+                          f"outputs; errors per file: {self.errors}")
+            return
+        if self.errors:
+            logging.warning(f"{len(self.errors)} of {len(paths)} cuptree files failed to process")
+        if save:
+            self.store.write(participants_df.reset_index(drop=True), os.path.join(output_dir, 'participants'),
+                             schema=PARTICIPANTS_SCHEMA)
+            manifest.save()
+
+    def process_in_chunks(self, chunk_size: int, max_cuptrees: Optional[int] = None, workers: int = 1) -> int:
+        """
+        Processes all cuptree files chunk by chunk into dataprocessor/data, with memory
+        bounded by chunk_size instead of the number of files. Returns the number of games.
+        """
+        return sum(len(chunk["games"]) for chunk in self.iter_processed(chunk_size, max_cuptrees, workers))
     
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hash of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProcessingManifest:
+    """
+    Records which cuptree files produced which rows of the processed games output.
+    Each entry holds the file's size, mtime and content hash, the [start, stop)
+    row range of its games and the ids of its participants, so a run only has to
+    reprocess new or changed files.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    def diff(self, paths: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Compares the manifest with the given cuptree files.
+        Returns (files to process, manifest entries to drop). Changed files appear in both.
+        Size and mtime are checked first; the content hash is only computed when they differ,
+        so a touched but unchanged file is not reprocessed.
+        """
+        to_process = []
+        current = {os.path.basename(p): p for p in paths}
+        stale = [name for name in self.entries if name not in current]
+
+        for name, path in current.items():
+            entry = self.entries.get(name)
+            if entry is None:
+                to_process.append(path)
+                continue
+            stat = os.stat(path)
+            if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+                continue
+            digest = file_hash(path)
+            if digest == entry['sha256']:
+                entry['mtime'] = stat.st_mtime
+                continue
+            to_process.append(path)
+            stale.append(name)
+        return to_process, stale
+
+    def row_ranges(self, names: List[str]) -> List[Tuple[int, int]]:
+        return [tuple(self.entries[name]['games']) for name in names if name in self.entries]
+
+    def remove(self, names: List[str]) -> None:
+        """
+        Drops entries and renumbers the remaining row ranges, which stay in their original order.
+        """
+        for name in names:
+            self.entries.pop(name, None)
+        position = 0
+        for name, entry in sorted(self.entries.items(), key=lambda item: item[1]['games'][0]):
+            length = entry['games'][1] - entry['games'][0]
+            entry['games'] = [position, position + length]
+            position += length
+
+    def participant_ids(self) -> Optional[Set[int]]:
+        """
+        Returns the participant ids of all entries, or None when an entry was written
+        before participants were recorded.
+        """
+        ids = set()
+        for entry in self.entries.values():
+            if 'participants' not in entry:
+                return None
+            ids.update(entry['participants'])
+        return ids
+
+    def add(self, path: str, start: int, stop: int, participant_ids: Iterable[Any] = ()) -> None:
+        stat = os.stat(path)
+        self.entries[os.path.basename(path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_hash(path),
+            'games': [start, stop],
+            'participants': sorted({int(i) for i in participant_ids if not pd.isna(i)}),
+        }
+
+    def save(self) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
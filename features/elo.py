@@ -0,0 +1,218 @@
+# features/elo.py
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage.schemas import home_wins, map_values
+
+RATING_COLUMNS = ['elo_home', 'elo_away', 'surface_elo_home', 'surface_elo_away']
+
+
+def home_won(results: pd.Series) -> np.ndarray:
+    """
+    Returns 1.0 where the home player won a result like '3:1', 0.0 where they lost and
+    NaN for results without a score. Each distinct result is parsed once.
+    """
+    return home_wins(results).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class EloRatingEngine:
+    """
+    Online Elo ratings, overall and per surface.
+
+    Matches are applied in (seriesStartDate, round) order with an O(1) update each, and
+    every match gets both players' ratings from before it was played, so the features never
+    include the match's own result. A player's K-factor shrinks with the number of matches
+    they played: k = k_base / (played + k_offset) ** k_shape.
+
+    The state can be saved as a snapshot and loaded later to apply only new matches.
+
+    Args:
+        surfaces: Tournament name -> surface, e.g. tournament_surfaces in feature_builder.
+        round_order: Round description -> ordinal, used to order matches on the same date.
+    """
+    def __init__(self, surfaces: Dict[str, str], round_order: Dict[str, int], initial: float = 1500.0,
+                 k_base: float = 250.0, k_offset: float = 5.0, k_shape: float = 0.4):
+        self.surfaces = dict(surfaces)
+        self.surface_names = sorted(set(self.surfaces.values()))
+        self.round_order = dict(round_order)
+        self.initial = initial
+        self.k_base = k_base
+        self.k_offset = k_offset
+        self.k_shape = k_shape
+
+        self._slots: Dict[int, int] = {}
+        self._ratings = []
+        self._played = []
+        self._surface_ratings = [[] for _ in self.surface_names]
+        self._surface_played = [[] for _ in self.surface_names]
+        self.applied_ids = np.empty(0, dtype=np.int64)
+        self.last_key = (np.iinfo(np.int64).min, -1)
+
+    @property
+    def params(self) -> Dict:
+        return {'surfaces': self.surfaces, 'round_order': self.round_order, 'initial': self.initial,
+                'k_base': self.k_base, 'k_offset': self.k_offset, 'k_shape': self.k_shape}
+
+    def order_keys(self, matches: pd.DataFrame):
+        """
+        Returns the (date, round ordinal) keys of matches. Matches without a date sort last.
+        """
+        dates = pd.to_datetime(matches['seriesStartDate']).to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+        dates[dates == np.iinfo(np.int64).min] = np.iinfo(np.int64).max
+        rounds = np.nan_to_num(map_values(matches['round_description'], self.round_order, np.float64)).astype(np.int64)
+        return dates, rounds
+
+    def _player_slots(self, ids: pd.Series) -> np.ndarray:
+        """
+        Maps player ids to state slots, adding new players. Missing ids map to -1.
+        """
+        values = pd.array(ids, dtype='Int64')
+        keys = values.to_numpy(dtype=np.int64, na_value=-1)
+        known = ~values.isna()
+        unique, inverse = np.unique(keys[known], return_inverse=True)
+        lookup = np.empty(len(unique), dtype=np.int64)
+        for i, player in enumerate(unique.tolist()):
+            slot = self._slots.get(player)
+            if slot is None:
+                slot = self._slots[player] = len(self._ratings)
+                self._ratings.append(self.initial)
+                self._played.append(0)
+                for ratings, played in zip(self._surface_ratings, self._surface_played):
+                    ratings.append(self.initial)
+                    played.append(0)
+            lookup[i] = slot
+        slots = np.full(len(keys), -1, dtype=np.int64)
+        slots[known] = lookup[inverse]
+        return slots
+
+    def rate(self, matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Applies matches after those already rated and returns the pre-match ratings,
+        indexed like matches, in RATING_COLUMNS.
+        """
+        dates, rounds = self.order_keys(matches)
+        order = np.lexsort((rounds, dates))
+
+        homes = self._player_slots(matches['home_id'])[order].tolist()
+        aways = self._player_slots(matches['away_id'])[order].tolist()
+        surface_index = {tournament: self.surface_names.index(surface) for tournament, surface in self.surfaces.items()}
+        surfaces = np.nan_to_num(map_values(matches['uniqueTournament'], surface_index, np.float64), nan=-1)
+        surfaces = surfaces.astype(np.int64)[order].tolist()
+        outcomes = home_won(matches['result'])[order].tolist()
+
+        n = len(order)
+        nan = float('nan')
+        elo_home, elo_away, surface_home, surface_away = ([nan] * n for _ in range(4))
+        ratings, played = self._ratings, self._played
+        surface_ratings, surface_played = self._surface_ratings, self._surface_played
+        # K-factor per number of matches played, looked up instead of computing a power per update
+        most_played = max(played + [p for counts in surface_played for p in counts], default=0)
+        k = (self.k_base / (np.arange(most_played + n + 1) + self.k_offset) ** self.k_shape).tolist()
+
+        for i in range(n):
+            home, away, surface, outcome = homes[i], aways[i], surfaces[i], outcomes[i]
+            if home < 0 or away < 0:
+                continue
+            r_home, r_away = ratings[home], ratings[away]
+            elo_home[i], elo_away[i] = r_home, r_away
+            if surface >= 0:
+                s_ratings, s_played = surface_ratings[surface], surface_played[surface]
+                s_home, s_away = s_ratings[home], s_ratings[away]
+                surface_home[i], surface_away[i] = s_home, s_away
+            if outcome != outcome:
+                # No score, so nothing to learn from this match
+                continue
+
+            delta = outcome - 1.0 / (1.0 + 10.0 ** ((r_away - r_home) / 400.0))
+            ratings[home] = r_home + k[played[home]] * delta
+            ratings[away] = r_away - k[played[away]] * delta
+            played[home] += 1
+            played[away] += 1
+            if surface >= 0:
+                delta = outcome - 1.0 / (1.0 + 10.0 ** ((s_away - s_home) / 400.0))
+                s_ratings[home] = s_home + k[s_played[home]] * delta
+                s_ratings[away] = s_away - k[s_played[away]] * delta
+                s_played[home] += 1
+                s_played[away] += 1
+
+        if n:
+            self.last_key = max(self.last_key, (int(dates[order[-1]]), int(rounds[order[-1]])))
+        if 'id' in matches.columns:
+            ids = pd.array(matches['id'], dtype='Int64')
+            applied = np.concatenate([self.applied_ids, ids[~ids.isna()].to_numpy(dtype=np.int64)])
+            applied.sort()
+            self.applied_ids = applied[np.concatenate([[True], applied[1:] != applied[:-1]])]
+
+        values = np.empty((n, len(RATING_COLUMNS)))
+        if n:
+            values[order] = np.column_stack([elo_home, elo_away, surface_home, surface_away])
+        return pd.DataFrame(values, index=matches.index, columns=RATING_COLUMNS)
+
+    def can_extend(self, matches: pd.DataFrame) -> bool:
+        """
+        Whether matches can be applied on top of the current state, i.e. none of them is
+        ordered before a match that was already rated.
+        """
+        dates, rounds = self.order_keys(matches)
+        last_date, last_round = self.last_key
+        before = (dates < last_date) | ((dates == last_date) & (rounds < last_round))
+        return not before.any()
+
+    def ratings(self) -> pd.DataFrame:
+        """
+        Returns the current ratings and match counts per player id.
+        """
+        ratings = pd.DataFrame({'id': np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots)),
+                                'elo': self._ratings, 'matches': self._played})
+        for name, s_ratings, s_played in zip(self.surface_names, self._surface_ratings, self._surface_played):
+            ratings[f'elo_{name.lower()}'] = s_ratings
+            ratings[f'matches_{name.lower()}'] = s_played
+        return ratings
+
+    def save(self, path: str) -> None:
+        """
+        Writes the engine state as a compressed numpy snapshot.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            ids=np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots)),
+            ratings=np.asarray(self._ratings, dtype=np.float64),
+            played=np.asarray(self._played, dtype=np.int32),
+            surface_ratings=np.asarray(self._surface_ratings, dtype=np.float64).reshape(len(self.surface_names), -1),
+            surface_played=np.asarray(self._surface_played, dtype=np.int32).reshape(len(self.surface_names), -1),
+            applied_ids=self.applied_ids,
+            last_key=np.asarray(self.last_key, dtype=np.int64),
+            params=np.asarray(json.dumps(self.params, sort_keys=True)),
+        )
+        os.replace(tmp_path, path)
+        logging.info(f"Elo snapshot saved to {path} ({len(self._slots)} players)")
+
+    @classmethod
+    def load(cls, path: str, **params) -> Optional['EloRatingEngine']:
+        """
+        Restores an engine from a snapshot. Returns None if there is no snapshot or it was
+        made with other parameters, in which case history has to be replayed.
+        """
+        if not os.path.exists(path):
+            return None
+        engine = cls(**params)
+        with np.load(path) as snapshot:
+            if json.loads(str(snapshot['params'])) != json.loads(json.dumps(engine.params, sort_keys=True)):
+                logging.info(f"Elo snapshot {path} was made with other parameters, ignoring it")
+                return None
+            ids = snapshot['ids'].tolist()
+            engine._slots = {player: slot for slot, player in enumerate(ids)}
+            engine._ratings = snapshot['ratings'].tolist()
+            engine._played = snapshot['played'].tolist()
+            engine._surface_ratings = [row.tolist() for row in snapshot['surface_ratings']]
+            engine._surface_played = [row.tolist() for row in snapshot['surface_played']]
+            engine.applied_ids = snapshot['applied_ids']
+            engine.last_key = tuple(int(k) for k in snapshot['last_key'])
+        return engine
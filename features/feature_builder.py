@@ -3,82 +3,225 @@ import pandas as pd
 import logging
 from datetime import datetime
 import numpy as np 
+from typing import Optional, Union
+from datacombiner.name_resolver import NameResolver, rankings_by_id
+from datacombiner.player_table import PlayerTable
+from datacombiner.symmetric import SymmetricGames, swap_columns
+from datafetcher.ranking_store import RankingStore, asof_ranks
+from features.elo import RATING_COLUMNS, EloRatingEngine
+from features.history import MatchHistory
+from storage.dataset_store import DatasetStore
+from storage.schemas import COMBINED_SCHEMA, ROUNDS, home_wins, map_values
 
 # TODO should be in config but for now stays here
-ordinal_mapping = {
-    'Q1': 1,
-    'Q2': 2,
-    'Q': 3,
-    'R128': 4,
-    'R64': 5,
-    'R32': 6,
-    'R16': 7,
-    'R8': 8,
-    'QF': 9,
-    'SF': 10,
-    'F': 11
-}
+ordinal_mapping = {round_description: i + 1 for i, round_description in enumerate(ROUNDS)}
 
 tournament_surfaces = {
     'Australian Open': 'Hard',
     'Roland Garros': 'Clay'
 }
 
+ELO_SNAPSHOT = 'features/data/elo_snapshot.npz'
+RATINGS_PATH = 'features/data/ratings'
+MATCHES_PATH = 'datacombiner/data/matches'
+FEATURES_PATH = 'features/data/features'
+# Columns of the combined matches that features are computed from
+MATCH_COLUMNS = ['id', 'result', 'home_win', 'seriesStartDate', 'home_id', 'away_id', 'round_description',
+                 'uniqueTournament', 'id_home', 'id_away', 'birthdate_home', 'birthdate_away']
+
 class FeatureBuilder:
-    def __init__(self):
-        self.combined_data = pd.read_csv('datacombiner/data/combined.csv')
-
-    def define_label(self, result: str) -> str:
-        # Define the label
-        if isinstance(result, str) and ':' in result:
-            parts = result.split(':')
-            if int(parts[0]) > int(parts[1]):
-                return 'home'
-            else:
-                return 'away'
-        else:
+    def __init__(self, store: Optional[DatasetStore] = None, batch_size: Optional[int] = None):
+        """
+        Args:
+            store: Storage used for inputs and checkpoints.
+            batch_size: Number of rows of the symmetric dataset to build features for at a time.
+                By default the stored matches and their mirror are each handled in one go.
+        """
+        self.store = store or DatasetStore()
+        self.batch_size = batch_size
+        self.history = MatchHistory(ordinal_mapping)
+        self.rankings = RankingStore(self.store)
+        self.resolver = NameResolver(self.store)
+        self.players: Optional[PlayerTable] = None
+        self.combined_data = None
+
+    def load_inputs(self) -> SymmetricGames:
+        matches = self.store.read(MATCHES_PATH, schema=COMBINED_SCHEMA)
+        self.combined_data = SymmetricGames(matches)
+        return self.combined_data
+
+    def define_label(self, data: pd.DataFrame) -> pd.Series:
+        """
+        Returns the train label, 'home' or 'away', from the precomputed home_win column, or
+        from the results of data stored before that column existed.
+        """
+        won = data['home_win'] if 'home_win' in data.columns else home_wins(data['result'])
+        if won.isna().any():
+            result = data['result'][won.isna().to_numpy()].iloc[0]
             logging.error(f"Invalid result format: {result}")
             raise ValueError(f"Invalid result format: {result}")
-        
+        labels = np.where(won.to_numpy(dtype=bool), 'home', 'away')
+        return pd.Series(pd.Categorical(labels, categories=['away', 'home']), index=data.index)
+
     def player_features(self, data: pd.DataFrame) -> pd.DataFrame:
         features = pd.DataFrame()
         features['id_home'] = data['id_home']
         features['id_away'] = data['id_away']
-        features['age_home'] = (pd.to_datetime(data['seriesStartDate']) - pd.to_datetime(data['birthdate_home'])).dt.days.div(365.25)
-        features['age_away'] = (pd.to_datetime(data['seriesStartDate']) - pd.to_datetime(data['birthdate_away'])).dt.days.div(365.25)
+        dates = pd.to_datetime(data['seriesStartDate'])
+        features['age_home'] = (dates - pd.to_datetime(data['birthdate_home'])).dt.days.div(365.25)
+        features['age_away'] = (dates - pd.to_datetime(data['birthdate_away'])).dt.days.div(365.25)
         return features
 
 
-    def build_features(self) -> pd.DataFrame:
-        # Extract relevant features from the combined data
-        data = self.combined_data.copy()
-        data.sort_values(by="seriesStartDate", inplace=True)
-        features = pd.DataFrame()
+    def row_features(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Computes the features that only depend on a row itself.
+        """
+        features = pd.DataFrame(index=data.index)
 
-        features['result'] = data['result'].apply(self.define_label) # train label
+        features['result'] = self.define_label(data) # train label
 
         features = pd.concat([features, self.player_features(data)], axis=1)
 
-        try:
-            features['surface'] =  data['uniqueTournament'].map(tournament_surfaces)
-        except KeyError as e:
-            logging.error(f"Unknown tournament surface: {e}")
-            raise ValueError(f"Unknown tournament surface: {e}")
-        try:
-            features['round_ordinal'] = data['round_description'].map(ordinal_mapping)
-        except KeyError as e:
-            logging.error(f"Unknown round description: {e}")
-            raise ValueError(f"Unknown round description: {e}")
+        features['surface'] = map_values(data['uniqueTournament'], tournament_surfaces)
+        features['round_ordinal'] = map_values(data['round_description'], ordinal_mapping, np.float64)
         
         features['month'] = pd.to_datetime(data['seriesStartDate']).dt.month
         features['month_sin'] = np.sin(2 * np.pi * features['month'] / 12)
         features['month_cos'] = np.cos(2 * np.pi * features['month'] / 12)
+        return features
+
+    def rating_features(self, matches: pd.DataFrame, save: bool = True) -> pd.DataFrame:
+        """
+        Returns the pre-match Elo ratings of every match, indexed like matches.
+        When the saved snapshot covers a prefix of matches, only the new matches are rated on
+        top of it and earlier ratings are reused; otherwise the full history is replayed.
+        """
+        params = dict(surfaces=tournament_surfaces, round_order=ordinal_mapping)
+        engine = EloRatingEngine.load(ELO_SNAPSHOT, **params)
+        ids = pd.array(matches['id'], dtype='Int64')
+        ratings = None
+
+        if engine is not None and not ids.isna().any() and pd.Index(ids).is_unique and self.store.exists(RATINGS_PATH):
+            ids = ids.to_numpy(dtype=np.int64)
+            new = ~np.isin(ids, engine.applied_ids)
+            rows = pd.Index(self.store.read(RATINGS_PATH, columns=['id'])['id']).get_indexer(ids[~new])
+            if (rows >= 0).all() and np.isin(engine.applied_ids, ids).all() and engine.can_extend(matches[new]):
+                previous = self.store.read(RATINGS_PATH, columns=RATING_COLUMNS).to_numpy()
+                values = np.empty((len(matches), len(RATING_COLUMNS)))
+                values[~new] = previous[rows]
+                if new.any():
+                    values[new] = engine.rate(matches[new]).to_numpy()
+                ratings = pd.DataFrame(values, index=matches.index, columns=RATING_COLUMNS)
+                logging.info(f"Rated {int(new.sum())} new matches on top of the Elo snapshot")
+
+        if ratings is None:
+            engine = EloRatingEngine(**params)
+            ratings = engine.rate(matches)
+
+        if save:
+            engine.save(ELO_SNAPSHOT)
+            self.store.write(ratings.assign(id=matches['id'].to_numpy()), RATINGS_PATH)
+        return ratings
+
+    def ranking_features(self, matches: pd.DataFrame, save: bool = True) -> pd.DataFrame:
+        """
+        Returns both players' latest ATP rank on or before the match date, indexed like matches.
+        Ranking names are resolved to player ids first, so players are matched by id_home
+        and id_away. Without rankings or a player table the frame has no columns.
+        """
+        rankings = self.rankings.load()
+        players = self.players or PlayerTable.load(self.store)
+        if rankings is None or rankings.empty or players is None:
+            logging.info("No rankings or player table, skipping ranking features")
+            return pd.DataFrame(index=matches.index)
+        mapping = self.resolver.update(rankings, players.players, save=save)
+        ranked = rankings_by_id(rankings, mapping)
+        ranks = pd.DataFrame(index=matches.index)
+        for side in ('home', 'away'):
+            ranks[f'rank_{side}'] = asof_ranks(ranked, pd.array(matches[f'id_{side}'], dtype='Int64'),
+                                               matches['seriesStartDate'], key='id')
+        logging.info(f"Ranked {int(ranks.notna().all(axis=1).sum())} of {len(ranks)} matches")
+        return ranks
+
+    def build_features(self, combined: Optional[Union[SymmetricGames, pd.DataFrame]] = None,
+                       save: bool = True, players: Optional[PlayerTable] = None) -> pd.DataFrame:
+        """
+        Builds the model features from the combiner's output.
+        combined is loaded from disk when not given; save writes features/data/features.
+        Features are computed on the stored matches and their mirror batch by batch, and
+        the rows are then stably ordered by seriesStartDate. A DataFrame is taken to hold
+        each match once. players is the combiner's player table, loaded from disk when
+        not given.
+        """
+        if players is not None:
+            self.players = players
+        if combined is not None:
+            self.combined_data = combined
+        elif self.combined_data is None:
+            self.load_inputs()
+        if isinstance(self.combined_data, pd.DataFrame):
+            self.combined_data = SymmetricGames(self.combined_data)
+
+        features = pd.concat([self.row_features(batch) for batch in self.combined_data.iter_batches(self.batch_size)])
+
+        # Ratings, history and ranks are computed once per match; the mirror gets them with the sides swapped
+        matches = self.combined_data.matches
+        per_match = pd.concat([self.rating_features(matches, save=save), self.history.features(matches),
+                               self.ranking_features(matches, save=save)], axis=1)
+        columns = list(per_match.columns)
+        mirrored = per_match.rename(columns=swap_columns(columns))[columns]
+        features[columns] = np.concatenate([per_match.to_numpy(), mirrored.to_numpy()])
+
+        features = features.take(self.combined_data.order_by('seriesStartDate'))
 
         features = pd.get_dummies(features, columns=['month', 'surface'])
 
-        features.to_csv('features/data/features.csv', index=False)
+        if save:
+            features = self.store.write(features, FEATURES_PATH)
         return features
-    
+
+    def build_features_in_chunks(self, chunk_size: int) -> int:
+        """
+        Builds the same features as build_features and writes them chunk by chunk, so the
+        doubled, one-hot encoded feature rows are never held at once. Only MATCH_COLUMNS
+        of the stored matches are loaded; ratings, history and ranks need every match in
+        time order and are computed on those, then each chunk of chunk_size output rows is
+        taken in seriesStartDate order, with the one-hot columns of the whole dataset.
+        Returns the number of feature rows.
+        """
+        columns = [c for c in MATCH_COLUMNS if c in self.store.columns(MATCHES_PATH)]
+        matches = self.store.read(MATCHES_PATH, columns=columns, schema=COMBINED_SCHEMA)
+        self.combined_data = SymmetricGames(matches)
+
+        per_match = pd.concat([self.rating_features(matches), self.history.features(matches),
+                               self.ranking_features(matches)], axis=1)
+        per_match_columns = list(per_match.columns)
+        swapped = swap_columns(per_match_columns)
+        mirrored = [per_match_columns.index(swapped.get(c, c)) for c in per_match_columns]
+        values = per_match.to_numpy()
+        del per_match
+
+        dummies = {
+            'month': np.sort(pd.to_datetime(matches['seriesStartDate']).dt.month.dropna().unique()),
+            'surface': np.sort(pd.Series(map_values(matches['uniqueTournament'], tournament_surfaces)).dropna().unique()),
+        }
+        order = self.combined_data.order_by('seriesStartDate')
+        with self.store.writer(FEATURES_PATH) as writer:
+            for start in range(0, len(order), chunk_size):
+                rows = order[start:start + chunk_size]
+                features = self.row_features(self.combined_data.take(rows))
+                chunk_values = values[rows % len(matches)]
+                mirror = rows >= len(matches)
+                chunk_values[mirror] = chunk_values[mirror][:, mirrored]
+                features[per_match_columns] = chunk_values
+                for column, categories in dummies.items():
+                    features[column] = pd.Categorical(features[column], categories=categories)
+                writer.write(pd.get_dummies(features, columns=list(dummies)))
+        logging.info(f"Built {writer.rows} feature rows in chunks of {chunk_size}")
+        return writer.rows
+
+
 if __name__ == "__main__":
     feature_builder = FeatureBuilder()
     features = feature_builder.build_features()
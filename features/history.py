@@ -0,0 +1,141 @@
+# features/history.py
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from features.elo import home_won
+from storage.schemas import map_values
+
+# Bits left for the time key in the combined (player or pair, time) sort keys
+_TIME_BITS = 32
+# Rounds take the low 4 bits of the time key, below the day
+_ROUND_BITS = 4
+# Day used for matches without a date, so they sort after everything else
+_NO_DATE = 1 << (_TIME_BITS - _ROUND_BITS - 1)
+# Days are counted from before the first professional matches, so time keys are never
+# negative; a negative key would spill into the player bits of the combined key
+_EPOCH = np.datetime64('1870-01-01', 'D')
+
+
+class MatchHistory:
+    """
+    As-of features from each player's and each pair's earlier matches: recent form, recent
+    workload and the head-to-head record.
+
+    Every player appearance and every pair meeting gets a combined sort key
+    (player or pair) << 32 | day << 4 | round ordinal, with days counted from 1870.
+    After sorting the keys once, the earlier matches of any appearance are a contiguous
+    range found by binary search, and wins in that range are a difference of cumulative
+    sums, so all features take O(n log n). Only matches with a smaller key count, so a
+    match never sees itself or anything played after it.
+
+    Args:
+        round_order: Round description -> ordinal, used to order matches on the same date.
+        form_matches: Number of most recent matches for the form_{N} win rate.
+        form_days: Days looked back for the form_{D}d win rate.
+        fatigue_days: Days looked back for the matches_{D}d count.
+    """
+    def __init__(self, round_order: Dict[str, int], form_matches: int = 10, form_days: int = 365,
+                 fatigue_days: int = 14):
+        self.round_order = round_order
+        self.form_matches = form_matches
+        self.form_days = form_days
+        self.fatigue_days = fatigue_days
+
+    @property
+    def columns(self):
+        sided = [f'form_{self.form_matches}', f'form_{self.form_days}d', f'matches_{self.fatigue_days}d', 'h2h_wins']
+        return [f'{name}_{side}' for name in sided for side in ('home', 'away')] + ['h2h_matches']
+
+    def time_keys(self, matches: pd.DataFrame) -> np.ndarray:
+        # Day resolution: nanosecond differences overflow int64 about 292 years after the epoch
+        dates = pd.to_datetime(matches['seriesStartDate']).to_numpy(dtype='datetime64[D]')
+        days = np.where(np.isnat(dates), _NO_DATE, np.maximum((dates - _EPOCH).astype(np.int64), 0))
+        rounds = np.nan_to_num(map_values(matches['round_description'], self.round_order, np.float64)).astype(np.int64)
+        return (days << _ROUND_BITS) | np.clip(rounds, 0, (1 << _ROUND_BITS) - 1)
+
+    @staticmethod
+    def _prior(keys: np.ndarray, groups: np.ndarray, values: Dict[str, np.ndarray]):
+        """
+        Sorts the combined keys. Returns the sort order, the sorted keys and, in sorted order,
+        the number of keys before each key, the position where its group starts, and
+        exclusive cumulative sums of values.
+        Binary searches are done with sorted needles, which is several times faster than
+        searching in input order, and results are permuted back by the caller.
+        """
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        before = np.searchsorted(sorted_keys, sorted_keys, side='left')
+        start = np.searchsorted(sorted_keys, groups[order] << _TIME_BITS, side='left')
+        cumulative = {name: np.concatenate([[0.0], np.cumsum(v[order])]) for name, v in values.items()}
+        return order, sorted_keys, before, start, cumulative
+
+    @staticmethod
+    def _unsort(order: np.ndarray, values: np.ndarray) -> np.ndarray:
+        unsorted = np.empty_like(values)
+        unsorted[order] = values
+        return unsorted
+
+    def features(self, matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the history features of every match, indexed like matches. Matches without
+        both player ids get NaN.
+        """
+        home_ids = pd.array(matches['home_id'], dtype='Int64')
+        away_ids = pd.array(matches['away_id'], dtype='Int64')
+        valid = ~(home_ids.isna() | away_ids.isna())
+        home_ids = home_ids[valid].to_numpy(dtype=np.int64)
+        away_ids = away_ids[valid].to_numpy(dtype=np.int64)
+        time = self.time_keys(matches)[valid]
+        outcome = home_won(matches['result'])[valid]
+        scored = ~np.isnan(outcome)
+        won = np.nan_to_num(outcome)
+        n = len(time)
+
+        # Player appearances: the home side of every match, then the away side
+        codes, players = pd.factorize(np.concatenate([home_ids, away_ids]))
+        codes = codes.astype(np.int64)
+        keys = (codes << _TIME_BITS) | np.concatenate([time, time])
+        appearance_won = np.concatenate([won, scored - won])
+        appearance_scored = np.concatenate([scored, scored]).astype(np.float64)
+        order, sorted_keys, before, start, cum = self._prior(keys, codes,
+                                                             {'won': appearance_won, 'scored': appearance_scored})
+
+        def win_rate(first: np.ndarray) -> np.ndarray:
+            wins = cum['won'][before] - cum['won'][first]
+            played = cum['scored'][before] - cum['scored'][first]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(played > 0, wins / played, np.nan)
+
+        def since(days: int) -> np.ndarray:
+            # Position of the first appearance at most `days` days before each appearance
+            group, day = sorted_keys >> _TIME_BITS, (sorted_keys & ((1 << _TIME_BITS) - 1)) >> _ROUND_BITS
+            return np.searchsorted(sorted_keys, (group << _TIME_BITS) | (np.maximum(day - days, 0) << _ROUND_BITS))
+
+        out = {
+            f'form_{self.form_matches}': win_rate(np.maximum(start, before - self.form_matches)),
+            f'form_{self.form_days}d': win_rate(since(self.form_days)),
+            f'matches_{self.fatigue_days}d': (before - since(self.fatigue_days)).astype(np.float64),
+        }
+        columns = {}
+        for name, values in out.items():
+            values = self._unsort(order, values)
+            columns[f'{name}_home'], columns[f'{name}_away'] = values[:n], values[n:]
+
+        # Pair meetings, keyed on the pair regardless of who was home
+        low, high = np.minimum(codes[:n], codes[n:]), np.maximum(codes[:n], codes[n:])
+        pairs = pd.factorize(low * len(players) + high)[0].astype(np.int64)
+        home_is_low = codes[:n] == low
+        low_won = np.where(home_is_low, won, scored - won)
+        order, _, before, start, cum = self._prior((pairs << _TIME_BITS) | time, pairs,
+                                                   {'won': low_won, 'scored': scored.astype(np.float64)})
+        meetings = self._unsort(order, cum['scored'][before] - cum['scored'][start])
+        low_wins = self._unsort(order, cum['won'][before] - cum['won'][start])
+        columns['h2h_wins_home'] = np.where(home_is_low, low_wins, meetings - low_wins)
+        columns['h2h_wins_away'] = meetings - columns['h2h_wins_home']
+        columns['h2h_matches'] = meetings
+
+        history = pd.DataFrame(np.nan, index=matches.index, columns=self.columns)
+        history.loc[valid, self.columns] = pd.DataFrame(columns)[self.columns].to_numpy()
+        return history
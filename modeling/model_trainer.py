@@ -1,34 +1,197 @@
 # modeling/model_trainer.py
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401, enables HalvingRandomSearchCV
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, log_loss, roc_auc_score
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit, HalvingRandomSearchCV
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+from scipy.stats import loguniform, randint, uniform
 
+import json
+import joblib
+import logging
+import os
+import time
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import GroupShuffleSplit
+from typing import Dict, List, Optional
+from storage.dataset_store import DatasetStore
+
+MODEL_PATH = 'modeling/data/model.joblib'
+METRICS_PATH = 'modeling/data/metrics.json'
+
+
+def search_space(random_state: int = 42) -> List[Dict]:
+    """
+    Candidate model families and their hyperparameter distributions for the search.
+    Trees handle missing features natively; the logistic baseline imputes and scales them.
+    """
+    return [
+        {
+            'prep': ['passthrough'],
+            'model': [RandomForestClassifier(n_jobs=1, random_state=random_state)],
+            'model__n_estimators': randint(100, 500),
+            'model__max_depth': [None, 8, 16, 32],
+            'model__min_samples_leaf': randint(1, 20),
+            'model__max_features': ['sqrt', 0.3, 0.6],
+        },
+        {
+            'prep': ['passthrough'],
+            'model': [HistGradientBoostingClassifier(random_state=random_state)],
+            'model__learning_rate': loguniform(0.01, 0.3),
+            'model__max_iter': randint(100, 600),
+            'model__max_leaf_nodes': randint(15, 63),
+            'model__min_samples_leaf': randint(10, 100),
+            'model__l2_regularization': loguniform(1e-4, 10),
+        },
+        {
+            'prep': [make_pipeline(SimpleImputer(strategy='median'), StandardScaler())],
+            'model': [LogisticRegression(max_iter=1000)],
+            'model__C': loguniform(1e-3, 1e2),
+        },
+    ]
+
 
 class ModelTrainer:
-    def __init__(self):
-        self.model = RandomForestClassifier()
-        self.features = pd.read_csv('features/data/features.csv') 
+    def __init__(self, store: Optional[DatasetStore] = None, search: bool = False, n_candidates: int = 60,
+                 n_splits: int = 5, n_jobs: int = -1, random_state: int = 42):
+        """
+        Args:
+            store: Storage the features are read from.
+            search: Whether train_model runs a hyperparameter search over several model
+                families instead of fitting a default random forest.
+            n_candidates: Configurations sampled for the first round of the search.
+            n_splits: Grouped CV folds per candidate.
+            n_jobs: Parallel fits during the search, -1 uses all cores.
+        """
+        self.model = RandomForestClassifier(n_jobs=n_jobs, random_state=random_state)
+        self.store = store or DatasetStore()
+        self.features = None
+        self.search = search
+        self.n_candidates = n_candidates
+        self.n_splits = n_splits
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.metrics: Dict = {}
+
+    def load_inputs(self) -> pd.DataFrame:
+        self.features = self.store.read('features/data/features')
+        return self.features
+
+    @staticmethod
+    def match_groups(features: pd.DataFrame) -> np.ndarray:
+        """
+        Group number per row for grouped splits: the pair of players regardless of side,
+        so a match and its mirrored row are never split between train and test.
+        """
+        home = pd.array(features['id_home'], dtype='Int64').to_numpy(dtype=np.float64, na_value=np.nan)
+        away = pd.array(features['id_away'], dtype='Int64').to_numpy(dtype=np.float64, na_value=np.nan)
+        pairs = pd.DataFrame({'low': np.fmin(home, away), 'high': np.fmax(home, away)})
+        return pairs.groupby(['low', 'high'], dropna=False, sort=False).ngroup().to_numpy()
+
+    def train_model(self, features: Optional[pd.DataFrame] = None, save: bool = False):
+        """
+        Trains the model on the feature builder's output, loaded from disk when not given.
+        With save, the model is written to MODEL_PATH and its test metrics to METRICS_PATH.
+        """
+        if features is not None:
+            self.features = features
+        elif self.features is None:
+            self.load_inputs()
 
-    def train_model(self):
         # Prepare features and label
         X = self.features.drop(columns=['result', 'id_home', 'id_away'])
         y = self.features['result']
+        groups = self.match_groups(self.features)
 
-        gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
-        train_idx, test_idx= next(gss.split(X, y, groups=self.features[['id_home', 'id_away']].apply(tuple, axis=1)))
+        gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=self.random_state)
+        train_idx, test_idx = next(gss.split(X, y, groups=groups))
 
         X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
         y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
 
-        self.model.fit(X_train, y_train)
+        self.metrics = {}
+        if self.search:
+            self.model = self.search_models(X_train, y_train, groups[train_idx])
+        else:
+            self.model.fit(X_train, y_train)
         y_pred = self.model.predict(X_test)
         print(classification_report(y_test, y_pred))
+        self.metrics['test'] = self.evaluate(X_test, y_test)
+        if save:
+            self.save()
         return self.model
-    
+
+    def search_models(self, X: pd.DataFrame, y: pd.Series, groups: np.ndarray):
+        """
+        Successive halving over random configurations of every model family: all candidates
+        are cross-validated on a small sample, and only the best third moves on to three
+        times as many rows, until the best candidates see all rows. Folds are grouped by
+        player pair and candidates are fitted in parallel. Returns the best model, refitted
+        on all of X.
+        """
+        pipeline = Pipeline([('prep', 'passthrough'), ('model', RandomForestClassifier())])
+        search = HalvingRandomSearchCV(
+            pipeline, search_space(self.random_state), n_candidates=self.n_candidates, factor=3,
+            resource='n_samples', min_resources='exhaust', cv=GroupKFold(n_splits=self.n_splits),
+            scoring='neg_log_loss', n_jobs=self.n_jobs, random_state=self.random_state, error_score=np.nan,
+        )
+        start = time.perf_counter()
+        search.fit(X, y, groups=groups)
+        elapsed = time.perf_counter() - start
+
+        results = pd.DataFrame(search.cv_results_)
+        # Fit and score times are per fold, so a candidate's wall time is their sum over the folds
+        candidates = pd.DataFrame({
+            'iteration': results['iter'],
+            'rows': results['n_resources'],
+            'model': results['param_model'].map(lambda model: type(model).__name__),
+            'log_loss': -results['mean_test_score'],
+            'seconds': (results['mean_fit_time'] + results['mean_score_time']) * self.n_splits,
+            'params': results['params'].map(
+                lambda params: {k: v for k, v in params.items() if k not in ('model', 'prep')}),
+        }).sort_values(['iteration', 'log_loss'])
+        best = search.best_estimator_.named_steps['model']
+        logging.info(f"Searched {len(candidates)} fits in {elapsed:.1f}s, best {type(best).__name__} "
+                     f"with log loss {-search.best_score_:.4f}: "
+                     f"{ {k: v for k, v in search.best_params_.items() if k not in ('model', 'prep')} }")
+        for model, times in candidates.groupby('model')['seconds']:
+            logging.info(f"  {model}: {len(times)} candidates, {times.mean():.2f}s each on average")
+
+        self.metrics['search'] = {
+            'seconds': elapsed,
+            'best_model': type(best).__name__,
+            'best_params': {k: v for k, v in search.best_params_.items() if k not in ('model', 'prep')},
+            'best_cv_log_loss': -search.best_score_,
+            'candidates': candidates.to_dict(orient='records'),
+        }
+        return search.best_estimator_
+
+    def evaluate(self, X: pd.DataFrame, y: pd.Series) -> Dict:
+        probabilities = self.model.predict_proba(X)
+        metrics = {'rows': len(y), 'accuracy': accuracy_score(y, self.model.predict(X))}
+        if len(self.model.classes_) == 2 and y.nunique() == 2:
+            metrics['log_loss'] = log_loss(y, probabilities, labels=self.model.classes_)
+            metrics['roc_auc'] = roc_auc_score(y == self.model.classes_[1], probabilities[:, 1])
+        return metrics
+
+    def save(self, model_path: str = MODEL_PATH, metrics_path: str = METRICS_PATH) -> None:
+        """
+        Writes the model with joblib and its metrics as JSON, each through a temporary file.
+        """
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        joblib.dump(self.model, model_path + '.tmp')
+        os.replace(model_path + '.tmp', model_path)
+        with open(metrics_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.metrics, f, indent=2, default=str)
+        os.replace(metrics_path + '.tmp', metrics_path)
+        logging.info(f"Model saved to {model_path}, metrics to {metrics_path}")
+
+
 if __name__ == "__main__":
-    trainer = ModelTrainer()
-    trained_model = trainer.train_model()
+    logging.basicConfig(level=logging.INFO)
+    trainer = ModelTrainer(search=True)
+    trained_model = trainer.train_model(save=True)
     print("Model trained successfully.")
-    # save the model if needed
-    # joblib.dump(trained_model, 'model.pkl')
@@ -0,0 +1,307 @@
+# orchestration/dag.py
+import fnmatch
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from orchestration.instrumentation import RunInstrumentation, dataset_rows
+
+
+def _hash_file(path: str, digest) -> None:
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    _hash_file(path, digest)
+    return digest.hexdigest()
+
+
+def input_fingerprint(spec: str) -> str:
+    """
+    Fingerprints one declared input.
+    Files are hashed by content. Directories and glob patterns, which can hold thousands of
+    fetched files, are fingerprinted by the name, size and mtime of every file they match;
+    the fetcher leaves unchanged files untouched, so their mtime is stable.
+    """
+    digest = hashlib.sha256(spec.encode('utf-8'))
+    if os.path.isfile(spec):
+        _hash_file(spec, digest)
+        return digest.hexdigest()
+
+    if os.path.isdir(spec):
+        paths = [os.path.join(root, f) for root, _, files in os.walk(spec) for f in files]
+    else:
+        paths = glob.glob(spec)
+    if not paths:
+        return 'missing'
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, os.path.dirname(spec) or '.')}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    A pipeline step with declared inputs and outputs.
+
+    Args:
+        name: Unique stage name.
+        run: Callable without arguments that produces the outputs.
+        inputs: Files, directories or glob patterns the stage reads. Inputs that are outputs
+            of another stage define the edges of the DAG.
+        outputs: Files the stage writes. They are cached under the stage's fingerprint.
+        sources: Source files whose content is part of the fingerprint, so a code change
+            reruns the stage.
+        version: Manual version, bump it to invalidate cached outputs.
+        config: JSON-serialisable parameters that are part of the fingerprint.
+        cacheable: False for stages that always have to run, such as fetching from the network.
+    """
+    def __init__(self, name: str, run: Callable[[], Any], inputs: Sequence[str] = (), outputs: Sequence[str] = (),
+                 sources: Sequence[str] = (), version: str = "1", config: Optional[Dict[str, Any]] = None,
+                 cacheable: bool = True):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.sources = list(sources)
+        self.version = version
+        self.config = config or {}
+        self.cacheable = cacheable
+
+
+class StageGraph:
+    """
+    Runs stages in dependency order and skips those whose fingerprint is unchanged.
+    A stage's fingerprint covers its version, config, source files and the content of its
+    inputs. Outputs are stored under the fingerprint in cache_dir, so switching back to an
+    earlier code or input state restores the matching outputs instead of recomputing them.
+    """
+    STATE_FILE = 'state.json'
+
+    def __init__(self, stages: List[Stage], cache_dir: str = '.pipeline_cache', keep: int = 3):
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names: {names}")
+        self.stages = {s.name: s for s in stages}
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.state_path = os.path.join(cache_dir, self.STATE_FILE)
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def dependencies(self, stage: Stage) -> List[str]:
+        produced_by = {out: s.name for s in self.stages.values() for out in s.outputs}
+        deps = []
+        for spec in stage.inputs:
+            for out, producer in produced_by.items():
+                matches = out == spec or out.startswith(spec.rstrip('/') + os.sep) or fnmatch.fnmatch(out, spec)
+                if matches and producer != stage.name and producer not in deps:
+                    deps.append(producer)
+        return deps
+
+    def order(self) -> List[Stage]:
+        """
+        Returns the stages in topological order, keeping declaration order between independent stages.
+        """
+        ordered: List[Stage] = []
+        visiting = set()
+
+        def visit(stage: Stage) -> None:
+            if stage in ordered:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Cycle in pipeline at stage {stage.name}")
+            visiting.add(stage.name)
+            for dep in self.dependencies(stage):
+                visit(self.stages[dep])
+            visiting.discard(stage.name)
+            ordered.append(stage)
+
+        for stage in self.stages.values():
+            visit(stage)
+        return ordered
+
+    def fingerprint(self, stage: Stage) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'name': stage.name, 'version': stage.version, 'config': stage.config},
+                                 sort_keys=True, default=str).encode('utf-8'))
+        for source in sorted(stage.sources):
+            digest.update(source.encode('utf-8'))
+            if os.path.exists(source):
+                _hash_file(source, digest)
+        for spec in stage.inputs:
+            digest.update(input_fingerprint(spec).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _object_dir(self, stage: Stage, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', stage.name, fingerprint)
+
+    def _outputs_match(self, stage: Stage, recorded: Dict[str, str]) -> bool:
+        return all(os.path.exists(out) and file_fingerprint(out) == recorded.get(out) for out in stage.outputs)
+
+    def _restore(self, stage: Stage, fingerprint: str) -> bool:
+        """
+        Copies cached outputs for fingerprint back into place. Returns False if they are not cached.
+        """
+        object_dir = self._object_dir(stage, fingerprint)
+        meta_path = os.path.join(object_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if self._outputs_match(stage, meta['outputs']):
+            return True
+        for i, out in enumerate(stage.outputs):
+            cached = os.path.join(object_dir, str(i))
+            if not os.path.exists(cached):
+                return False
+            os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+            shutil.copyfile(cached, out + '.tmp')
+            os.replace(out + '.tmp', out)
+        return True
+
+    def _store(self, stage: Stage, fingerprint: str) -> None:
+        object_dir = self._object_dir(stage, fingerprint)
+        os.makedirs(object_dir, exist_ok=True)
+        outputs = {}
+        for i, out in enumerate(stage.outputs):
+            if not os.path.exists(out):
+                logging.warning(f"Stage {stage.name} did not produce declared output {out}")
+                continue
+            cached = os.path.join(object_dir, str(i))
+            if os.path.exists(cached):
+                os.remove(cached)
+            try:
+                # Outputs are replaced atomically on write, so a hard link stays a valid snapshot
+                os.link(out, cached)
+            except OSError:
+                shutil.copyfile(out, cached)
+            outputs[out] = file_fingerprint(out)
+        with open(os.path.join(object_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'outputs': outputs}, f, indent=2)
+        self._prune(stage, keep_fingerprint=fingerprint)
+
+    def _prune(self, stage: Stage, keep_fingerprint: str) -> None:
+        stage_dir = os.path.join(self.cache_dir, 'objects', stage.name)
+        entries = sorted(
+            (os.path.join(stage_dir, d) for d in os.listdir(stage_dir) if d != keep_fingerprint),
+            key=os.path.getmtime, reverse=True,
+        )
+        for old in entries[max(0, self.keep - 1):]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _save_state(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _decide(self, stage: Stage, force: Iterable[str], dirty: set) -> Tuple[str, str, Optional[str]]:
+        """
+        Returns (action, reason, fingerprint) for a stage: action is "run", "skip" or "restore".
+        Stages downstream of one that will run cannot be fingerprinted before it has run.
+        """
+        if not stage.cacheable:
+            return 'run', 'not cacheable', None
+        if stage.name in force or 'all' in force:
+            return 'run', 'forced', None
+        upstream = [dep for dep in self.dependencies(stage) if dep in dirty]
+        if upstream:
+            return 'run', f"upstream {', '.join(upstream)} will run", None
+        fingerprint = self.fingerprint(stage)
+        recorded = self.state.get(stage.name, {})
+        if recorded.get('fingerprint') == fingerprint and self._outputs_match(stage, recorded.get('outputs', {})):
+            return 'skip', 'up to date', fingerprint
+        if os.path.exists(os.path.join(self._object_dir(stage, fingerprint), 'meta.json')):
+            return 'restore', 'outputs cached for this fingerprint', fingerprint
+        return 'run', 'inputs, code or config changed', fingerprint
+
+    def plan(self, force: Iterable[str] = ()) -> List[Tuple[str, str, str]]:
+        """
+        Lists what run() would do without running anything: (stage, action, reason).
+        Stages that are not cacheable, such as fetching, are "unknown": whether they change
+        their outputs only shows once they have run. Stages downstream of them are planned
+        on the inputs currently on disk, with a note that the unknown stages may change them.
+        """
+        force = set(force)
+        dirty: set = set()
+        uncertain: Dict[str, List[str]] = {}
+        plan = []
+        for stage in self.order():
+            if not stage.cacheable:
+                uncertain[stage.name] = [stage.name]
+                plan.append((stage.name, 'unknown', 'not cacheable, its outputs are only known once it has run'))
+                continue
+            action, reason, _ = self._decide(stage, force, dirty)
+            if action != 'skip':
+                dirty.add(stage.name)
+            pending = []
+            for dep in self.dependencies(stage):
+                pending += [name for name in uncertain.get(dep, []) if name not in pending]
+            if pending:
+                uncertain[stage.name] = pending
+                reason += f"; as of the current inputs, {', '.join(pending)} may change them"
+            plan.append((stage.name, action, reason))
+        return plan
+
+    def run(self, force: Iterable[str] = (), dry_run: bool = False,
+            instrumentation: Optional[RunInstrumentation] = None) -> Dict[str, str]:
+        """
+        Runs the stages that are out of date. With dry_run, only logs and returns the plan
+        (see plan() for the "unknown" action).
+        With instrumentation, every stage that runs is measured, rows in and out counted from
+        its Arrow inputs and outputs, and skipped stages are recorded with their reason.
+        Returns the action taken per stage.
+        """
+        force = set(force)
+        unknown = force - set(self.stages) - {'all'}
+        if unknown:
+            raise ValueError(f"Unknown stages to force: {sorted(unknown)}")
+
+        if dry_run:
+            plan = self.plan(force)
+            for name, action, reason in plan:
+                logging.info(f"[dry-run] {name}: {action} ({reason})")
+            return {name: action for name, action, _ in plan}
+
+        actions = {}
+        for stage in self.order():
+            # Upstream stages have run by now, so every stage is fingerprinted on its real inputs
+            action, reason, fingerprint = self._decide(stage, force, dirty=set())
+            if action == 'restore' and not self._restore(stage, fingerprint):
+                action, reason = 'run', 'cached outputs incomplete'
+
+            if action == 'run':
+                logging.info(f"Running stage {stage.name} ({reason})")
+                if instrumentation is None:
+                    stage.run()
+                else:
+                    with instrumentation.stage(stage.name, reason) as record:
+                        record.rows_in = dataset_rows(stage.inputs)
+                        stage.run()
+                        record.rows_out = dataset_rows(stage.outputs)
+                if stage.cacheable:
+                    fingerprint = self.fingerprint(stage)
+                    self._store(stage, fingerprint)
+            else:
+                logging.info(f"Skipping stage {stage.name} ({reason})")
+                if instrumentation is not None:
+                    instrumentation.skipped(stage.name, action, reason)
+
+            if stage.cacheable and fingerprint is not None:
+                with open(os.path.join(self._object_dir(stage, fingerprint), 'meta.json'), 'r', encoding='utf-8') as f:
+                    outputs = json.load(f)['outputs']
+                self.state[stage.name] = {'fingerprint': fingerprint, 'outputs': outputs}
+                self._save_state()
+            actions[stage.name] = action
+        return actions
@@ -0,0 +1,315 @@
+# orchestration/instrumentation.py
+import bisect
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import platform
+import pstats
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import psutil
+
+# Upper bounds of the latency histogram buckets in seconds; the last bucket is open
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """
+    Returns the number of rows of a stage result: a frame or array, or a dict or tuple of
+    them (summed). None for results without rows, such as a fitted model.
+    """
+    if hasattr(result, 'shape') and hasattr(result, '__len__'):
+        return len(result)
+    if isinstance(result, (dict, tuple)):
+        counts = [count_rows(value) for value in (result.values() if isinstance(result, dict) else result)]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+def dataset_rows(paths: Iterable[str]) -> Optional[int]:
+    """
+    Returns the total rows of the Arrow datasets among paths, read from their metadata
+    without loading them. None if there are none.
+    """
+    import pyarrow as pa
+
+    total = None
+    for path in paths:
+        if path.endswith('.arrow') and os.path.exists(path):
+            with pa.memory_map(path) as source:
+                reader = pa.ipc.open_file(source)
+                rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+            total = (total or 0) + rows
+    return total
+
+
+class PeakMemory:
+    """
+    Samples the RSS of this process and its child processes (worker pools) on a background
+    thread and keeps the peak, so allocations that are freed again within the block are
+    still counted. Walking the process tree is the expensive part, so the child list is
+    cached and only refreshed every children_every samples.
+    """
+    def __init__(self, interval: float = 0.05, children_every: int = 10):
+        self.interval = interval
+        self.children_every = children_every
+        self.process = psutil.Process()
+        self._children: List[psutil.Process] = []
+        self.start = 0
+        self.peak = 0
+
+    def rss(self, refresh_children: bool = True) -> int:
+        if refresh_children:
+            try:
+                self._children = self.process.children(recursive=True)
+            except psutil.Error:
+                pass
+        total = self.process.memory_info().rss
+        for child in self._children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _sample(self) -> None:
+        samples = 0
+        while not self._stop.wait(self.interval):
+            samples += 1
+            self.peak = max(self.peak, self.rss(refresh_children=samples % self.children_every == 0))
+
+    def __enter__(self) -> 'PeakMemory':
+        self.start = self.rss()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='peak-memory', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+
+    @property
+    def peak_mb(self) -> float:
+        """
+        Peak above the RSS at the start of the block, in MB.
+        """
+        return (self.peak - self.start) / 1e6
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """
+    Linearly interpolated percentile, as numpy.percentile computes it by default.
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe latency recorder with fixed buckets per label, e.g. per endpoint kind.
+    Samples are kept to report exact percentiles; a crawl makes thousands of requests at
+    most, so this stays small.
+    """
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(label, []).append(seconds)
+
+    @contextlib.contextmanager
+    def time(self, label: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(label, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            samples = {label: list(values) for label, values in self._samples.items()}
+        summary = {}
+        for label, values in sorted(samples.items()):
+            counts = [0] * (len(self.buckets) + 1)
+            for value in values:
+                counts[bisect.bisect_left(self.buckets, value)] += 1
+            p50, p90, p99 = (_percentile(values, q) for q in (50, 90, 99))
+            summary[label] = {
+                'count': len(values), 'total_seconds': round(sum(values), 4),
+                'mean_ms': round(1000 * sum(values) / len(values), 2), 'p50_ms': round(1000 * p50, 2),
+                'p90_ms': round(1000 * p90, 2), 'p99_ms': round(1000 * p99, 2),
+                'max_ms': round(1000 * max(values), 2),
+                'buckets': {f"le_{bound:g}s": count for bound, count in zip(self.buckets, counts)}
+                           | {f"gt_{self.buckets[-1]:g}s": counts[-1]},
+            }
+        return summary
+
+
+class StageRecord:
+    """
+    Measurements of one stage. Set rows_in and rows_out inside the stage block; rows_out
+    defaults to the rows of the result passed to finish().
+    """
+    def __init__(self, name: str, action: str = 'run', reason: Optional[str] = None):
+        self.name = name
+        self.action = action
+        self.reason = reason
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.peak_rss_increase_mb = 0.0
+        self.profile: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def finish(self, result: Any) -> Any:
+        if self.rows_out is None:
+            self.rows_out = count_rows(result)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.action != 'run':
+            return {'name': self.name, 'action': self.action, 'reason': self.reason}
+        record = {
+            'name': self.name, 'action': self.action, 'reason': self.reason,
+            'wall_seconds': round(self.wall_seconds, 4), 'cpu_seconds': round(self.cpu_seconds, 4),
+            'peak_rss_mb': round(self.peak_rss_mb, 1), 'peak_rss_increase_mb': round(self.peak_rss_increase_mb, 1),
+            'rows_in': self.rows_in, 'rows_out': self.rows_out,
+        }
+        if self.profile is not None:
+            record['profile'] = self.profile
+        if self.error is not None:
+            record['error'] = self.error
+        return record
+
+
+def _cpu_seconds(process: psutil.Process) -> float:
+    """
+    CPU time of this process and of its finished child processes, such as process pools.
+    """
+    times = process.cpu_times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class RunInstrumentation:
+    """
+    Collects per-stage wall time, CPU time, peak RSS and row counts for one pipeline run,
+    plus latency histograms such as the fetcher's per-request timings, and writes them as
+    one JSON run report.
+
+    Args:
+        profile: Stage names to run under cProfile, or "all". The stats are written next to
+            the report as <report>.<stage>.prof and the top functions are in the report.
+        profile_top: Number of functions by cumulative time listed in the report per profile.
+    """
+    def __init__(self, profile: Iterable[str] = (), profile_top: int = 15):
+        self.profile = set(profile)
+        self.profile_top = profile_top
+        self.stages: List[StageRecord] = []
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._process = psutil.Process()
+        self._profiles: Dict[str, cProfile.Profile] = {}
+
+    def histogram(self, name: str, histogram: Optional[LatencyHistogram] = None) -> LatencyHistogram:
+        """
+        Returns the histogram reported under name, registering histogram if given.
+        """
+        if histogram is not None:
+            self.histograms[name] = histogram
+        return self.histograms.setdefault(name, LatencyHistogram())
+
+    def skipped(self, name: str, action: str, reason: Optional[str] = None) -> StageRecord:
+        """
+        Records a stage that did not run, e.g. one skipped or restored from the cache.
+        """
+        record = StageRecord(name, action, reason)
+        self.stages.append(record)
+        return record
+
+    @contextlib.contextmanager
+    def stage(self, name: str, reason: Optional[str] = None) -> Iterator[StageRecord]:
+        """
+        Measures the block as stage name and yields its StageRecord.
+        """
+        record = StageRecord(name, 'run', reason)
+        profiler = cProfile.Profile() if name in self.profile or 'all' in self.profile else None
+        cpu_start = _cpu_seconds(self._process)
+        start = time.perf_counter()
+        try:
+            with PeakMemory() as memory:
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    yield record
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - start
+            record.cpu_seconds = _cpu_seconds(self._process) - cpu_start
+            record.peak_rss_mb = memory.peak / 1e6
+            record.peak_rss_increase_mb = memory.peak_mb
+            if profiler is not None:
+                self._profiles[name] = profiler
+                record.profile = self._top_functions(profiler)
+            self.stages.append(record)
+            logging.info(f"Stage {name}: {record.wall_seconds:.2f}s wall, {record.cpu_seconds:.2f}s CPU, "
+                         f"peak +{record.peak_rss_increase_mb:.0f} MB, rows {record.rows_in} -> {record.rows_out}")
+
+    def _top_functions(self, profiler: cProfile.Profile) -> Dict[str, Any]:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(filename)}:{line}({function})", 'calls': calls,
+                         'total_seconds': round(total, 4), 'cumulative_seconds': round(cumulative, 4)})
+        rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+        return {'top': rows[:self.profile_top]}
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'started': self.started.isoformat(),
+            'finished': datetime.now(timezone.utc).isoformat(),
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'host': {'python': platform.python_version(), 'platform': platform.platform(),
+                     'cpus': os.cpu_count(), 'memory_mb': round(psutil.virtual_memory().total / 1e6)},
+            'stages': [record.to_dict() for record in self.stages],
+            'latency': {name: histogram.summary() for name, histogram in self.histograms.items()},
+        }
+
+    def write(self, path: str) -> Dict[str, Any]:
+        """
+        Writes the run report, and the stats of profiled stages next to it. Returns the report.
+        """
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        for name, profiler in self._profiles.items():
+            profile_path = f"{os.path.splitext(path)[0]}.{name}.prof"
+            profiler.dump_stats(profile_path)
+            next(r for r in report['stages'] if r['name'] == name)['profile']['path'] = profile_path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        logging.info(f"Run report written to {path}")
+        return report
@@ -1,32 +1,255 @@
 # pipeline.py
-from datafetcher.datafetcher import TennisDataFetcher
-from dataprocessor.dataprocessor import TennisDataProcessor
-from datacombiner.datacombiner import TennisDataCombiner
-from features.feature_builder import FeatureBuilder
-from modeling.model_trainer import ModelTrainer
-# from prediction.model_predictor import ModelPredictor
+import inspect
+import logging
+import os
+from datetime import datetime, timezone
+from functools import cached_property
+
+from storage.dataset_store import DatasetStore
+from orchestration.dag import Stage, StageGraph
+from orchestration.instrumentation import RunInstrumentation
+
+# Stages whose output can be checkpointed to disk
+CHECKPOINT_STAGES = ("process", "combine", "features")
+REPORT_DIR = os.path.join('.pipeline_cache', 'reports')
 
 class Pipeline:
-    def __init__(self, max_tournaments=1):
-        self.data_fetcher = TennisDataFetcher()
-        self.data_preprocessor = TennisDataProcessor()
-        self.data_combiner = TennisDataCombiner()
-        self.feature_builder = FeatureBuilder()
-        self.model_trainer = ModelTrainer()
-        # self.model_predictor = ModelPredictor()
+    """
+    The stages from fetching to prediction. Each stage's component is imported and created
+    on first use, so running only some stages never loads Selenium, sklearn or a browser
+    for the others.
+    """
+    def __init__(self, max_tournaments=1, checkpoints=(), store=None, search=False, profile=(), report_path=None,
+                 chunk_size=None):
+        """
+        Args:
+            max_tournaments: Number of tournaments to fetch.
+            checkpoints: Stages from CHECKPOINT_STAGES whose output is also written to disk.
+                Stages always hand their results to the next stage in memory.
+            store: DatasetStore used for checkpoints.
+            search: Whether training searches over model families and hyperparameters.
+            profile: Stage names to run under cProfile, or "all".
+            report_path: Where each run writes its JSON report of per-stage timings, memory,
+                row counts and fetch latencies. Defaults to a timestamped file in REPORT_DIR.
+            chunk_size: Stream process, combine and features in chunks of this many rows
+                through the store instead of holding each stage's full output, so memory
+                does not grow with the length of the history. Every stage's output is then
+                written to disk.
+        """
+        unknown = set(checkpoints) - set(CHECKPOINT_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown checkpoint stages: {sorted(unknown)}")
+        self.store = store or DatasetStore()
+        self.search = search
+        self.model_predictor = None
         self.max_tournaments = max_tournaments
+        self.checkpoints = set(checkpoints)
+        self.profile = set(profile)
+        self.report_path = report_path
+        self.chunk_size = chunk_size
+        self.instrumentation = None
+
+    @cached_property
+    def data_fetcher(self):
+        from datafetcher.datafetcher import TennisDataFetcher
+        return TennisDataFetcher()
+
+    @cached_property
+    def data_preprocessor(self):
+        from dataprocessor.dataprocessor import TennisDataProcessor
+        return TennisDataProcessor(store=self.store)
+
+    @cached_property
+    def data_combiner(self):
+        from datacombiner.datacombiner import TennisDataCombiner
+        return TennisDataCombiner(store=self.store)
+
+    @cached_property
+    def feature_builder(self):
+        from features.feature_builder import FeatureBuilder
+        return FeatureBuilder(store=self.store)
+
+    @cached_property
+    def model_trainer(self):
+        from modeling.model_trainer import ModelTrainer
+        return ModelTrainer(store=self.store, search=self.search)
+
+    @cached_property
+    def profile_builder(self):
+        from prediction.profiles import ProfileBuilder
+        return ProfileBuilder(store=self.store)
+
+    def _instrument(self, fetch=True):
+        self.instrumentation = RunInstrumentation(profile=self.profile)
+        if fetch:
+            self.instrumentation.histogram('fetch', self.data_fetcher.latency)
+        return self.instrumentation
+
+    def _write_report(self):
+        path = self.report_path or os.path.join(
+            REPORT_DIR, f"run_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json")
+        return self.instrumentation.write(path)
 
     def run(self):
-        self.data_fetcher.get_all_data(max_tournaments=self.max_tournaments)
-        self.data_fetcher.close()
-        self.data_preprocessor.process_all_data()
-        self.data_combiner.combine_data()
-        self.feature_builder.build_features()
-        self.model_trainer.train_model()
-        # prediction = self.model_predictor.make_prediction(trained_model)
-        return None # prediction
+        if self.chunk_size:
+            return self.run_in_chunks()
+        instrumentation = self._instrument()
+        try:
+            with instrumentation.stage('fetch') as record:
+                fetched = self.data_fetcher.get_all_data(max_tournaments=self.max_tournaments)
+                self.data_fetcher.close()
+                record.rows_out = len(fetched["cuptrees"])
+            with instrumentation.stage('process') as record:
+                processed = self.data_preprocessor.process_all_data(save="process" in self.checkpoints)
+                record.rows_out = len(processed["games"])
+            with instrumentation.stage('combine') as record:
+                record.rows_in = len(processed["games"])
+                combined = self.data_combiner.combine_data(
+                    participants=processed["participants"],
+                    games=processed["games"],
+                    save="combine" in self.checkpoints,
+                )
+                record.rows_out = len(combined)
+            with instrumentation.stage('features') as record:
+                record.rows_in = len(combined)
+                features = self.feature_builder.build_features(combined, save="features" in self.checkpoints,
+                                                               players=self.data_combiner.players)
+                record.rows_out = len(features)
+            with instrumentation.stage('train') as record:
+                record.rows_in = len(features)
+                self.model_trainer.train_model(features, save=True)
+            with instrumentation.stage('profiles') as record:
+                record.rows_in = len(combined.matches)
+                profiles, _ = self.profile_builder.build(combined.matches, players=self.data_combiner.players)
+                record.rows_out = len(profiles)
+            from prediction.model_predictor import ModelPredictor
+            self.model_predictor = ModelPredictor(store=self.store)
+        finally:
+            self._write_report()
+        return self.model_predictor
+
+    def run_in_chunks(self):
+        """
+        Like run, but cuptree files flow through processing and combining chunk by chunk
+        into the store, and features are built from the store in chunks.
+        """
+        instrumentation = self._instrument()
+        try:
+            with instrumentation.stage('fetch') as record:
+                fetched = self.data_fetcher.get_all_data(max_tournaments=self.max_tournaments)
+                self.data_fetcher.close()
+                record.rows_out = len(fetched["cuptrees"])
+            # Processing and combining are interleaved, so they are measured as one stage
+            with instrumentation.stage('process+combine') as record:
+                chunks = self.data_preprocessor.iter_processed(self.chunk_size)
+                record.rows_out = sum(len(matches) for matches in self.data_combiner.iter_combined(chunks))
+            with instrumentation.stage('features') as record:
+                record.rows_out = self.feature_builder.build_features_in_chunks(self.chunk_size)
+            with instrumentation.stage('train') as record:
+                self.model_trainer.train_model(save=True)
+                record.rows_in = len(self.model_trainer.features)
+            with instrumentation.stage('profiles') as record:
+                profiles, _ = self.profile_builder.build(players=self.data_combiner.players)
+                record.rows_out = len(profiles)
+            from prediction.model_predictor import ModelPredictor
+            self.model_predictor = ModelPredictor(store=self.store)
+        finally:
+            self._write_report()
+        return self.model_predictor
+
+    def build_graph(self, fetch=True, cache_dir='.pipeline_cache'):
+        """
+        Describes the pipeline as a DAG of stages that exchange data through the store.
+        Every stage is fingerprinted on its inputs, its source code and its config.
+        Fetching depends on the remote API and is never cached; leave it out with fetch=False
+        to rebuild from the cuptrees already on disk.
+        """
+        from datacombiner.name_resolver import NameResolver
+        from datacombiner.player_table import PlayerTable
+        from datafetcher.ranking_store import RANKINGS_DIR, RankingStore
+        from features.elo import EloRatingEngine
+        from features.feature_builder import ELO_SNAPSHOT, RATINGS_PATH
+        from modeling.model_trainer import METRICS_PATH, MODEL_PATH
+        from prediction.profiles import HEAD_TO_HEAD_PATH, PROFILES_PATH
+
+        def source(obj):
+            return inspect.getsourcefile(type(obj))
+
+        def run_fetch():
+            self.data_fetcher.get_all_data(max_tournaments=self.max_tournaments)
+            self.data_fetcher.close()
+
+        schemas = inspect.getsourcefile(DatasetStore).replace('dataset_store.py', 'schemas.py')
+        cuptrees = 'datafetcher/data/cuptrees_*.json'
+        games, participants = 'dataprocessor/data/games', 'dataprocessor/data/participants'
+        matches, features = 'datacombiner/data/matches', 'features/data/features'
+        ext = self.store.EXTENSION
+
+        if self.chunk_size:
+            run_process = lambda: self.data_preprocessor.process_in_chunks(self.chunk_size)
+            run_combine = lambda: self.data_combiner.combine_in_chunks(self.chunk_size)
+            run_features = lambda: self.feature_builder.build_features_in_chunks(self.chunk_size)
+        else:
+            run_process = lambda: self.data_preprocessor.process_all_data(save=True)
+            run_combine = lambda: self.data_combiner.combine_data(save=True)
+            run_features = lambda: self.feature_builder.build_features(save=True)
+
+        stages = [
+            Stage('process', run_process,
+                  inputs=[cuptrees], outputs=[participants + ext, games + ext],
+                  sources=[source(self.data_preprocessor), source(self.data_preprocessor.extractor), schemas]),
+            # Combine extends the player table of the previous run, so it is an input as well
+            Stage('combine', run_combine,
+                  inputs=[participants + ext, games + ext, PlayerTable.PATH + ext],
+                  outputs=[matches + ext, PlayerTable.PATH + ext],
+                  sources=[source(self.data_combiner), schemas]),
+            Stage('rankings', lambda: self.feature_builder.rankings.consolidate(),
+                  inputs=[os.path.join(RANKINGS_DIR, 'data_atp_rankings_*.csv')], outputs=[RankingStore.PATH + ext],
+                  sources=[inspect.getsourcefile(RankingStore)]),
+            Stage('features', run_features,
+                  inputs=[matches + ext, PlayerTable.PATH + ext, RankingStore.PATH + ext],
+                  outputs=[features + ext, RATINGS_PATH + ext, ELO_SNAPSHOT,
+                           NameResolver.MAPPING_PATH + ext, NameResolver.REPORT_PATH],
+                  sources=[source(self.feature_builder), inspect.getsourcefile(EloRatingEngine),
+                           source(self.feature_builder.history), source(self.feature_builder.resolver)]),
+            Stage('train', lambda: self.model_trainer.train_model(save=True),
+                  inputs=[features + ext], outputs=[MODEL_PATH, METRICS_PATH], sources=[source(self.model_trainer)],
+                  config={'search': self.model_trainer.search, 'n_candidates': self.model_trainer.n_candidates,
+                          'n_splits': self.model_trainer.n_splits}),
+            Stage('profiles', lambda: self.profile_builder.build(),
+                  inputs=[matches + ext, PlayerTable.PATH + ext, ELO_SNAPSHOT, RankingStore.PATH + ext,
+                          NameResolver.MAPPING_PATH + ext],
+                  outputs=[PROFILES_PATH + ext, HEAD_TO_HEAD_PATH + ext], sources=[source(self.profile_builder)]),
+        ]
+        if fetch:
+            stages.insert(0, Stage('fetch', run_fetch, outputs=[cuptrees],
+                                   config={'max_tournaments': self.max_tournaments}, cacheable=False))
+        return StageGraph(stages, cache_dir=cache_dir)
+
+    def run_cached(self, force=(), dry_run=False, fetch=True):
+        """
+        Runs only the stages whose inputs, code or config changed since their last run.
+
+        Args:
+            force: Stage names to rerun regardless of their fingerprint, or "all".
+            dry_run: Only log and return what would run.
+            fetch: Whether to fetch new data first.
+        Returns:
+            The action per stage: "run", "skip" or "restore", and "unknown" for fetch in a dry run.
+        """
+        graph = self.build_graph(fetch=fetch)
+        if dry_run:
+            return graph.run(force=force, dry_run=True)
+        instrumentation = self._instrument(fetch=fetch)
+        try:
+            return graph.run(force=force, instrumentation=instrumentation)
+        finally:
+            self._write_report()
 
 if __name__ == "__main__":
-    pipeline = Pipeline(max_tournaments=10)
-    result = pipeline.run()
-    print(result)
\ No newline at end of file
+    # Same options as `python cli.py run`, kept in one place
+    import sys
+
+    import cli
+
+    cli.main(['run', *sys.argv[1:]])
@@ -0,0 +1,63 @@
+# prediction/compiled_forest.py
+from typing import Optional
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+
+class CompiledForest:
+    """
+    The trees of a fitted random forest flattened into shared node arrays, so a few rows
+    are predicted by walking all trees at once, one level per step, instead of calling
+    every tree from Python. For single matches this is an order of magnitude faster than
+    the forest's own predict_proba and gives the same probabilities: rows are compared as
+    float32 like sklearn does and missing values follow each node's learned direction.
+    """
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.roots = offsets
+        self.classes_ = forest.classes_
+        self.depth = max(tree.max_depth for tree in trees)
+
+        def shifted(children, offset):
+            return np.where(children >= 0, children + offset, -1)
+
+        self.left = np.concatenate([shifted(t.children_left, o) for t, o in zip(trees, offsets)])
+        self.right = np.concatenate([shifted(t.children_right, o) for t, o in zip(trees, offsets)])
+        self.feature = np.concatenate([np.maximum(t.feature, 0) for t in trees])
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        self.missing_left = np.concatenate([t.missing_go_to_left.astype(bool) for t in trees])
+        values = np.concatenate([t.value[:, 0, :] for t in trees])
+        self.value = values / values.sum(axis=1, keepdims=True)
+        self.is_leaf = self.left < 0
+        # Leaves point to themselves, so finished trees stay put while deeper ones go on
+        nodes = np.arange(len(self.left))
+        self.left = np.where(self.is_leaf, nodes, self.left)
+        self.right = np.where(self.is_leaf, nodes, self.right)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+
+def compile_model(model) -> Optional[CompiledForest]:
+    """
+    Returns a CompiledForest for a random or extra trees classifier, alone or at the end
+    of a pipeline without preprocessing, and None for any other model.
+    """
+    steps = model.steps if isinstance(model, Pipeline) else [('model', model)]
+    final = steps[-1][1]
+    if any(step not in (None, 'passthrough') for _, step in steps[:-1]):
+        return None
+    if not isinstance(final, (RandomForestClassifier, ExtraTreesClassifier)) or final.n_outputs_ != 1:
+        return None
+    return CompiledForest(final)
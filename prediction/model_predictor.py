@@ -0,0 +1,285 @@
+# prediction/model_predictor.py
+import argparse
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features.feature_builder import ordinal_mapping, tournament_surfaces
+from modeling.model_trainer import MODEL_PATH
+from prediction.compiled_forest import compile_model
+from prediction.profiles import HEAD_TO_HEAD_PATH, PROFILES_PATH, UNKNOWN_PLAYER
+from storage.dataset_store import DatasetStore
+
+SIDES = ('home', 'away')
+# Above this many rows the forest's own predict_proba is faster than the compiled one
+COMPILED_BATCH_LIMIT = 64
+
+
+class MicroBatcher:
+    """
+    Collects feature rows submitted from many threads and predicts them together on one
+    worker thread. A batch holds whatever is queued when the worker becomes free, up to
+    max_batch rows; with max_wait > 0 the worker also waits that long for more rows. An
+    idle service therefore predicts a single request straight away, and a busy one
+    amortizes the model's per-call overhead over many requests.
+    """
+    def __init__(self, predict, max_batch: int = 256, max_wait: float = 0.0):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, rows: np.ndarray) -> np.ndarray:
+        request = {'rows': rows, 'done': threading.Event(), 'result': None, 'error': None}
+        self._queue.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['result']
+
+    def _next_batch(self) -> List[Dict]:
+        batch = [self._queue.get()]
+        size = len(batch[0]['rows'])
+        while size < self.max_batch:
+            try:
+                request = self._queue.get(timeout=self.max_wait) if self.max_wait > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request['rows'])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.predict(np.concatenate([request['rows'] for request in batch]))
+                offset = 0
+                for request in batch:
+                    request['result'] = results[offset:offset + len(request['rows'])]
+                    offset += len(request['rows'])
+            except Exception as e:
+                logging.error(f"Prediction batch of {len(batch)} requests failed: {e}")
+                for request in batch:
+                    request['error'] = e
+            for request in batch:
+                request['done'].set()
+
+
+class ModelPredictor:
+    """
+    Predicts the probability that the home player wins a match.
+
+    The persisted model, the player profiles and the head-to-head records are loaded once
+    at startup into numpy arrays and dictionaries. A prediction looks both players up,
+    writes their values into the model's feature columns and calls the model; nothing is
+    read from disk per call. Unknown players get the profile of a new player. Small
+    batches for random forests are evaluated through a CompiledForest, which is much faster
+    for few rows.
+
+    Matches are dicts with home_id, away_id and optionally date (default today),
+    tournament (uniqueTournament name, for the surface) and round (e.g. "QF").
+    """
+    def __init__(self, store: Optional[DatasetStore] = None, model_path: str = MODEL_PATH,
+                 max_batch: int = 256, max_wait: float = 0.0):
+        self.store = store or DatasetStore()
+        self.model = joblib.load(model_path)
+        self._single_threaded(self.model)
+        self.columns = list(getattr(self.model, 'feature_names_in_', []))
+        if not self.columns:
+            raise ValueError(f"Model {model_path} was not fitted on named features")
+        self.home_class = list(self.model.classes_).index('home')
+        self.compiled = compile_model(self.model)
+
+        profiles = self.store.read(PROFILES_PATH)
+        self._rows = {player: row for row, player in enumerate(profiles['id'].tolist())}
+        self._unknown = self._rows.pop(UNKNOWN_PLAYER)
+        self.birthdays = profiles['birthdate'].to_numpy(dtype='datetime64[D]')
+        self.profile_columns = [c for c in profiles.columns if c not in ('id', 'birthdate')]
+        self.profiles = profiles[self.profile_columns].to_numpy(dtype=np.float64)
+
+        head_to_head = self.store.read(HEAD_TO_HEAD_PATH)
+        self.head_to_head = {(low, high): (wins, played) for low, high, wins, played in zip(
+            head_to_head['low'].tolist(), head_to_head['high'].tolist(),
+            head_to_head['low_wins'].tolist(), head_to_head['matches'].tolist())}
+
+        self.surfaces = sorted(set(tournament_surfaces.values()))
+        self._plan_columns()
+        self.batcher = MicroBatcher(self._predict_rows, max_batch=max_batch, max_wait=max_wait)
+        logging.info(f"Predictor ready: {len(self._rows)} players, {len(self.head_to_head)} pairs, "
+                     f"{len(self.columns)} features")
+
+    @staticmethod
+    def _single_threaded(model) -> None:
+        """
+        Small batches are faster without a thread pool per predict call.
+        """
+        for name in model.get_params():
+            if name == 'n_jobs' or name.endswith('__n_jobs'):
+                model.set_params(**{name: 1})
+
+    def _plan_columns(self) -> None:
+        """
+        Works out once where each of the model's feature columns comes from.
+        """
+        profile_index = {column: i for i, column in enumerate(self.profile_columns)}
+        self._profile_columns = []  # (column, side, profile column)
+        self._surface_elo_columns = []  # (column, side)
+        self._other_columns = []
+        for j, column in enumerate(self.columns):
+            base, _, side = column.rpartition('_')
+            if side in SIDES and base in profile_index:
+                self._profile_columns.append((j, SIDES.index(side), profile_index[base]))
+            elif side in SIDES and base == 'surface_elo':
+                self._surface_elo_columns.append((j, SIDES.index(side)))
+            else:
+                self._other_columns.append((j, column))
+        known = {'round_ordinal', 'month_sin', 'month_cos', 'age_home', 'age_away',
+                 'h2h_wins_home', 'h2h_wins_away', 'h2h_matches'}
+        unknown = [c for _, c in self._other_columns
+                   if c not in known and not c.startswith('month_') and not c.startswith('surface_')]
+        if unknown:
+            logging.warning(f"No source for model features {unknown}, they are left empty")
+        self._surface_profiles = [profile_index.get(f'elo_{surface.lower()}') for surface in self.surfaces]
+
+    def features(self, matches: List[Dict]) -> np.ndarray:
+        """
+        Returns the model's feature rows for matches.
+        """
+        n = len(matches)
+        unknown = self._unknown
+        rows = np.array([[self._rows.get(int(m['home_id']), unknown), self._rows.get(int(m['away_id']), unknown)]
+                         for m in matches], dtype=np.int64).reshape(n, 2)
+        dates = np.array([str(m['date'])[:10] if m.get('date') else 'today' for m in matches], dtype='datetime64[D]')
+        months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        surfaces = [tournament_surfaces.get(m.get('tournament')) for m in matches]
+        rounds = np.array([ordinal_mapping.get(m.get('round'), np.nan) for m in matches], dtype=np.float64)
+
+        X = np.full((n, len(self.columns)), np.nan)
+        for j, side, k in self._profile_columns:
+            X[:, j] = self.profiles[rows[:, side], k]
+        for j, side in self._surface_elo_columns:
+            for i, surface in enumerate(surfaces):
+                k = self._surface_profiles[self.surfaces.index(surface)] if surface in self.surfaces else None
+                if k is not None:
+                    X[i, j] = self.profiles[rows[i, side], k]
+        for j, column in self._other_columns:
+            if column == 'round_ordinal':
+                X[:, j] = rounds
+            elif column == 'month_sin':
+                X[:, j] = np.sin(2 * np.pi * months / 12)
+            elif column == 'month_cos':
+                X[:, j] = np.cos(2 * np.pi * months / 12)
+            elif column in ('age_home', 'age_away'):
+                birthdays = self.birthdays[rows[:, SIDES.index(column[len('age_'):])]]
+                X[:, j] = (dates - birthdays).astype(np.float64) / 365.25
+            elif column.startswith('h2h_'):
+                X[:, j] = self._head_to_head(matches, column)
+            elif column.startswith('month_'):
+                X[:, j] = months == int(column[len('month_'):])
+            elif column.startswith('surface_'):
+                X[:, j] = [surface == column[len('surface_'):] for surface in surfaces]
+        return X
+
+    def _head_to_head(self, matches: List[Dict], column: str) -> np.ndarray:
+        values = np.empty(len(matches))
+        for i, m in enumerate(matches):
+            home, away = int(m['home_id']), int(m['away_id'])
+            low_wins, played = self.head_to_head.get((min(home, away), max(home, away)), (0.0, 0.0))
+            home_wins = low_wins if home <= away else played - low_wins
+            values[i] = {'h2h_wins_home': home_wins, 'h2h_wins_away': played - home_wins,
+                         'h2h_matches': played}[column]
+        return values
+
+    def _predict_rows(self, X: np.ndarray) -> np.ndarray:
+        if self.compiled is not None and len(X) <= COMPILED_BATCH_LIMIT:
+            return self.compiled.predict_proba(X)[:, self.home_class]
+        frame = pd.DataFrame(X, columns=self.columns, copy=False)
+        return self.model.predict_proba(frame)[:, self.home_class]
+
+    def predict_batch(self, matches: List[Dict]) -> List[float]:
+        """
+        Returns the home win probability of every match, batched with concurrent requests.
+        """
+        if not matches:
+            return []
+        return self.batcher.submit(self.features(matches)).tolist()
+
+    def predict_match(self, home_id: int, away_id: int, date: Optional[str] = None,
+                      tournament: Optional[str] = None, round: Optional[str] = None) -> float:
+        return self.predict_batch([{'home_id': home_id, 'away_id': away_id, 'date': date,
+                                    'tournament': tournament, 'round': round}])[0]
+
+    def make_prediction(self, matches: List[Dict]) -> List[float]:
+        return self.predict_batch(matches)
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+        """
+        Returns an HTTP server for this predictor; call serve_forever() on it.
+        POST /predict takes one match or {"matches": [...]}, GET /health reports readiness.
+        """
+        server = ThreadingHTTPServer((host, port), make_handler(self))
+        server.daemon_threads = True
+        logging.info(f"Serving predictions on http://{host}:{server.server_port}/predict")
+        return server
+
+
+def make_handler(predictor: ModelPredictor):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes; with Nagle's algorithm the body waits for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: Dict) -> None:
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'status': 'ok', 'players': len(predictor._rows)})
+            else:
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if 'matches' in body:
+                    self._reply(200, {'home_win': predictor.predict_batch(body['matches'])})
+                else:
+                    self._reply(200, {'home_win': predictor.predict_batch([body])[0]})
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {'error': f"Invalid request: {e}"})
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return PredictionHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve match predictions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=0.0,
+                        help="How long a batch waits for more requests before predicting.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    predictor = ModelPredictor(max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    predictor.serve(args.host, args.port).serve_forever()
@@ -0,0 +1,127 @@
+# prediction/profiles.py
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from datacombiner.name_resolver import NameResolver, rankings_by_id
+from datacombiner.player_table import PlayerTable
+from datafetcher.ranking_store import RankingStore
+from features.elo import EloRatingEngine, home_won
+from features.feature_builder import ELO_SNAPSHOT, MATCH_COLUMNS, MATCHES_PATH, ordinal_mapping, tournament_surfaces
+from features.history import MatchHistory
+from storage.dataset_store import DatasetStore
+from storage.schemas import COMBINED_SCHEMA
+
+PROFILES_PATH = 'prediction/data/player_profiles'
+HEAD_TO_HEAD_PATH = 'prediction/data/head_to_head'
+
+# Placeholder opponent of the appearances used to read each player's current history
+_NOBODY = -1
+# Id of the profile used for players without matches: a new player's Elo and no history
+UNKNOWN_PLAYER = -1
+
+
+class ProfileBuilder:
+    """
+    Precomputes every player's current feature values after all known matches, so a
+    prediction only has to look them up: Elo overall and per surface, recent form and
+    workload, latest rank and birthdate. Head-to-head records are kept per player pair.
+
+    Form and workload are taken as of the day after the last match; they are the same
+    features as in training, computed by MatchHistory for an appearance on that day.
+    """
+    def __init__(self, store: Optional[DatasetStore] = None):
+        self.store = store or DatasetStore()
+        self.history = MatchHistory(ordinal_mapping)
+
+    def ratings(self, matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the current Elo ratings per player id, with an UNKNOWN_PLAYER row at the
+        initial rating.
+        """
+        params = dict(surfaces=tournament_surfaces, round_order=ordinal_mapping)
+        engine = EloRatingEngine.load(ELO_SNAPSHOT, **params)
+        ids = pd.array(matches['id'], dtype='Int64')
+        if engine is None or not np.isin(ids[~ids.isna()].to_numpy(dtype=np.int64), engine.applied_ids).all():
+            logging.info("Elo snapshot is missing or behind, replaying all matches")
+            engine = EloRatingEngine(**params)
+            engine.rate(matches)
+        ratings = engine.ratings()
+        ratings = ratings[[c for c in ratings.columns if not c.startswith('matches')]]
+        unknown = pd.DataFrame({c: [UNKNOWN_PLAYER if c == 'id' else engine.initial] for c in ratings.columns})
+        return pd.concat([ratings, unknown], ignore_index=True)
+
+    def current_history(self, matches: pd.DataFrame, ids: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the form and workload features of each player on the day after the last match.
+        """
+        last = pd.to_datetime(matches['seriesStartDate']).max()
+        as_of = (last if pd.notna(last) else pd.Timestamp.now()).normalize() + pd.Timedelta(days=1)
+        probes = pd.DataFrame({'home_id': np.where(ids == UNKNOWN_PLAYER, _NOBODY - 1, ids), 'away_id': _NOBODY, 'seriesStartDate': as_of,
+                               'round_description': None, 'result': None})
+        probes = probes.astype(matches[probes.columns].dtypes.to_dict())
+        combined = pd.concat([matches[probes.columns], probes], ignore_index=True)
+        history = self.history.features(combined).iloc[len(matches):]
+        columns = [c for c in history.columns if c.endswith('_home') and not c.startswith('h2h')]
+        current = history[columns].rename(columns=lambda c: c[:-len('_home')])
+        current.loc[ids == UNKNOWN_PLAYER, [c for c in current.columns if c.startswith('matches')]] = 0.0
+        return current.assign(id=ids).reset_index(drop=True)
+
+    def latest_ranks(self) -> pd.DataFrame:
+        rankings = RankingStore(self.store).load()
+        mapping = NameResolver(self.store).load_mapping()
+        if rankings is None or rankings.empty or mapping is None:
+            return pd.DataFrame({'id': pd.Series(dtype=np.int64), 'rank': pd.Series(dtype=np.float64)})
+        by_id = rankings_by_id(rankings, mapping).drop_duplicates('id', keep='last')
+        return pd.DataFrame({'id': by_id['id'], 'rank': by_id['rank'].astype(np.float64)})
+
+    @staticmethod
+    def head_to_head(matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns, per pair of players (low id, high id), the low player's wins and the
+        number of scored meetings.
+        """
+        home = pd.array(matches['home_id'], dtype='Int64')
+        away = pd.array(matches['away_id'], dtype='Int64')
+        won = home_won(matches['result'])
+        valid = ~(home.isna() | away.isna()) & ~np.isnan(won)
+        home, away, won = home[valid].to_numpy(dtype=np.int64), away[valid].to_numpy(dtype=np.int64), won[valid]
+        low = np.minimum(home, away)
+        pairs = pd.DataFrame({'low': low, 'high': np.maximum(home, away),
+                              'low_wins': np.where(home == low, won, 1.0 - won), 'matches': 1.0})
+        return pairs.groupby(['low', 'high'], as_index=False, sort=True).sum()
+
+    def build(self, matches: Optional[pd.DataFrame] = None, players: Optional[PlayerTable] = None,
+              save: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Builds the player profiles and head-to-head table from the stored matches (each
+        match once, as written by the combiner) unless matches are given.
+        """
+        if matches is None:
+            columns = [c for c in MATCH_COLUMNS if c in self.store.columns(MATCHES_PATH)]
+            matches = self.store.read(MATCHES_PATH, columns=columns, schema=COMBINED_SCHEMA)
+        players = players or PlayerTable.load(self.store)
+
+        ratings = self.ratings(matches)
+        ids = ratings['id'].to_numpy(dtype=np.int64)
+        profiles = ratings.merge(self.current_history(matches, ids), on='id', how='left')
+        profiles = profiles.merge(self.latest_ranks(), on='id', how='left')
+        if players is not None:
+            profiles['birthdate'] = players.take('birthdate', players.positions(profiles['id'])).to_numpy()
+        else:
+            profiles['birthdate'] = pd.NaT
+        profiles = profiles.sort_values('id', kind='stable').reset_index(drop=True)
+        head_to_head = self.head_to_head(matches)
+        logging.info(f"Built profiles of {len(profiles)} players and {len(head_to_head)} head-to-head records")
+
+        if save:
+            profiles = self.store.write(profiles, PROFILES_PATH)
+            head_to_head = self.store.write(head_to_head, HEAD_TO_HEAD_PATH)
+        return profiles, head_to_head
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ProfileBuilder().build()
@@ -0,0 +1,200 @@
+# storage/dataset_store.py
+import logging
+import os
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from storage.schemas import Schema, apply_schema
+
+
+class DatasetStore:
+    """
+    Reads and writes the datasets handed between pipeline stages.
+    Datasets are stored as uncompressed Arrow IPC (Feather v2) files, which keep the
+    dtypes declared in their schema, can be loaded column by column and are memory-mapped
+    on read, so loading only costs what the requested columns need.
+    Paths are given without extension: "dataprocessor/data/games" is stored as games.arrow,
+    and optionally exported as games.csv.
+    Large datasets can be written chunk by chunk with writer() and read back in slices
+    with iter_batches(), so they never have to fit in memory at once.
+    """
+    EXTENSION = '.arrow'
+
+    def __init__(self, export_csv: bool = False):
+        self.export_csv = export_csv
+
+    def _arrow_path(self, path: str) -> str:
+        return path + self.EXTENSION
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self._arrow_path(path)) or os.path.exists(path + '.csv')
+
+    def write(self, df: pd.DataFrame, path: str, schema: Optional[Schema] = None) -> pd.DataFrame:
+        """
+        Casts df to schema and writes it. Returns the typed frame that was written.
+        """
+        if schema:
+            df = apply_schema(df, schema)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = self._arrow_path(path) + '.tmp'
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, self._arrow_path(path))
+        logging.info(f"Dataset saved to {self._arrow_path(path)}")
+        if self.export_csv:
+            df.to_csv(path + '.csv', index=False)
+            logging.info(f"Dataset exported to {path}.csv")
+        return df
+
+    def writer(self, path: str, schema: Optional[Schema] = None) -> 'DatasetWriter':
+        """
+        Returns a writer that appends frames to the dataset at path, replacing it on close().
+        """
+        return DatasetWriter(self, path, schema)
+
+    def read(self, path: str, columns: Optional[List[str]] = None, schema: Optional[Schema] = None,
+             memory_map: bool = True) -> pd.DataFrame:
+        """
+        Loads a dataset, optionally only the given columns.
+        Falls back to a CSV written by an older run, casting it to schema.
+        """
+        arrow_path = self._arrow_path(path)
+        if os.path.exists(arrow_path):
+            table = feather.read_table(arrow_path, columns=columns, memory_map=memory_map)
+            return table.to_pandas(split_blocks=True)
+
+        csv_path = path + '.csv'
+        if os.path.exists(csv_path):
+            logging.info(f"No {arrow_path}, reading {csv_path}")
+            df = pd.read_csv(csv_path, usecols=columns)
+            return apply_schema(df, schema) if schema else df
+
+        raise FileNotFoundError(f"Dataset not found: {arrow_path}")
+
+    def _table(self, path: str, columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Memory-maps a stored dataset without reading it.
+        """
+        arrow_path = self._arrow_path(path)
+        if not os.path.exists(arrow_path):
+            raise FileNotFoundError(f"Dataset not found: {arrow_path}")
+        return feather.read_table(arrow_path, columns=columns, memory_map=True)
+
+    def columns(self, path: str) -> List[str]:
+        """
+        Returns the column names of a dataset without loading it.
+        """
+        if not os.path.exists(self._arrow_path(path)) and os.path.exists(path + '.csv'):
+            return list(pd.read_csv(path + '.csv', nrows=0).columns)
+        return self._table(path).schema.names
+
+    def iter_batches(self, path: str, batch_size: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yields a stored dataset in order, batch_size rows at a time, indexed by row number.
+        The file is memory-mapped, so only the batch being converted is held in memory.
+        """
+        table = self._table(path, columns)
+        for start in range(0, table.num_rows, batch_size):
+            batch = table.slice(start, batch_size).to_pandas(split_blocks=True)
+            batch.index = pd.RangeIndex(start, start + len(batch))
+            yield batch
+
+
+class DatasetWriter:
+    """
+    Appends frames to one Arrow dataset, each as its own record batch, so a dataset can be
+    built from chunks without holding it. Frames are cast to the schema, and categorical
+    columns keep one growing list of categories, written as dictionary deltas, so every
+    chunk can bring new values. The file replaces the dataset on close(); until then the
+    previous version stays readable, and an exception inside a with block discards the new one.
+    """
+    def __init__(self, store: DatasetStore, path: str, schema: Optional[Schema] = None):
+        self.store = store
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._arrow_schema: Optional[pa.Schema] = None
+        self._writer: Optional[pa.ipc.RecordBatchFileWriter] = None
+        self._categories: Dict[str, pd.Index] = {}
+        self._tmp_path = store._arrow_path(path) + '.tmp'
+        self._csv_header = True
+
+    def _extend_categories(self, df: pd.DataFrame) -> pd.DataFrame:
+        for col in df.columns:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                continue
+            categories = df[col].cat.categories
+            known = self._categories.get(col)
+            if known is not None:
+                categories = known.append(categories[~categories.isin(known)])
+            self._categories[col] = categories
+            if not df[col].cat.categories.equals(categories):
+                df[col] = df[col].cat.set_categories(categories)
+        return df
+
+    def _open(self, table: pa.Table) -> None:
+        # Dictionary indices are widened to int32, so categories can outgrow the first chunk's
+        fields = [pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type, f.type.ordered))
+                  if pa.types.is_dictionary(f.type) else f for f in table.schema]
+        self._arrow_schema = pa.schema(fields, metadata=table.schema.metadata)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        self._writer = pa.ipc.new_file(self._tmp_path, self._arrow_schema, options=options)
+
+    def write(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Casts df to the schema and appends it. Returns the typed frame that was written.
+        """
+        df = apply_schema(df, self.schema) if self.schema else df.copy(deep=False)
+        df = self._extend_categories(df)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._open(table)
+        elif table.schema.names != self._arrow_schema.names:
+            raise ValueError(f"Columns of {self.path} changed between chunks: {table.schema.names}")
+        self._writer.write_table(table.cast(self._arrow_schema))
+        self.rows += len(df)
+        if self.store.export_csv:
+            df.to_csv(self.path + '.csv.tmp', index=False, mode='w' if self._csv_header else 'a',
+                      header=self._csv_header)
+            self._csv_header = False
+        return df
+
+    def close(self) -> None:
+        """
+        Finishes the file and replaces the dataset with it. Without any chunk written this
+        is a no-op and the previous dataset is kept.
+        """
+        if self._writer is None:
+            logging.info(f"Nothing written to {self.store._arrow_path(self.path)}")
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp_path, self.store._arrow_path(self.path))
+        logging.info(f"Dataset saved to {self.store._arrow_path(self.path)} ({self.rows} rows)")
+        if self.store.export_csv:
+            os.replace(self.path + '.csv.tmp', self.path + '.csv')
+            logging.info(f"Dataset exported to {self.path}.csv")
+
+    def abort(self) -> None:
+        """
+        Discards everything written so far.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for tmp_path in (self._tmp_path, self.path + '.csv.tmp'):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __enter__(self) -> 'DatasetWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
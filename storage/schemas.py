@@ -0,0 +1,156 @@
+# storage/schemas.py
+import logging
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+# Column name -> pandas dtype. Columns missing from a frame are left out, extra columns are kept.
+Schema = Dict[str, Union[str, pd.CategoricalDtype]]
+
+# Rounds as mapped by the processor, from the first qualifying round to the final. Stored
+# round descriptions are ordered categoricals with these categories, so a round's ordinal
+# is its code + 1; anything else, such as an unknown round, is stored as missing.
+ROUNDS = ('Q1', 'Q2', 'Q', 'R128', 'R64', 'R32', 'R16', 'R8', 'QF', 'SF', 'F')
+ROUND_DTYPE = pd.CategoricalDtype(ROUNDS, ordered=True)
+
+# Ids are nullable int32: SofaScore player, event and block ids are far below 2**31.
+# Repeated strings are categoricals, set scores int8, and home_win is the precomputed label.
+GAMES_SCHEMA: Schema = {
+    'finished': 'boolean',
+    'result': 'category',
+    'home_win': 'boolean',
+    'homeTeamScore': 'Int8',
+    'awayTeamScore': 'Int8',
+    'id': 'Int32',
+    'events': 'list',
+    'seriesStartDate': 'datetime64[ns]',
+    'home_id': 'Int32',
+    'away_id': 'Int32',
+    'round_description': ROUND_DTYPE,
+    'tournamentName': 'category',
+    'uniqueTournament': 'category',
+}
+
+PARTICIPANTS_SCHEMA: Schema = {
+    'name': 'object',
+    'slug': 'object',
+    'shortName': 'object',
+    'gender': 'category',
+    'nameCode': 'object',
+    'ranking': 'Int32',
+    'disabled': 'boolean',
+    'national': 'boolean',
+    'id': 'Int32',
+}
+
+PLAYERS_SCHEMA: Schema = {
+    **PARTICIPANTS_SCHEMA,
+    'birthdate': 'datetime64[ns]',
+}
+
+COMBINED_SCHEMA: Schema = {
+    **GAMES_SCHEMA,
+    'id_home': 'Int32',
+    'name_home': 'category',
+    'birthdate_home': 'datetime64[ns]',
+    'id_away': 'Int32',
+    'name_away': 'category',
+    'birthdate_away': 'datetime64[ns]',
+}
+
+RANKINGS_SCHEMA: Schema = {
+    'lastName': 'category',
+    'rank': 'Int32',
+    'rankingDate': 'datetime64[ns]',
+}
+
+NAME_MAPPING_SCHEMA: Schema = {
+    'ranking_name': 'object',
+    'id': 'Int32',
+    'confidence': 'float64',
+    'candidates': 'Int32',
+    'status': 'category',
+}
+
+
+def _to_list(value):
+    """
+    Parses list columns that were stringified by a CSV round trip, e.g. "[123, 456]".
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('[') and value.endswith(']'):
+            return [int(v) for v in value[1:-1].split(',') if v.strip()]
+    return value
+
+
+def _to_nullable_int(values: pd.Series, dtype: str) -> pd.Series:
+    """
+    Casts an object column of numbers or numeric strings to a nullable integer dtype,
+    converting each distinct value once. Blank strings become missing.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = [(int(u) if u.strip() else None) if isinstance(u, str) else u for u in uniques]
+    converted = pd.Series(uniques + [None], dtype=object).astype(dtype).array
+    return pd.Series(converted[codes], index=values.index, name=values.name)
+
+
+def map_values(values: pd.Series, mapping: Dict, dtype=object) -> np.ndarray:
+    """
+    Maps every value through mapping, missing where it has no entry, for object and
+    categorical columns alike. Each distinct value is looked up once, so on a categorical
+    only its categories are mapped.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    mapped = np.array([mapping.get(u, np.nan) for u in uniques] + [np.nan], dtype=dtype)
+    return mapped[codes]
+
+
+def home_wins(results: pd.Series) -> pd.Series:
+    """
+    Returns the home_win label of results like '3:1': True where the home player won,
+    False where they lost and missing for results without a score. Only the distinct
+    results are parsed, as a vectorised string operation, and spread over the rows by code.
+    """
+    codes, uniques = pd.factorize(results.astype('object'), use_na_sentinel=True)
+    scores = pd.Series(uniques, dtype='string').str.extract(r'^\s*(\d+)\s*:\s*(\d+)\s*$')
+    home, away = (pd.to_numeric(scores[i]) for i in (0, 1))
+    won = pd.array((home > away).to_numpy(), dtype='boolean')
+    won[home.isna().to_numpy()] = pd.NA
+    labels = pd.array(np.append(won, pd.NA), dtype='boolean')
+    return pd.Series(labels[codes], index=results.index, name='home_win')
+
+
+def apply_schema(df: pd.DataFrame, schema: Schema) -> pd.DataFrame:
+    """
+    Casts the columns of df to the dtypes declared in schema.
+    Datetimes are stored timezone-naive in UTC, and blank strings in integer columns, such
+    as the score of an unplayed match, become missing values.
+    """
+    df = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        try:
+            if isinstance(dtype, pd.CategoricalDtype):
+                if df[col].dtype != dtype:
+                    df[col] = df[col].astype(object).astype(dtype)
+            elif dtype == 'list':
+                if df[col].dtype == object:
+                    df[col] = df[col].map(_to_list)
+            elif dtype.startswith('datetime64'):
+                if str(df[col].dtype) == dtype:
+                    continue
+                values = pd.to_datetime(df[col], errors='coerce')
+                if getattr(values.dt, 'tz', None) is not None:
+                    values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+                df[col] = values.astype(dtype)
+            elif dtype.startswith('Int') and df[col].dtype == object:
+                df[col] = _to_nullable_int(df[col], dtype)
+            elif str(df[col].dtype) != dtype:
+                df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError) as e:
+            logging.error(f"Cannot cast column {col} to {dtype}: {e}")
+            raise ValueError(f"Column {col} does not match schema dtype {dtype}: {e}")
+    return df
@@ -0,0 +1,18 @@
+# tests/test_cli.py
+import pytest
+
+from cli import build_parser
+
+
+def test_ranking_parser_choices_match_the_parsers():
+    from datafetcher.ranking_parser import PARSERS
+
+    action = next(a for a in build_parser()._subparsers._group_actions[0].choices['rankings']._actions
+                  if a.dest == 'parser')
+    assert sorted(action.choices) == sorted(PARSERS)
+
+
+def test_unknown_ranking_parser_fails_at_parse_time():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(['rankings', '--parser', 'streaming'])
+    assert build_parser().parse_args(['rankings', '--parser', 'stream']).parser == 'stream'
@@ -0,0 +1,75 @@
+# tests/test_cuptree_extractor.py
+import copy
+
+import pandas as pd
+
+from benchmarks.legacy_extraction import legacy_extract
+from dataprocessor.dataprocessor import TennisDataProcessor
+
+
+def team(player_id, name, ranking=None):
+    team = {'name': name, 'slug': name.lower().replace(' ', '-'), 'shortName': name.split()[-1],
+            'gender': 'M', 'nameCode': name[:3].upper(), 'disabled': False, 'national': False, 'id': player_id}
+    if ranking is not None:
+        team['ranking'] = ranking
+    return team
+
+
+def entry(player_id, name, order, winner=None, ranking=None):
+    return {'team': team(player_id, name, ranking), 'order': order, 'winner': winner}
+
+
+def block(block_id, result, participants, home=None, away=None, date='2024-01-14T00:00:00+00:00', finished=True):
+    block = {'blockId': block_id, 'id': block_id, 'finished': finished, 'result': result,
+             'events': [block_id * 10], 'participants': participants}
+    if home is not None:
+        block['homeTeamScore'], block['awayTeamScore'] = home, away
+    if date is not None:
+        block['seriesStartDate'] = date
+    return block
+
+
+def synthetic_cuptree():
+    tournament = {'name': 'Open, Qualification', 'uniqueTournament': {'name': 'Open'}}
+    qualifying = {'id': 1, 'name': 'Qualification', 'tournament': tournament, 'rounds': [
+        {'description': 'Qualification round 1', 'blocks': [
+            block(1, '2:0', [entry(11, 'Ann Qualifier', 1, True), entry(12, 'Ben Qualifier', 2, False, 310)], '2', '0'),
+            # A bye: only one participant
+            block(2, '0:0', [entry(13, 'Cal Qualifier', 1, True)]),
+            block(3, 'walkover', [entry(14, 'Dan Qualifier', 1), entry(15, 'Eli Qualifier', 2)]),
+        ]},
+        {'description': 'Qualification final', 'blocks': [
+            # Missing scores and no start date
+            block(4, '2:1', [entry(11, 'Ann Qualifier', 1, True), entry(13, 'Cal Qualifier', 2, False)], date=None),
+        ]},
+    ]}
+    tournament = {'name': 'Open', 'uniqueTournament': {'name': 'Open'}}
+    main = {'id': 2, 'name': 'Main draw', 'tournament': tournament, 'rounds': [
+        {'description': 'Round of 16', 'blocks': [
+            block(5, 'home won', [entry(1, 'Carlos Top', 1, True, 2), entry(11, 'Ann Qualifier', 2, False)], '2', '1'),
+            # A bye into the quarterfinals
+            block(6, '1:0', [entry(2, 'Jannik Second', 1, True, 1)], '1', '0'),
+            block(7, 'retired', [entry(3, 'Dan Third', 1), entry(4, 'Eli Fourth', 2)]),
+            block(8, 'on-going', [entry(3, 'Dan Third', 1), entry(4, 'Eli Fourth', 2)], '1', '1', finished=False),
+        ]},
+        {'description': 'Quarterfinals', 'blocks': [
+            block(9, 'away won', [entry(1, 'Carlos Top', 1, None, 2), entry(2, 'Jannik Second', 2, None, 1)], '0', '2'),
+            block(10, '5:4', [entry(3, 'Dan Third', 1), entry(12, 'Ben Qualifier', 2, None, 310)], '5', '4'),
+        ]},
+    ]}
+    return [qualifying, main]
+
+
+def test_extractor_matches_the_dataframe_path():
+    processor = TennisDataProcessor()
+    cuptrees = synthetic_cuptree()
+    # The DataFrame path mutates the JSON it reads
+    expected_participants, expected_games = legacy_extract(copy.deepcopy(cuptrees), processor.map_round_description,
+                                                           processor.validate_score_format)
+    participants, games = processor.extractor.extract(cuptrees)
+
+    pd.testing.assert_frame_equal(participants, expected_participants)
+    pd.testing.assert_frame_equal(games, expected_games)
+    assert cuptrees == synthetic_cuptree(), "the extractor must not mutate its input"
+    assert games['round_description'].tolist() == ['Q', 'Q', 'R16', 'R16', 'R16', 'QF', 'QF']
+    assert games['away_id'].isna().tolist() == [False, False, False, True, False, False, False]
@@ -0,0 +1,22 @@
+# tests/test_dataprocessor.py
+import os
+
+from dataprocessor.dataprocessor import TennisDataProcessor
+
+
+def test_iter_processed_when_every_file_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join('datafetcher', 'data'))
+    os.makedirs(os.path.join('dataprocessor', 'data'))
+    with open(os.path.join('datafetcher', 'data', 'cuptrees_1_10.json'), 'w', encoding='utf-8') as f:
+        f.write('{"truncated": ')
+    with open(os.path.join('datafetcher', 'data', 'cuptrees_1_11.json'), 'w', encoding='utf-8') as f:
+        f.write('{"not": "a list"}')
+
+    processor = TennisDataProcessor()
+    chunks = list(processor.iter_processed(chunk_size=10, save=True))
+
+    assert chunks == []
+    assert sorted(processor.errors) == ['cuptrees_1_10.json', 'cuptrees_1_11.json']
+    assert not processor.store.exists(os.path.join('dataprocessor', 'data', 'participants'))
+    assert not os.path.exists(os.path.join('dataprocessor', 'data', 'manifest.json'))
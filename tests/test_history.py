@@ -0,0 +1,37 @@
+# tests/test_history.py
+import numpy as np
+import pandas as pd
+
+from features.history import MatchHistory
+from storage.schemas import ROUNDS
+
+
+def history() -> MatchHistory:
+    return MatchHistory({name: i for i, name in enumerate(ROUNDS)}, form_days=365, fatigue_days=14)
+
+
+def test_matches_before_1970_are_ordered_by_date():
+    matches = pd.DataFrame({
+        'home_id': [1, 1, 2, 1],
+        'away_id': [2, 3, 3, 2],
+        'result': ['3:0', '3:0', '0:3', '0:3'],
+        'seriesStartDate': pd.to_datetime(['1968-05-01', '1969-06-01', '1969-06-08', '1971-01-01']),
+        'round_description': ['F', 'F', 'F', 'F'],
+    })
+    features = history().features(matches)
+
+    np.testing.assert_array_equal(features['h2h_matches'], [0, 0, 0, 1])
+    np.testing.assert_array_equal(features['h2h_wins_home'], [0, 0, 0, 1])
+    np.testing.assert_array_equal(features['form_10_home'], [np.nan, 1.0, 0.0, 1.0])
+    np.testing.assert_array_equal(features['form_10_away'], [np.nan, np.nan, 0.0, 0.0])
+    np.testing.assert_array_equal(features['matches_14d_away'], [0, 0, 1, 0])
+
+
+def test_time_keys_are_never_negative():
+    matches = pd.DataFrame({
+        'seriesStartDate': pd.to_datetime(['1850-01-01', '1877-07-09', '1969-12-31', None]),
+        'round_description': ['F', 'F', 'SF', None],
+    })
+    keys = history().time_keys(matches)
+    assert (keys >= 0).all()
+    assert list(np.argsort(keys)) == [0, 1, 2, 3]
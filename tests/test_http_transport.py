@@ -0,0 +1,130 @@
+# tests/test_http_transport.py
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from datafetcher.datafetcher import TennisDataFetcher
+from datafetcher.http_transport import BlockedError, HttpTransport
+
+FINISHED_BLOCK = {'finished': True, 'result': '3:1', 'homeTeamScore': '3', 'awayTeamScore': '1',
+                  'seriesStartDate': '2021-01-10T00:00:00+00:00'}
+
+# Path -> (status, body); a str body is sent as is, anything else as JSON
+ROUTES = {
+    '/config/default-unique-tournaments/NL/tennis': (200, {'uniqueTournaments': [
+        {'id': 1, 'name': 'Open', 'slug': 'open', 'category': {'name': 'ATP'}, 'tennisPoints': 250},
+        {'id': 2, 'name': 'Ladies Open', 'slug': 'ladies-open', 'category': {'name': 'WTA'}, 'tennisPoints': 250},
+    ]}),
+    '/unique-tournament/1/seasons': (200, {'seasons': [{'id': 10, 'year': '2021'}, {'id': 11, 'year': '2022'}]}),
+    '/unique-tournament/1/season/10/cuptrees': (200, {'cupTrees': [{'rounds': [{'blocks': [FINISHED_BLOCK]}]}]}),
+    '/unique-tournament/1/season/11/cuptrees': (200, {'cupTrees': [{'rounds': [{'blocks': [FINISHED_BLOCK]}]}]}),
+    '/error/string': (200, {'error': 'Not found'}),
+    '/error/number': (200, {'error': 404}),
+    '/error/blocked': (200, {'error': {'code': 403, 'message': 'Forbidden'}}),
+    '/error/other': (200, {'error': {'code': 404, 'message': 'Not found'}}),
+    '/status/403': (403, {'error': {'code': 403}}),
+    '/challenge': (200, '<html><body>Checking your browser</body></html>'),
+    '/list': (200, [1, 2, 3]),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        StubHandler.requests.append(self.path)
+        status, body = ROUTES.get(self.path, (404, {'error': {'code': 404}}))
+        payload = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html' if isinstance(body, str) else 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def stub_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(stub_url):
+    transport = HttpTransport(stub_url, max_workers=2, rate_limit=None)
+    yield transport
+    transport.close()
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('/error/string', {'error': 'Not found'}),
+    ('/error/number', {'error': 404}),
+    ('/error/other', {'error': {'code': 404, 'message': 'Not found'}}),
+    ('/list', [1, 2, 3]),
+])
+def test_error_fields_that_are_not_blocks_are_returned(transport, path, expected):
+    assert transport.get_json(path) == expected
+
+
+@pytest.mark.parametrize('path', ['/error/blocked', '/status/403', '/challenge'])
+def test_blocked_responses_raise(transport, path):
+    with pytest.raises(BlockedError):
+        transport.get_json(path)
+
+
+def test_fetcher_crawls_stub_over_http(stub_url, tmp_path):
+    StubHandler.requests = []
+    fetcher = TennisDataFetcher(transport='http', max_workers=1, rate_limit=None, base_url=stub_url)
+    try:
+        data = fetcher.get_all_data(save_dir=str(tmp_path))
+    finally:
+        fetcher.close()
+
+    assert [t['id'] for t in data['tournaments']] == [1]
+    assert sorted(data['cuptrees']) == [(1, 10), (1, 11)]
+    # Most recent season first
+    cuptree_requests = [path for path in StubHandler.requests if path.endswith('/cuptrees')]
+    assert cuptree_requests == ['/unique-tournament/1/season/11/cuptrees', '/unique-tournament/1/season/10/cuptrees']
+    for name in ('tournaments.json', 'seasons_1.json', 'cuptrees_1_10.json', 'cuptrees_1_11.json'):
+        assert os.path.exists(tmp_path / name)
+
+
+def test_repeat_crawl_returns_cached_cuptrees(stub_url, tmp_path):
+    for _ in range(2):
+        StubHandler.requests = []
+        fetcher = TennisDataFetcher(transport='http', max_workers=1, rate_limit=None, base_url=stub_url)
+        try:
+            data = fetcher.get_all_data(save_dir=str(tmp_path))
+        finally:
+            fetcher.close()
+
+    # Both seasons are completed, so the second crawl fetches no cup trees but returns them all
+    assert not [path for path in StubHandler.requests if path.endswith('/cuptrees')]
+    assert list(data['cuptrees']) == [(1, 10), (1, 11)]
+    assert data['cuptrees'][(1, 10)] == ROUTES['/unique-tournament/1/season/10/cuptrees'][1]['cupTrees']
+
+
+
+def test_failed_write_keeps_the_previous_cache_entry(tmp_path, monkeypatch):
+    fetcher = TennisDataFetcher(base_url='http://unused')
+    cache = fetcher._get_cache(str(tmp_path))
+    old, new = [{'rounds': []}], [{'rounds': [{'blocks': [FINISHED_BLOCK]}]}]
+    fetcher._save_fetched(cache, 'cuptrees_1_10.json', old, status='in_progress')
+    recorded = dict(cache.index['cuptrees_1_10.json'])
+
+    monkeypatch.setattr(TennisDataFetcher, 'save_data', lambda self, data, filename: False)
+    fetcher._save_fetched(cache, 'cuptrees_1_10.json', new, status='completed')
+
+    # The index still describes the file on disk, so the season is not taken as completed
+    assert cache.index['cuptrees_1_10.json'] == recorded
+    assert cache.load('cuptrees_1_10.json') == old
+    fetcher.close()
@@ -0,0 +1,79 @@
+# tests/test_ranking_parser.py
+import os
+
+import pandas as pd
+import pytest
+
+from datacombiner.name_resolver import ranking_key
+from datafetcher.ranking_parser import PARSERS, lxml_html, parse_ranking_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# (lastName, rank, tied) per fixture page, in page order
+EXPECTED = {
+    'atp_rankings_2024-01-08.html': [
+        ('N. Djokovic', 1, False), ('C. Alcaraz', 2, False), ('D. Medvedev', 3, False), ('J. Sinner', 4, False),
+        ('A. Rublev', 5, False), ('T. Fritz', 12, False), ('H. Hurkacz', 12, True),
+        ('F. Auger-Aliassime', 14, False), ('A. de Minaur', 18, False), ('F. Cerúndolo', 21, False),
+        ('B. Shelton', 21, True), ('J.-L. Struff', 21, True), ('M. Fucsovics', 56, False), ('J. Munar', 98, False),
+    ],
+    'atp_rankings_2024-07-01.html': [
+        ('C. Alcaraz', 1, False), ('J. Sinner', 2, False), ('N. Djokovic', 3, False), ('S. Wawrinka', 49, False),
+        ("J. O'Connell", 49, True), ('J.-L. Struff', 101, False), ('D. Müller', 1498, False),
+        ('Ž. Kovačević', 1498, True), ('B. Holt', 1498, True),
+    ],
+}
+
+# Block key of every name in EXPECTED, as NameResolver looks it up
+RANKING_KEYS = {
+    'N. Djokovic': ('n', 'djokovic'), 'C. Alcaraz': ('c', 'alcaraz'), 'D. Medvedev': ('d', 'medvedev'),
+    'J. Sinner': ('j', 'sinner'), 'A. Rublev': ('a', 'rublev'), 'T. Fritz': ('t', 'fritz'),
+    'H. Hurkacz': ('h', 'hurkacz'), 'F. Auger-Aliassime': ('f', 'augeraliassime'), 'A. de Minaur': ('a', 'deminaur'),
+    'F. Cerúndolo': ('f', 'cerundolo'), 'B. Shelton': ('b', 'shelton'), 'J.-L. Struff': ('j', 'struff'),
+    'M. Fucsovics': ('m', 'fucsovics'), 'J. Munar': ('j', 'munar'), 'S. Wawrinka': ('s', 'wawrinka'),
+    "J. O'Connell": ('j', 'connell'), 'D. Müller': ('d', 'muller'), 'Ž. Kovačević': ('z', 'kovacevic'),
+    'B. Holt': ('b', 'holt'),
+}
+
+PARSER_NAMES = [
+    pytest.param(name, marks=pytest.mark.skipif(lxml_html is None, reason="lxml is not installed"))
+    if name == 'lxml' else name
+    for name in PARSERS
+]
+
+
+def expected_frame(page: str, date: str) -> pd.DataFrame:
+    names, ranks, tied = zip(*EXPECTED[page])
+    return pd.DataFrame({
+        'lastName': pd.Series(names, dtype=object),
+        'rank': pd.Series(ranks, dtype='Int32'),
+        'tied': pd.Series(tied, dtype=bool),
+        'rankingDate': date,
+    })
+
+
+def read_fixture(page: str) -> str:
+    with open(os.path.join(FIXTURES, page), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('parser', PARSER_NAMES)
+@pytest.mark.parametrize('page', sorted(EXPECTED))
+def test_parsers_return_typed_rows(parser, page):
+    date = page[len('atp_rankings_'):-len('.html')]
+    parsed = parse_ranking_page(read_fixture(page), date=date, parser=parser)
+    pd.testing.assert_frame_equal(parsed, expected_frame(page, date))
+
+
+@pytest.mark.parametrize('parser', PARSER_NAMES)
+def test_page_without_rows_is_empty(parser):
+    parsed = parse_ranking_page('<html><body><span class="lastName">Menu</span></body></html>', parser=parser)
+    assert parsed.empty
+    assert list(parsed.columns) == ['lastName', 'rank', 'tied']
+
+
+@pytest.mark.parametrize('page', sorted(EXPECTED))
+def test_parsed_names_have_ranking_keys(page):
+    parsed = parse_ranking_page(read_fixture(page), parser='stream')
+    assert {name: ranking_key(name) for name in parsed['lastName']} == {
+        name: RANKING_KEYS[name] for name, _, _ in EXPECTED[page]}